@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistema de Consulta de Coordenadas - Benchmark com Rede Sintética
+Gera redes rodoviárias sintéticas (eixos, FXD e municípios) em vários
+tamanhos e densidades de vértices por trecho, grava como shapefiles
+locais e mede o pipeline de consulta de cada motor
+(consulta_standalone.obter_backend):
+    
+    - partida a frio: importação do motor, carga da zona e 1ª consulta
+    - latência de consultar_coordenadas (p50/p95/p99)
+    - vazão de consultar_lote (pontos/s)
+    - pico de memória (RSS) do processo
+
+Cada medição roda em um processo novo, para que a partida a frio e o
+pico de memória não sejam contaminados por medições anteriores. Os
+resultados são gravados em JSON; com --comparar, o benchmark falha
+(código de saída 1) se alguma métrica piorar além da tolerância em
+relação a um resultado anterior. Tudo roda offline.
+
+Uso:
+    python benchmark_consulta.py
+    python benchmark_consulta.py --escalas 1000 10000 --backend snapshot shapely
+    python benchmark_consulta.py --escalas 10000 --vertices 12 200 1000
+    python benchmark_consulta.py --saida atual.json --comparar base.json
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+import sys
+import os
+import json
+import time
+import platform
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Tuple, Optional, Dict, Any, List
+
+import numpy as np
+
+import consulta_standalone as cs
+
+
+# ============================================
+# CONFIGURAÇÕES
+# ============================================
+
+# Número de feições do eixo em cada escala padrão
+ESCALAS_PADRAO = [1000, 10000, 100000]
+
+# Consultas individuais medidas (latência) e pontos do lote (vazão)
+CONSULTAS_PADRAO = 500
+TAMANHO_LOTE_PADRAO = 10000
+
+# Zona das redes sintéticas
+ZONA_BENCHMARK = 24
+
+# Área (UTM 24S) onde a rede é gerada: dentro dos limites de validar_coordenadas
+AREA_BENCHMARK = (250000.0, 8100000.0, 800000.0, 9100000.0)
+
+# Trechos por rodovia e vértices por trecho (padrão do gerador)
+TRECHOS_POR_RODOVIA = 20
+VERTICES_POR_TRECHO = 12
+
+# Vértices por trecho medidos em cada escala: o trecho tem sempre ~5 km, só a
+# densidade muda (eixos detalhados expõem custos proporcionais aos vértices)
+VERTICES_PADRAO = [12, 200, 1000]
+
+# Redes com mais vértices que isto (feições x vértices por trecho) não são geradas
+MAX_VERTICES_REDE = 10000000
+
+# Versão do gerador: redes já gravadas com outra versão são refeitas
+VERSAO_GERADOR = 1
+
+# Piora relativa tolerada por métrica em --comparar (0.2 = 20%)
+TOLERANCIA_REGRESSAO = 0.2
+
+# Métricas comparadas e se "maior é melhor"
+METRICAS_COMPARADAS = {
+    'partida_fria_s': False,
+    'latencia_p50_ms': False,
+    'latencia_p95_ms': False,
+    'latencia_p99_ms': False,
+    'vazao_lote_pontos_s': True,
+    'pico_memoria_mb': False
+}
+
+
+# ============================================
+# REDE SINTÉTICA
+# ============================================
+
+def gerar_rede_sintetica(destino: Path, n_feicoes: int, zona: int = ZONA_BENCHMARK,
+                         semente: int = 0, vertices_por_trecho: int = VERTICES_POR_TRECHO) -> Path:
+    """
+    Grava shape{zona}, FXD{zona} e municipios{zona} sintéticos em `destino`.
+    
+    As rodovias são caminhadas aleatórias com trechos contínuos de KM; uma
+    em cada quatro é desenhada no sentido inverso da quilometragem e um
+    trecho em cada dez é multiparte, para exercitar a lógica de orientação
+    e continuidade. A FXD é o buffer de cada trecho (campo LARGURA) e os
+    municípios formam uma grade, alguns com furos. O comprimento dos
+    trechos não depende de `vertices_por_trecho`: mais vértices só deixam
+    o traçado mais detalhado.
+    
+    Args:
+        destino: Pasta dos shapefiles (criada se não existir)
+        n_feicoes: Número de feições do eixo
+        zona: Zona UTM
+        semente: Semente do gerador aleatório
+        vertices_por_trecho: Vértices de cada trecho do eixo
+    
+    Returns:
+        Pasta dos shapefiles
+    """
+    import shapely
+    from pyogrio.raw import write as gravar_ogr
+    
+    destino.mkdir(parents=True, exist_ok=True)
+    marcador = destino / "benchmark.json"
+    parametros = {'n_feicoes': n_feicoes, 'vertices_por_trecho': vertices_por_trecho,
+                  'zona': zona, 'semente': semente, 'versao': VERSAO_GERADOR}
+    
+    if marcador.exists() and json.loads(marcador.read_text(encoding='utf-8')) == parametros:
+        return destino
+    
+    rng = np.random.default_rng(semente)
+    xmin, ymin, xmax, ymax = AREA_BENCHMARK
+    crs = f"EPSG:{cs.ZONA_EPSG[zona]}"
+    
+    n_rodovias = -(-n_feicoes // TRECHOS_POR_RODOVIA)
+    passos = TRECHOS_POR_RODOVIA * (vertices_por_trecho - 1)
+    
+    # Caminhadas aleatórias com direção persistente (passos de ~500 m com o padrão de
+    # vértices; com mais vértices, passos e curvas menores mantêm o mesmo traçado médio)
+    escala_passo = (VERTICES_POR_TRECHO - 1) / (vertices_por_trecho - 1)
+    direcao = rng.uniform(0, 2 * np.pi, (n_rodovias, 1)) + np.cumsum(
+        rng.normal(0, 0.25 * np.sqrt(escala_passo), (n_rodovias, passos)), axis=1)
+    comprimento_passo = rng.uniform(300, 700, (n_rodovias, passos)) * escala_passo
+    inicio = np.column_stack([rng.uniform(xmin + 1e5, xmax - 1e5, n_rodovias),
+                              rng.uniform(ymin + 1e5, ymax - 1e5, n_rodovias)])
+    xs = inicio[:, :1] + np.concatenate(
+        [np.zeros((n_rodovias, 1)), np.cumsum(comprimento_passo * np.cos(direcao), axis=1)], axis=1)
+    ys = inicio[:, 1:] + np.concatenate(
+        [np.zeros((n_rodovias, 1)), np.cumsum(comprimento_passo * np.sin(direcao), axis=1)], axis=1)
+    xs = np.clip(xs, xmin, xmax)
+    ys = np.clip(ys, ymin, ymax)
+    
+    # Trecho t da rodovia r: vértices t*(V-1) .. t*(V-1)+V-1 (compartilha o extremo com o vizinho)
+    v = np.arange(vertices_por_trecho)
+    colunas = (np.arange(TRECHOS_POR_RODOVIA)[:, None] * (vertices_por_trecho - 1) + v).ravel()
+    coords = np.stack([xs[:, colunas], ys[:, colunas]], axis=-1).reshape(
+        n_rodovias * TRECHOS_POR_RODOVIA, vertices_por_trecho, 2)[:n_feicoes]
+    
+    rodovia = np.arange(n_feicoes) // TRECHOS_POR_RODOVIA
+    trecho = np.arange(n_feicoes) % TRECHOS_POR_RODOVIA
+    
+    # KM contínuo ao longo de cada rodovia
+    segmentos = np.hypot(*np.diff(coords, axis=1).transpose(2, 0, 1))
+    extensao_km = segmentos.sum(axis=1) / 1000
+    km_fim = np.cumsum(extensao_km)
+    primeiro = rodovia * TRECHOS_POR_RODOVIA
+    km_fim -= km_fim[primeiro] - extensao_km[primeiro]
+    km_ini = km_fim - extensao_km
+    
+    # Uma rodovia em cada quatro desenhada no sentido inverso da quilometragem
+    invertida = rodovia % 4 == 3
+    coords[invertida] = coords[invertida, ::-1]
+    
+    # Um trecho em cada dez com duas partes
+    multiparte = trecho % 10 == 5
+    meio = vertices_por_trecho // 2
+    partes = []
+    feicao_parte = []
+    for f in range(n_feicoes):
+        if multiparte[f]:
+            partes += [coords[f, :meio + 1], coords[f, meio:]]
+            feicao_parte += [f, f]
+        else:
+            partes.append(coords[f])
+            feicao_parte.append(f)
+    linhas = shapely.linestrings(np.concatenate(partes),
+                                 indices=np.repeat(np.arange(len(partes)), [len(p) for p in partes]))
+    eixos = shapely.multilinestrings(linhas, indices=feicao_parte)
+    
+    nomes_rodovia = np.array([f"BA{r:03d}" for r in rodovia], dtype=object)
+    codigos_sre = np.array([f"{r:03d}BBA{t:04d}" for r, t in zip(rodovia, trecho)], dtype=object)
+    local_ini = np.array([f"ENTR {t}" for t in trecho], dtype=object)
+    local_fim = np.array([f"ENTR {t + 1}" for t in trecho], dtype=object)
+    pavimento = np.where(trecho % 3 == 0, 'LEITO NATURAL', 'PAVIMENTADO').astype(object)
+    
+    gravar_ogr(str(destino / f"shape{zona}.shp"), shapely.to_wkb(eixos),
+               [nomes_rodovia, codigos_sre, km_ini, km_fim, local_ini, local_fim, pavimento],
+               fields=['RODOVIA', 'COD_SRE', 'KM_INICIAL', 'KM_FINAL', 'LOCAL_IN_', 'LOCAL_FIM',
+                       'TIPO_DE_RE'],
+               geometry_type='MultiLineString', crs=crs, driver='ESRI Shapefile')
+    
+    larguras = rng.choice([30.0, 40.0, 60.0, 80.0], n_feicoes)
+    faixas = shapely.buffer(eixos, larguras / 2, quad_segs=2)
+    gravar_ogr(str(destino / f"FXD{zona}.shp"), shapely.to_wkb(faixas),
+               [nomes_rodovia, codigos_sre, larguras],
+               fields=['RODOVIA', 'COD_SRE', 'LARGURA'],
+               geometry_type='MultiPolygon', crs=crs, driver='ESRI Shapefile')
+    
+    # Grade de municípios: ~1 por 25 feições do eixo (mínimo 16), alguns com furos
+    lado = max(4, int(np.ceil(np.sqrt(n_feicoes / 25))))
+    passo_x = (xmax - xmin) / lado
+    passo_y = (ymax - ymin) / lado
+    i, j = np.divmod(np.arange(lado * lado), lado)
+    celulas = shapely.box(xmin + i * passo_x, ymin + j * passo_y,
+                          xmin + (i + 1) * passo_x, ymin + (j + 1) * passo_y)
+    com_furo = (i + j) % 5 == 0
+    celulas[com_furo] = shapely.difference(celulas[com_furo], shapely.box(
+        xmin + (i[com_furo] + 0.4) * passo_x, ymin + (j[com_furo] + 0.4) * passo_y,
+        xmin + (i[com_furo] + 0.6) * passo_x, ymin + (j[com_furo] + 0.6) * passo_y))
+    nomes_municipio = np.array([f"MUNICIPIO {a}-{b}" for a, b in zip(i, j)], dtype=object)
+    
+    gravar_ogr(str(destino / f"municipios{zona}.shp"), shapely.to_wkb(celulas), [nomes_municipio],
+               fields=['NM_MUN'], geometry_type='Polygon', crs=crs, driver='ESRI Shapefile')
+    
+    marcador.write_text(json.dumps(parametros), encoding='utf-8')
+    return destino
+
+
+def gerar_pontos(destino: Path, n: int, zona: int = ZONA_BENCHMARK,
+                 semente: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pontos de consulta: metade perto dos eixos (até ~60 m), metade espalhada na área.
+    
+    Args:
+        destino: Pasta da rede sintética
+        n: Número de pontos
+        zona: Zona UTM
+        semente: Semente do gerador aleatório
+    
+    Returns:
+        Tupla (xs, ys)
+    """
+    import shapely
+    from pyogrio.raw import read as ler_ogr
+    
+    rng = np.random.default_rng(semente)
+    _, _, wkb, _ = ler_ogr(str(destino / f"shape{zona}.shp"), read_geometry=True, columns=[])
+    eixos = shapely.from_wkb(wkb)
+    
+    perto = n // 2
+    escolhidos = eixos[rng.integers(0, len(eixos), perto)]
+    pontos = shapely.line_interpolate_point(escolhidos, rng.uniform(0, 1, perto), normalized=True)
+    xs_perto = shapely.get_x(pontos) + rng.normal(0, 30, perto)
+    ys_perto = shapely.get_y(pontos) + rng.normal(0, 30, perto)
+    
+    xmin, ymin, xmax, ymax = AREA_BENCHMARK
+    xs = np.concatenate([xs_perto, rng.uniform(xmin, xmax, n - perto)])
+    ys = np.concatenate([ys_perto, rng.uniform(ymin, ymax, n - perto)])
+    
+    ordem = rng.permutation(n)
+    return xs[ordem], ys[ordem]
+
+
+# ============================================
+# MEDIÇÃO (PROCESSO ISOLADO)
+# ============================================
+
+def pico_memoria_mb() -> Optional[float]:
+    """Pico de memória residente do processo em MB (None se não for possível medir)."""
+    # No Linux, ru_maxrss herda o RSS do processo pai no fork (inclusive com spawn, que
+    # faz fork + exec); VmHWM é do próprio processo
+    try:
+        with open('/proc/self/status', encoding='ascii') as arq:
+            for linha in arq:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+    except ImportError:
+        pass
+    
+    try:
+        import psutil
+        memoria = psutil.Process().memory_info()
+        return getattr(memoria, 'peak_wset', memoria.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def medir_backend(backend: str, diretorio: str, zona: int, xs: np.ndarray, ys: np.ndarray,
+                  xs_lote: np.ndarray, ys_lote: np.ndarray) -> Dict[str, Any]:
+    """
+    Mede um motor de consulta sobre a rede sintética (executar em processo novo).
+    
+    Args:
+        backend: Motor de consulta ('qgis', 'shapely' ou 'snapshot')
+        diretorio: Pasta da rede sintética
+        zona: Zona UTM
+        xs, ys: Pontos das consultas individuais
+        xs_lote, ys_lote: Pontos da consulta em lote
+    
+    Returns:
+        Métricas da medição
+    """
+    cs.SHAPES_DIR = Path(diretorio)
+    metricas: Dict[str, Any] = {}
+    descarte = open(os.devnull, 'w', encoding='utf-8')
+    saida_original = sys.stdout
+    
+    try:
+        # Partida a frio: importação do motor, carga da zona e primeira consulta
+        inicio = time.perf_counter()
+        if backend == 'qgis':
+            from qgis.core import QgsApplication
+            QgsApplication.setPrefixPath(cs.QGIS_PATH, True)
+            qgs = QgsApplication([], False)
+            qgs.initQgis()
+        motor = cs.obter_backend(backend)
+        motor.CACHE_ZONAS.obter(zona)
+        metricas['carga_s'] = time.perf_counter() - inicio
+        
+        sys.stdout = descarte
+        motor.consultar_coordenadas(float(xs[0]), float(ys[0]), zona)
+        sys.stdout = saida_original
+        metricas['partida_fria_s'] = time.perf_counter() - inicio
+        
+        # Latência das consultas individuais (mensagens de diagnóstico descartadas)
+        latencias = np.empty(len(xs))
+        encontrados = 0
+        sys.stdout = descarte
+        for k, (x, y) in enumerate(zip(xs.tolist(), ys.tolist())):
+            inicio = time.perf_counter()
+            resultado = motor.consultar_coordenadas(x, y, zona)
+            latencias[k] = time.perf_counter() - inicio
+            encontrados += resultado is not None and not resultado['fora_do_limite']
+        sys.stdout = saida_original
+        
+        p50, p95, p99 = np.percentile(latencias * 1000, [50, 95, 99])
+        metricas.update({
+            'consultas': len(xs),
+            'encontrados': int(encontrados),
+            'latencia_p50_ms': float(p50),
+            'latencia_p95_ms': float(p95),
+            'latencia_p99_ms': float(p99),
+            'latencia_media_ms': float(latencias.mean() * 1000)
+        })
+        
+        # Vazão do lote
+        sys.stdout = descarte
+        inicio = time.perf_counter()
+        lote = motor.consultar_lote(xs_lote, ys_lote, zona)
+        segundos = time.perf_counter() - inicio
+        sys.stdout = saida_original
+        
+        metricas.update({
+            'pontos_lote': len(xs_lote),
+            'encontrados_lote': int(np.count_nonzero(lote['encontrado'])),
+            'lote_s': segundos,
+            'vazao_lote_pontos_s': len(xs_lote) / segundos if segundos > 0 else 0.0
+        })
+    finally:
+        sys.stdout = saida_original
+        descarte.close()
+    
+    metricas['pico_memoria_mb'] = pico_memoria_mb()
+    return metricas
+
+
+def compilar_snapshot(diretorio: str, zona: int) -> float:
+    """Compila o snapshot da rede sintética e devolve o tempo gasto (executar em processo novo)."""
+    cs.SHAPES_DIR = Path(diretorio)
+    import snapshot_zona as sz
+    
+    inicio = time.perf_counter()
+    sz.compilar_zona(zona)
+    return time.perf_counter() - inicio
+
+
+def executar_em_processo_novo(funcao, *args) -> Any:
+    """Executa a função em um interpretador novo (spawn), sem herdar memória nem caches."""
+    contexto = multiprocessing.get_context('spawn')
+    
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+        return pool.submit(funcao, *args).result()
+
+
+# ============================================
+# EXECUÇÃO E COMPARAÇÃO
+# ============================================
+
+def executar_benchmark(escalas: List[int], backends: List[str], pasta_dados: Path,
+                       consultas: int = CONSULTAS_PADRAO,
+                       tamanho_lote: int = TAMANHO_LOTE_PADRAO,
+                       vertices: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Gera as redes (se necessário) e mede cada motor em cada escala e densidade.
+    
+    Combinações com mais de MAX_VERTICES_REDE vértices são puladas.
+    
+    Args:
+        escalas: Números de feições do eixo
+        backends: Motores de consulta
+        pasta_dados: Pasta onde as redes sintéticas são gravadas (reaproveitadas entre execuções)
+        consultas: Consultas individuais medidas
+        tamanho_lote: Pontos da consulta em lote
+        vertices: Vértices por trecho de cada rede (padrão: VERTICES_PADRAO)
+    
+    Returns:
+        Resultado completo (ambiente e medições), serializável em JSON
+    """
+    medicoes = []
+    
+    for escala, n_vertices in ((e, v) for e in escalas for v in (vertices or VERTICES_PADRAO)):
+        if escala * n_vertices > MAX_VERTICES_REDE:
+            print(f"\n⏭️  {escala} feições x {n_vertices} vértices: acima de {MAX_VERTICES_REDE} vértices, pulada")
+            continue
+        
+        print(f"\n🔧 Rede sintética com {escala} feições de {n_vertices} vértices...")
+        inicio = time.perf_counter()
+        diretorio = gerar_rede_sintetica(pasta_dados / f"rede_{escala}_v{n_vertices}", escala,
+                                         vertices_por_trecho=n_vertices)
+        print(f"   Pronta em {time.perf_counter() - inicio:.1f} s ({diretorio})")
+        
+        xs, ys = gerar_pontos(diretorio, consultas, semente=1)
+        xs_lote, ys_lote = gerar_pontos(diretorio, tamanho_lote, semente=2)
+        
+        for backend in backends:
+            print(f"   🔄 {cs.NOMES_BACKENDS[backend]}...")
+            medicao = {'escala': escala, 'vertices_por_trecho': n_vertices, 'backend': backend}
+            
+            if backend == 'snapshot':
+                # Compilação fora da partida a frio: só acontece quando os shapefiles mudam
+                medicao['compilacao_s'] = executar_em_processo_novo(
+                    compilar_snapshot, str(diretorio), ZONA_BENCHMARK)
+            
+            metricas = executar_em_processo_novo(medir_backend, backend, str(diretorio), ZONA_BENCHMARK,
+                                                 xs, ys, xs_lote, ys_lote)
+            medicao.update(metricas)
+            medicoes.append(medicao)
+            
+            print(f"      partida a frio {metricas['partida_fria_s']:.2f} s | "
+                  f"p50 {metricas['latencia_p50_ms']:.2f} ms | "
+                  f"p99 {metricas['latencia_p99_ms']:.2f} ms | "
+                  f"lote {metricas['vazao_lote_pontos_s']:.0f} pontos/s | "
+                  f"pico {metricas['pico_memoria_mb'] or 0:.0f} MB")
+    
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'processador': platform.processor() or platform.machine(),
+            'cpus': os.cpu_count(),
+            'numpy': np.__version__
+        },
+        'parametros': {
+            'consultas': consultas,
+            'tamanho_lote': tamanho_lote,
+            'zona': ZONA_BENCHMARK,
+            'versao_gerador': VERSAO_GERADOR
+        },
+        'medicoes': medicoes
+    }
+
+
+def comparar_resultados(atual: Dict[str, Any], base: Dict[str, Any],
+                        tolerancia: float = TOLERANCIA_REGRESSAO) -> List[str]:
+    """
+    Lista as métricas que pioraram além da tolerância em relação à base.
+    
+    Args:
+        atual: Resultado de executar_benchmark
+        base: Resultado anterior (mesmo formato)
+        tolerancia: Piora relativa aceita (0.2 = 20%)
+    
+    Returns:
+        Descrição de cada regressão (vazia se nenhuma)
+    """
+    def chave(m: Dict[str, Any]) -> Tuple[int, int, str]:
+        # Resultados gravados antes da densidade entrar no benchmark usavam o padrão do gerador
+        return m['escala'], m.get('vertices_por_trecho', VERTICES_POR_TRECHO), m['backend']
+    
+    anteriores = {chave(m): m for m in base.get('medicoes', [])}
+    regressoes = []
+    
+    for medicao in atual['medicoes']:
+        anterior = anteriores.get(chave(medicao))
+        if anterior is None:
+            continue
+        
+        for metrica, maior_melhor in METRICAS_COMPARADAS.items():
+            valor = medicao.get(metrica)
+            referencia = anterior.get(metrica)
+            if not valor or not referencia:
+                continue
+            
+            piora = (referencia / valor - 1) if maior_melhor else (valor / referencia - 1)
+            if piora > tolerancia:
+                regressoes.append(
+                    f"{medicao['backend']} {medicao['escala']} x {medicao['vertices_por_trecho']}v: {metrica} "
+                    f"{referencia:.3f} → {valor:.3f} ({piora:+.0%})"
+                )
+    
+    return regressoes
+
+
+# ============================================
+# MAIN - INTERFACE CLI
+# ============================================
+
+def main():
+    """Função principal - execução CLI."""
+    
+    parser = argparse.ArgumentParser(
+        description='Benchmark do pipeline de consulta sobre redes sintéticas',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos:
+  %(prog)s
+  %(prog)s --escalas 1000 10000 --backend snapshot shapely
+  %(prog)s --escalas 10000 --vertices 12 200 1000
+  %(prog)s --saida atual.json --comparar base.json
+        """
+    )
+    
+    backends_disponiveis = ['shapely', 'snapshot'] + (['qgis'] if cs.QGIS_DISPONIVEL else [])
+    
+    parser.add_argument('--escalas', type=int, nargs='+', default=ESCALAS_PADRAO,
+                       help=f'Feições do eixo em cada rede (padrão: {ESCALAS_PADRAO})')
+    parser.add_argument('--vertices', type=int, nargs='+', default=VERTICES_PADRAO,
+                       help=f'Vértices por trecho do eixo em cada rede (padrão: {VERTICES_PADRAO})')
+    parser.add_argument('--backend', nargs='+', choices=['qgis', 'shapely', 'snapshot'],
+                       default=backends_disponiveis,
+                       help=f'Motores medidos (padrão: {" ".join(backends_disponiveis)})')
+    parser.add_argument('--consultas', type=int, default=CONSULTAS_PADRAO,
+                       help=f'Consultas individuais medidas (padrão: {CONSULTAS_PADRAO})')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_PADRAO,
+                       help=f'Pontos da consulta em lote (padrão: {TAMANHO_LOTE_PADRAO})')
+    parser.add_argument('--dados', metavar='PASTA',
+                       default=str(Path(tempfile.gettempdir()) / "benchmark_consulta_sit"),
+                       help='Pasta das redes sintéticas (reaproveitadas entre execuções)')
+    parser.add_argument('--saida', '-o', metavar='ARQUIVO', default='benchmark_resultados.json',
+                       help='Arquivo JSON com os resultados (padrão: benchmark_resultados.json)')
+    parser.add_argument('--comparar', metavar='ARQUIVO',
+                       help='Resultado anterior; falha se alguma métrica piorar além da tolerância')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_REGRESSAO,
+                       help=f'Piora relativa aceita em --comparar (padrão: {TOLERANCIA_REGRESSAO})')
+    
+    args = parser.parse_args()
+    
+    if 'qgis' in args.backend and not cs.QGIS_DISPONIVEL:
+        parser.error('PyQGIS não encontrado; use --backend shapely snapshot')
+    
+    print("=" * 76)
+    print("  BENCHMARK - REDE SINTÉTICA")
+    print("=" * 76)
+    
+    try:
+        resultado = executar_benchmark(args.escalas, args.backend, Path(args.dados),
+                                       args.consultas, args.lote, args.vertices)
+        
+        Path(args.saida).write_text(json.dumps(resultado, indent=2, ensure_ascii=False),
+                                    encoding='utf-8')
+        print(f"\n📁 Resultados: {args.saida}")
+        exit_code = 0
+        
+        if args.comparar:
+            base = json.loads(Path(args.comparar).read_text(encoding='utf-8'))
+            regressoes = comparar_resultados(resultado, base, args.tolerancia)
+            
+            if regressoes:
+                print(f"\n❌ {len(regressoes)} regressões em relação a {args.comparar}:")
+                for regressao in regressoes:
+                    print(f"   {regressao}")
+                exit_code = 1
+            else:
+                print(f"\n✅ Sem regressões em relação a {args.comparar}")
+    
+    except Exception as e:
+        print(f"\n❌ ERRO CRÍTICO: {e}")
+        import traceback
+        traceback.print_exc()
+        exit_code = 2
+    
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistema de Consulta de Coordenadas - Cache Persistente de Resultados
+Guarda em um arquivo SQLite local o resultado de consultar_coordenadas,
+indexado pela zona e pelas coordenadas arredondadas a uma tolerância
+(pontos a menos de ~1 m caem na mesma chave), pelos raios de busca
+(DISTANCIA_MAXIMA_EIXO e DISTANCIA_MAXIMA_BUSCA, alterado por
+--raio-maximo) e pela versão dos shapefiles da zona (hash do conteúdo).
+Consultas repetidas voltam do arquivo sem tocar em nenhuma geometria,
+inclusive após reiniciar o programa; ao trocar os shapefiles, as
+entradas antigas deixam de valer. O hash fica guardado no próprio
+arquivo junto da assinatura rápida (tamanho/data) dos shapefiles, de
+modo que só é recalculado quando eles mudam.
+
+O arquivo tem tamanho limitado: ao passar de `max_entradas`, as
+entradas usadas há mais tempo são descartadas (LRU).
+
+Uso:
+    python consulta_standalone.py --x 510807 --y 8649627 --zona 24 --cache
+    python cache_resultados.py --estatisticas
+    python cache_resultados.py --limpar
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from typing import Tuple, Optional, Dict, Any, Callable
+
+import consulta_standalone as cs
+
+
+# ============================================
+# CONFIGURAÇÕES
+# ============================================
+
+# Arquivo padrão do cache, na pasta dos shapefiles
+NOME_ARQUIVO_CACHE = "cache_resultados.sqlite"
+
+# Lado (m) da célula de arredondamento das coordenadas
+TOLERANCIA_PADRAO = 1.0
+
+# Número máximo de resultados guardados
+MAX_ENTRADAS_PADRAO = 200000
+
+# Fração das entradas descartada de uma vez quando o limite é atingido
+FRACAO_DESCARTE = 0.1
+
+# Ordem de uso (LRU) da próxima leitura ou gravação, tirada do próprio arquivo
+PROXIMO_USO = "(SELECT COALESCE(MAX(uso), 0) + 1 FROM resultados)"
+
+
+# ============================================
+# PARÂMETROS DA CONSULTA
+# ============================================
+
+def parametros_busca() -> str:
+    """
+    Raios de busca em vigor, que mudam o resultado da consulta e por isso fazem parte da chave.
+    
+    Returns:
+        Texto 'DISTANCIA_MAXIMA_EIXO/DISTANCIA_MAXIMA_BUSCA' (p.ex. '200/5000')
+    """
+    return f"{cs.DISTANCIA_MAXIMA_EIXO:g}/{cs.DISTANCIA_MAXIMA_BUSCA:g}"
+
+
+# ============================================
+# CACHE EM SQLITE
+# ============================================
+
+class CacheResultados:
+    """
+    Cache persistente dos resultados de consulta por (zona, x, y) arredondados
+    e raios de busca (parametros_busca).
+    
+    Pode ser compartilhado entre threads e entre processos: a versão dos
+    dados de cada zona, o número de entradas e a ordem de uso ficam no
+    arquivo. Só os contadores de acertos e falhas valem para o processo
+    atual (ver estatisticas()).
+    
+    Args:
+        caminho: Arquivo SQLite, criado se não existir (padrão: NOME_ARQUIVO_CACHE
+            na pasta dos shapefiles)
+        tolerancia: Lado (m) da célula de arredondamento das coordenadas
+        max_entradas: Número máximo de resultados guardados
+    """
+    
+    def __init__(self, caminho: Optional[Path] = None,
+                 tolerancia: float = TOLERANCIA_PADRAO,
+                 max_entradas: int = MAX_ENTRADAS_PADRAO):
+        if tolerancia <= 0:
+            raise ValueError(f"Tolerância deve ser positiva: {tolerancia}")
+        
+        self.caminho = Path(caminho) if caminho else cs.SHAPES_DIR / NOME_ARQUIVO_CACHE
+        self.tolerancia = tolerancia
+        self.max_entradas = max_entradas
+        self.acertos = 0
+        self.falhas = 0
+        
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(str(self.caminho), check_same_thread=False)
+        
+        # Arquivos gravados antes dos raios de busca entrarem na chave são descartados
+        colunas = [linha[1] for linha in self._conexao.execute("PRAGMA table_info(resultados)")]
+        if colunas and 'parametros' not in colunas:
+            self._conexao.execute("DROP TABLE resultados")
+            self._conexao.execute("DROP TABLE IF EXISTS contagem")
+        
+        self._conexao.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS resultados (
+                zona INTEGER NOT NULL,
+                ix INTEGER NOT NULL,
+                iy INTEGER NOT NULL,
+                tolerancia REAL NOT NULL,
+                parametros TEXT NOT NULL,
+                versao TEXT NOT NULL,
+                resultado TEXT,
+                uso INTEGER NOT NULL,
+                PRIMARY KEY (zona, ix, iy, tolerancia, parametros)
+            );
+            CREATE INDEX IF NOT EXISTS resultados_uso ON resultados (uso);
+            
+            -- Hash do conteúdo dos shapefiles de cada zona e a assinatura em que foi calculado
+            CREATE TABLE IF NOT EXISTS versoes (
+                zona INTEGER PRIMARY KEY,
+                assinatura TEXT NOT NULL,
+                hash TEXT NOT NULL
+            );
+            
+            -- Número de entradas, mantido pelos gatilhos (vale para todos os processos)
+            CREATE TABLE IF NOT EXISTS contagem (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                entradas INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO contagem SELECT 0, COUNT(*) FROM resultados;
+            CREATE TRIGGER IF NOT EXISTS resultados_inclusao AFTER INSERT ON resultados
+            BEGIN
+                UPDATE contagem SET entradas = entradas + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS resultados_exclusao AFTER DELETE ON resultados
+            BEGIN
+                UPDATE contagem SET entradas = entradas - 1;
+            END;
+        """)
+        
+        # Versão já conferida de cada zona: (assinatura, hash); entradas de versões antigas são removidas uma vez
+        self._versoes_conferidas: Dict[int, Tuple[str, str]] = {}
+    
+    def _chave(self, x: float, y: float, zona: int) -> Tuple[int, int, int, float, str]:
+        """Chave da célula que contém o ponto, com os raios de busca em vigor."""
+        return zona, int(x // self.tolerancia), int(y // self.tolerancia), self.tolerancia, parametros_busca()
+    
+    @property
+    def _entradas(self) -> int:
+        """Número de entradas guardadas no arquivo."""
+        return self._conexao.execute("SELECT entradas FROM contagem").fetchone()[0]
+    
+    def _versao_dados(self, zona: int, assinatura: str) -> str:
+        """
+        Versão (hash do conteúdo) dos shapefiles da zona.
+        
+        O hash guardado no arquivo vale enquanto a assinatura rápida
+        (tamanho/data dos arquivos) for a mesma; só é recalculado, e
+        regravado, quando ela muda.
+        
+        Args:
+            zona: Zona UTM
+            assinatura: Assinatura atual das fontes (JSON de assinatura_fontes)
+        
+        Returns:
+            Hash hexadecimal
+        """
+        linha = self._conexao.execute(
+            "SELECT assinatura, hash FROM versoes WHERE zona = ?", (zona,)
+        ).fetchone()
+        
+        if linha is not None and linha[0] == assinatura:
+            return linha[1]
+        
+        versao = cs.hash_fontes(zona)
+        self._conexao.execute(
+            "INSERT OR REPLACE INTO versoes (zona, assinatura, hash) VALUES (?, ?, ?)",
+            (zona, assinatura, versao)
+        )
+        self._conexao.commit()
+        return versao
+    
+    def _conferir_versao(self, zona: int) -> str:
+        """Versão atual da zona; na primeira vez (ou se mudou) descarta as entradas antigas."""
+        assinatura = json.dumps(cs.assinatura_fontes(zona))
+        conferida = self._versoes_conferidas.get(zona)
+        
+        if conferida is not None and conferida[0] == assinatura:
+            return conferida[1]
+        
+        versao = self._versao_dados(zona, assinatura)
+        self._conexao.execute("DELETE FROM resultados WHERE zona = ? AND versao != ?", (zona, versao))
+        self._conexao.commit()
+        self._versoes_conferidas[zona] = (assinatura, versao)
+        
+        return versao
+    
+    def obter(self, x: float, y: float, zona: int) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Busca o resultado guardado para o ponto.
+        
+        Args:
+            x, y: Coordenadas UTM
+            zona: Zona UTM
+        
+        Returns:
+            Tupla (encontrado, resultado); o resultado pode ser None quando a
+            própria consulta guardada não achou nada
+        """
+        chave = self._chave(x, y, zona)
+        
+        with self._lock:
+            versao = self._conferir_versao(zona)
+            linha = self._conexao.execute(
+                "SELECT resultado FROM resultados "
+                "WHERE zona = ? AND ix = ? AND iy = ? AND tolerancia = ? AND parametros = ? AND versao = ?",
+                (*chave, versao)
+            ).fetchone()
+            
+            if linha is None:
+                self.falhas += 1
+                return False, None
+            
+            self.acertos += 1
+            self._conexao.execute(
+                f"UPDATE resultados SET uso = {PROXIMO_USO} "
+                "WHERE zona = ? AND ix = ? AND iy = ? AND tolerancia = ? AND parametros = ?",
+                chave
+            )
+            self._conexao.commit()
+        
+        return True, json.loads(linha[0])
+    
+    def guardar(self, x: float, y: float, zona: int, resultado: Optional[Dict[str, Any]]) -> None:
+        """
+        Guarda o resultado da consulta do ponto (None também é guardado).
+        
+        Args:
+            x, y: Coordenadas UTM
+            zona: Zona UTM
+            resultado: Resultado de consultar_coordenadas
+        """
+        chave = self._chave(x, y, zona)
+        
+        # As métricas (instrumentacao.py) valem só para a consulta que as mediu
+        if resultado is not None and 'metricas' in resultado:
+            resultado = {k: v for k, v in resultado.items() if k != 'metricas'}
+        
+        texto = json.dumps(resultado, ensure_ascii=False, default=str)
+        
+        with self._lock:
+            versao = self._conferir_versao(zona)
+            self._conexao.execute(
+                "INSERT OR IGNORE INTO resultados "
+                "(zona, ix, iy, tolerancia, parametros, versao, resultado, uso) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, {PROXIMO_USO})",
+                (*chave, versao, texto)
+            )
+            
+            if self._entradas > self.max_entradas:
+                self._descartar_antigas()
+            
+            self._conexao.commit()
+    
+    def _descartar_antigas(self) -> None:
+        """Descarta as entradas usadas há mais tempo (LRU), deixando folga abaixo do limite."""
+        manter = int(self.max_entradas * (1 - FRACAO_DESCARTE))
+        self._conexao.execute(
+            "DELETE FROM resultados WHERE uso <= ("
+            "SELECT uso FROM resultados ORDER BY uso DESC LIMIT 1 OFFSET ?)",
+            (manter,)
+        )
+    
+    def consultar(self, x: float, y: float, zona: int,
+                  funcao_consulta: Callable = None) -> Optional[Dict[str, Any]]:
+        """
+        Consulta com cache: devolve o resultado guardado ou consulta e guarda.
+        
+        Args:
+            x, y: Coordenadas UTM
+            zona: Zona UTM
+            funcao_consulta: Consulta usada nas falhas (padrão: consultar_coordenadas)
+        
+        Returns:
+            Resultado no formato de consultar_coordenadas
+        """
+        encontrado, resultado = self.obter(x, y, zona)
+        if encontrado:
+            return resultado
+        
+        resultado = (funcao_consulta or cs.consultar_coordenadas)(x, y, zona)
+        self.guardar(x, y, zona, resultado)
+        return resultado
+    
+    def limpar(self) -> None:
+        """Remove todas as entradas do arquivo."""
+        with self._lock:
+            self._conexao.execute("DELETE FROM resultados")
+            self._conexao.commit()
+    
+    def estatisticas(self) -> Dict[str, Any]:
+        """Acertos, falhas e taxa de acerto do processo, e entradas guardadas no arquivo."""
+        total = self.acertos + self.falhas
+        
+        with self._lock:
+            entradas = self._entradas
+        
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': self.acertos / total if total else 0.0,
+            'entradas': entradas,
+            'max_entradas': self.max_entradas,
+            'arquivo': str(self.caminho)
+        }
+    
+    def fechar(self) -> None:
+        """Fecha o arquivo."""
+        with self._lock:
+            self._conexao.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+# ============================================
+# MAIN - INTERFACE CLI
+# ============================================
+
+def main():
+    """Função principal - manutenção do cache."""
+    
+    parser = argparse.ArgumentParser(
+        description='Manutenção do cache persistente de resultados de consulta',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos:
+  %(prog)s --estatisticas
+  %(prog)s --limpar
+        """
+    )
+    
+    parser.add_argument('--arquivo', metavar='ARQUIVO',
+                       help=f'Arquivo do cache (padrão: LARGURAS FXD/{NOME_ARQUIVO_CACHE})')
+    parser.add_argument('--estatisticas', action='store_true',
+                       help='Exibe o número de entradas guardadas')
+    parser.add_argument('--limpar', action='store_true',
+                       help='Remove todas as entradas')
+    
+    args = parser.parse_args()
+    
+    if not args.estatisticas and not args.limpar:
+        parser.error('informe --estatisticas ou --limpar')
+    
+    with CacheResultados(args.arquivo) as cache:
+        if args.limpar:
+            cache.limpar()
+            print(f"🗑️  Cache limpo: {cache.caminho}")
+        
+        if args.estatisticas:
+            estatisticas = cache.estatisticas()
+            print(f"📁 Arquivo:  {estatisticas['arquivo']}")
+            print(f"📊 Entradas: {estatisticas['entradas']} (máximo {estatisticas['max_entradas']})")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,9 +22,14 @@ from qgis.core import (
     QgsPointXY,
     QgsGeometry,
     QgsCoordinateReferenceSystem,
-    QgsFeature
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsRectangle
 )
 
+from referencia_linear import RedeLinear
+from consulta_standalone import buscar_em_aneis
+
 
 # ============================================
 # CONFIGURAÇÕES GLOBAIS
@@ -51,6 +56,12 @@ PREFIXOS_SHAPEFILES = ['shape']
 PREFIXOS_FXD = ['FXD']
 PREFIXOS_MUNICIPIOS = ['municipios']
 
+# Distância máxima (m) entre o ponto e o eixo para aceitar a feição
+DISTANCIA_MAXIMA_EIXO = 200
+
+# Raio máximo (m) da busca pela rodovia mais próxima além do limite
+DISTANCIA_MAXIMA_BUSCA = 5000
+
 
 def limpar_tela():
     """Limpa a tela do console."""
@@ -140,16 +151,77 @@ def encontrar_shapefiles():
     return shapefiles
 
 
+# Cache de camadas e feições por caminho de shapefile (mantido entre consultas)
+_CACHE_CAMADAS = {}
+
+
 def carregar_camada(shapefile_path, nome_camada):
-    """Carrega um shapefile como camada QGIS."""
+    """
+    Carrega um shapefile como camada QGIS.
+    
+    A camada e suas feições ficam em cache, de modo que as consultas
+    seguintes do loop interativo não reabram o shapefile.
+    """
+    chave = str(shapefile_path)
+    
+    if chave in _CACHE_CAMADAS:
+        return _CACHE_CAMADAS[chave][0]
+    
     camada = QgsVectorLayer(str(shapefile_path), nome_camada, "ogr")
     
     if not camada.isValid():
         return None
     
+    _CACHE_CAMADAS[chave] = (camada, list(camada.getFeatures()))
     return camada
 
 
+def obter_features(shapefile_path, nome_camada):
+    """Retorna as feições (em cache) de um shapefile, ou None se inválido."""
+    if carregar_camada(shapefile_path, nome_camada) is None:
+        return None
+    
+    return _CACHE_CAMADAS[str(shapefile_path)][1]
+
+
+def buscar_eixos_proximos(camada, ponto, geom_ponto):
+    """
+    Busca os eixos mais próximos do ponto em anéis crescentes.
+    
+    Cada anel pede à camada apenas as feições cujo retângulo envolvente
+    toca o quadrado do anel (QgsFeatureRequest.setFilterRect); só essas
+    têm a distância exata medida. O primeiro anel é o limite de
+    DISTANCIA_MAXIMA_EIXO; sem eixo nele, o raio cresce até
+    DISTANCIA_MAXIMA_BUSCA (ver consulta_standalone.buscar_em_aneis).
+    
+    Returns:
+        Lista de (distância, feição) ordenada por distância; vazia se não
+        houver eixo a até DISTANCIA_MAXIMA_BUSCA
+    """
+    feicoes = {}
+    
+    def candidatos_no_retangulo(raio):
+        retangulo = QgsRectangle(ponto.x() - raio, ponto.y() - raio,
+                                 ponto.x() + raio, ponto.y() + raio)
+        ids = []
+        for feature in camada.getFeatures(QgsFeatureRequest().setFilterRect(retangulo)):
+            feicoes.setdefault(feature.id(), feature)
+            ids.append(feature.id())
+        return ids
+    
+    def medir_distancias(ids):
+        return [feicoes[fid].geometry().distance(geom_ponto) for fid in ids]
+    
+    proximos = buscar_em_aneis(candidatos_no_retangulo, medir_distancias,
+                               DISTANCIA_MAXIMA_EIXO, DISTANCIA_MAXIMA_BUSCA)
+    return [(distancia, feicoes[fid]) for distancia, fid in proximos]
+
+
+def invalidate():
+    """Descarta o cache de camadas (usar quando os shapefiles mudarem)."""
+    _CACHE_CAMADAS.clear()
+
+
 def consultar_coordenadas(x, y, zona):
     """
     Realiza a consulta das coordenadas nos shapefiles.
@@ -209,30 +281,17 @@ def consultar_coordenadas(x, y, zona):
                            todas_features: List) -> float:
         """Calcula o KM no eixo com detecção inteligente de orientação."""
         
+        # Todas as partes da linha (multiparte), projetadas de uma vez
         if geometria.isMultipart():
-            linha = geometria.asMultiPolyline()[0]
+            partes = geometria.asMultiPolyline()
         else:
-            linha = geometria.asPolyline()
+            partes = [geometria.asPolyline()]
         
-        ponto_mais_proximo = geometria.nearestPoint(QgsGeometry.fromPointXY(ponto))
-        distancia_total = geometria.length()
-        distancia_percorrida = 0.0
+        rede = RedeLinear.de_partes([[[(p.x(), p.y()) for p in parte] for parte in partes]])
+        projecao = rede.projetar([0], [ponto.x()], [ponto.y()])
         
-        ponto_proximo_coords = ponto_mais_proximo.asPoint()
-        
-        for i in range(len(linha) - 1):
-            p1 = linha[i]
-            p2 = linha[i + 1]
-            
-            segmento = QgsGeometry.fromPolylineXY([p1, p2])
-            ponto_proximo_segmento = segmento.nearestPoint(QgsGeometry.fromPointXY(ponto_proximo_coords))
-            
-            if ponto_proximo_segmento.asPoint().distance(ponto_proximo_coords) < 0.01:
-                distancia_p1_proximo = QgsGeometry.fromPointXY(p1).distance(ponto_proximo_segmento)
-                distancia_percorrida += distancia_p1_proximo
-                break
-            else:
-                distancia_percorrida += segmento.length()
+        distancia_total = float(projecao['comprimento'][0])
+        distancia_percorrida = float(projecao['ao_longo'][0])
         
         percentual = (distancia_percorrida / distancia_total) * 100 if distancia_total > 0 else 0
         
@@ -364,11 +423,11 @@ def consultar_coordenadas(x, y, zona):
             if f"{zona}" not in nome:
                 continue
             
-            camada_fxd = carregar_camada(shp_path, "FXD")
-            if not camada_fxd:
+            features_fxd = obter_features(shp_path, "FXD")
+            if features_fxd is None:
                 continue
             
-            for feature in camada_fxd.getFeatures():
+            for feature in features_fxd:
                 geom = feature.geometry()
                 if geom.contains(geom_ponto):
                     resultado['dentro_fxd'] = True
@@ -385,11 +444,11 @@ def consultar_coordenadas(x, y, zona):
             if f"{zona}" not in nome:
                 continue
             
-            camada_muni = carregar_camada(shp_path, "Municipios")
-            if not camada_muni:
+            features_muni = obter_features(shp_path, "Municipios")
+            if features_muni is None:
                 continue
             
-            for feature in camada_muni.getFeatures():
+            for feature in features_muni:
                 geom = feature.geometry()
                 if geom.contains(geom_ponto):
                     resultado['municipio'] = feature.attribute('NM_MUN')
@@ -405,23 +464,16 @@ def consultar_coordenadas(x, y, zona):
             if f"{zona}" not in nome:
                 continue
             
-            camada_shape = carregar_camada(shp_path, "Eixos")
-            if not camada_shape:
+            todas_features = obter_features(shp_path, "Eixos")
+            if todas_features is None:
                 continue
             
-            todas_features = list(camada_shape.getFeatures())
-            melhor_feature = None
-            menor_distancia = float('inf')
+            # Filtro por retângulo na camada e distância exata só nos anéis necessários
+            proximos = buscar_eixos_proximos(carregar_camada(shp_path, "Eixos"), ponto_consulta, geom_ponto)
             
-            for feature in todas_features:
-                geom = feature.geometry()
-                distancia = geom.distance(geom_ponto)
+            if proximos:
+                menor_distancia, melhor_feature = proximos[0]
                 
-                if distancia <= 200 and distancia < menor_distancia:
-                    menor_distancia = distancia
-                    melhor_feature = feature
-            
-            if melhor_feature:
                 km_calculado = calcular_km_no_eixo(
                     ponto_consulta,
                     melhor_feature.geometry(),
@@ -441,7 +493,8 @@ def consultar_coordenadas(x, y, zona):
                     'largura_fxd': melhor_feature.attribute('LARGURA_FX'),
                     'pavimentacao': melhor_feature.attribute('PAVIMENTAC'),
                     'km_calculado': km_calculado,
-                    'distancia_eixo': round(menor_distancia, 2)
+                    'distancia_eixo': round(menor_distancia, 2),
+                    'fora_do_limite': menor_distancia > DISTANCIA_MAXIMA_EIXO
                 }
                 break
     
@@ -474,6 +527,9 @@ def exibir_resultado(resultado):
         print(f"LARGURA FXD:       {info['largura_fxd']}")
         print(f"PAVIMENTAÇÃO:      {info['pavimentacao']}")
         print(f"DISTÂNCIA DO EIXO: {info['distancia_eixo']:.2f} m")
+        
+        if info['fora_do_limite']:
+            print(f"\n⚠️  Nenhum eixo a menos de {DISTANCIA_MAXIMA_EIXO} m: exibida a rodovia mais próxima.")
     else:
         print("❌ Nenhum eixo rodoviário encontrado próximo ao ponto.")
         if resultado['municipio']:
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistema de Consulta de Coordenadas - Consulta Inversa (Rodovia + KM → UTM)
+Localiza o ponto do eixo correspondente a um KM de uma rodovia ("BA-099
+km 57,3") e devolve X/Y/zona, o trecho e a largura da FXD no local.
+
+Usa a mesma lógica de KM_INICIAL/KM_FINAL e orientação da consulta
+direta (continuidade.calcular_proporcao_por_km) sobre os snapshots das
+zonas (snapshot_zona.py). Para cada rodovia é montado um índice de
+intervalos de KM ordenado, de modo que cada consulta é uma busca
+binária; milhares de pares (rodovia, KM) são resolvidos por chamada.
+
+Uso:
+    python consulta_inversa.py --rodovia BA-099 --km 57,3
+    python consulta_inversa.py --rodovia BA-099 --km 057+300
+    python consulta_inversa.py --csv marcos.csv --saida marcos_utm.csv
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+import re
+import sys
+import csv
+import time
+import argparse
+from pathlib import Path
+from typing import Tuple, Optional, Dict, Any, List
+
+import numpy as np
+
+import consulta_standalone as cs
+import snapshot_zona as sz
+from continuidade import calcular_proporcao_por_km
+
+
+# Colunas do resultado da consulta inversa em lote
+COLUNAS_INVERSA = [
+    'rodovia', 'km', 'encontrado', 'zona', 'x', 'y', 'codigo_sre', 'trecho',
+    'municipio', 'dentro_fxd', 'largura_fxd', 'jurisdicao'
+]
+
+# Colunas acrescentadas a cada linha da planilha de saída
+COLUNAS_SAIDA_CSV = [
+    'X_UTM', 'Y_UTM', 'ZONA', 'STATUS', 'CODIGO_SRE', 'TRECHO', 'MUNICIPIO',
+    'DENTRO_FXD', 'LARGURA_FXD', 'JURISDICAO'
+]
+
+
+# ============================================
+# NORMALIZAÇÃO DA ENTRADA
+# ============================================
+
+def normalizar_rodovia(rodovia: Any) -> str:
+    """
+    Chave de comparação da rodovia: "BA-099", "BA 099", "ba099" e "099" são iguais.
+    
+    Args:
+        rodovia: Texto informado ou valor do campo RODOVIA
+    
+    Returns:
+        Chave normalizada (vazia se não houver rodovia)
+    """
+    if rodovia is None:
+        return ''
+    
+    chave = re.sub(r'[^0-9A-Z]', '', str(rodovia).upper())
+    
+    # Rodovias estaduais aparecem com e sem o prefixo BA (ver formatar_resultado)
+    if chave.startswith('BA'):
+        chave = chave[2:]
+    
+    return chave.lstrip('0') or chave
+
+
+def ler_km(texto: str) -> float:
+    """
+    Converte o KM informado em número: "57,3", "57.3" ou "057+300" (km + metros).
+    
+    Args:
+        texto: KM como digitado ou lido da planilha
+    
+    Returns:
+        KM
+    """
+    texto = texto.strip()
+    
+    if '+' in texto:
+        km, metros = texto.split('+', 1)
+        return int(km) + cs.ler_numero(metros) / 1000
+    
+    return cs.ler_numero(texto)
+
+
+# ============================================
+# ÍNDICE DE INTERVALOS DE KM
+# ============================================
+
+class IndiceQuilometrico:
+    """
+    Intervalos de KM dos trechos de cada rodovia de uma zona.
+    
+    Por rodovia, os trechos ficam ordenados pelo menor KM, com o maior KM
+    acumulado até cada posição; o trecho que contém um KM é achado por
+    busca binária (np.searchsorted), voltando apenas enquanto algum trecho
+    anterior ainda alcança o KM (trechos sobrepostos).
+    
+    Args:
+        dados: Dados da zona (snapshot_zona.DadosZonaSnapshot)
+    """
+    
+    def __init__(self, dados: sz.DadosZonaSnapshot):
+        self.dados = dados
+        self._rodovias: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._nomes: Dict[str, Any] = {}
+        
+        shape = dados.shape
+        if not shape.existe:
+            return
+        
+        # Campos de KM pelo mesmo critério de extrair_campos_km
+        campos_km = cs.extrair_campos_km({nome: nome for nome in shape.nomes_campos})
+        if None in campos_km:
+            return
+        
+        comprimentos = shape.rede.comprimentos(np.arange(len(shape)))
+        intervalos: Dict[str, List[Tuple[float, float, int]]] = {}
+        
+        for feicao, atributos in enumerate(shape.linhas(['RODOVIA', *campos_km])):
+            rodovia = normalizar_rodovia(atributos.get('RODOVIA'))
+            km_inicial = atributos.get(campos_km[0])
+            km_final = atributos.get(campos_km[1])
+            
+            if not rodovia or km_inicial is None or km_final is None or comprimentos[feicao] == 0:
+                continue
+            
+            self._nomes.setdefault(rodovia, atributos['RODOVIA'])
+            intervalos.setdefault(rodovia, []).append(
+                (min(km_inicial, km_final), max(km_inicial, km_final), feicao)
+            )
+        
+        for rodovia, trechos in intervalos.items():
+            trechos.sort()
+            inicios, fins, feicoes = (np.array(coluna) for coluna in zip(*trechos))
+            self._rodovias[rodovia] = (inicios, fins, np.maximum.accumulate(fins),
+                                       feicoes.astype(np.int64))
+    
+    def rodovias(self) -> List[str]:
+        """Chaves normalizadas das rodovias da zona."""
+        return sorted(self._rodovias)
+    
+    def nome(self, rodovia: Any) -> Any:
+        """Valor original do campo RODOVIA (primeiro trecho), ou None."""
+        return self._nomes.get(normalizar_rodovia(rodovia))
+    
+    def extensao(self, rodovia: Any) -> Optional[Tuple[float, float]]:
+        """Menor e maior KM dos trechos da rodovia na zona, ou None."""
+        entrada = self._rodovias.get(normalizar_rodovia(rodovia))
+        if entrada is None:
+            return None
+        
+        return float(entrada[0][0]), float(entrada[2][-1])
+    
+    def localizar(self, rodovia: Any, kms: np.ndarray) -> np.ndarray:
+        """
+        Trecho (índice da feição do eixo) que contém cada KM da rodovia.
+        
+        Args:
+            rodovia: Rodovia (qualquer grafia aceita por normalizar_rodovia)
+            kms: KMs procurados
+        
+        Returns:
+            Índices das feições; -1 onde o KM não pertence a nenhum trecho
+        """
+        kms = np.asarray(kms, dtype=float)
+        feicoes = np.full(len(kms), -1, dtype=np.int64)
+        
+        entrada = self._rodovias.get(normalizar_rodovia(rodovia))
+        if entrada is None:
+            return feicoes
+        
+        inicios, fins, alcance, indices = entrada
+        
+        # Último trecho que começa antes do KM; na maioria das vezes é ele que o contém
+        posicoes = np.searchsorted(inicios, kms, side='right') - 1
+        
+        for k, j in enumerate(posicoes.tolist()):
+            km = kms[k]
+            while j >= 0 and alcance[j] >= km:
+                if fins[j] >= km:
+                    feicoes[k] = indices[j]
+                    break
+                j -= 1
+        
+        return feicoes
+
+
+# Índices de cada zona, montados na primeira consulta sobre o snapshot da zona
+CACHE_INDICES = cs.CacheZonas(lambda zona: IndiceQuilometrico(sz.CACHE_ZONAS.obter(zona)))
+
+
+# ============================================
+# CONSULTA INVERSA
+# ============================================
+
+def posicionar_km(dados: sz.DadosZonaSnapshot, feicoes: np.ndarray,
+                  kms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ponto de cada KM no eixo do trecho que o contém (ver IndiceQuilometrico.localizar).
+    
+    A posição ao longo do eixo segue a mesma orientação da consulta direta
+    (calcular_proporcao_por_km); os atributos de cada trecho são lidos uma
+    única vez, mesmo com muitos KMs no mesmo trecho.
+    
+    Args:
+        dados: Dados da zona
+        feicoes: Feição do eixo de cada KM
+        kms: KMs
+    
+    Returns:
+        Tupla (xs, ys) em UTM da zona
+    """
+    feicoes = np.asarray(feicoes, dtype=np.int64)
+    kms = np.asarray(kms, dtype=float)
+    distancias = np.empty(len(kms))
+    comprimentos = dados.shape.rede.comprimentos(feicoes)
+    trechos: Dict[int, Tuple[Dict[str, Any], Any, Any]] = {}
+    
+    for k, feicao in enumerate(feicoes.tolist()):
+        if feicao not in trechos:
+            atributos = dados.shape.atributos(feicao)
+            trechos[feicao] = (atributos, *cs.extrair_campos_km(atributos))
+        
+        atributos, km_inicial, km_final = trechos[feicao]
+        proporcao = calcular_proporcao_por_km(kms[k], km_inicial, km_final,
+                                              atributos, dados.continuidade)
+        distancias[k] = proporcao * comprimentos[k]
+    
+    return dados.shape.rede.interpolar(feicoes, distancias)
+
+
+def localizar_km_lote(rodovias: List[Any], kms) -> Dict[str, Any]:
+    """
+    Consulta inversa em lote: ponto do eixo de cada par (rodovia, KM).
+    
+    As zonas são percorridas em ordem; cada par fica com a primeira zona
+    em que a rodovia tiver um trecho contendo o KM.
+    
+    Args:
+        rodovias: Rodovia de cada par (ex: "BA-099")
+        kms: KM de cada par
+    
+    Returns:
+        Dicionário de colunas (COLUNAS_INVERSA), uma posição por par;
+        'encontrado' False onde o KM não foi localizado
+    """
+    kms = np.asarray(kms, dtype=float)
+    n = len(kms)
+    
+    colunas: Dict[str, Any] = {
+        'rodovia': list(rodovias),
+        'km': kms,
+        'encontrado': np.zeros(n, dtype=bool),
+        'zona': np.zeros(n, dtype=int),
+        'x': np.full(n, np.nan),
+        'y': np.full(n, np.nan),
+        'codigo_sre': [None] * n,
+        'trecho': [None] * n,
+        'municipio': [None] * n,
+        'dentro_fxd': np.zeros(n, dtype=bool),
+        'largura_fxd': [None] * n,
+        'jurisdicao': [None] * n
+    }
+    
+    chaves = np.array([normalizar_rodovia(r) for r in rodovias], dtype=object)
+    pendentes = np.ones(n, dtype=bool)
+    
+    for zona in cs.ZONA_EPSG:
+        if not pendentes.any():
+            break
+        
+        indice = CACHE_INDICES.obter(zona)
+        dados = indice.dados
+        feicoes = np.full(n, -1, dtype=np.int64)
+        
+        for chave in set(chaves[pendentes].tolist()):
+            selecionados = np.flatnonzero(pendentes & (chaves == chave))
+            feicoes[selecionados] = indice.localizar(chave, kms[selecionados])
+        
+        achados = np.flatnonzero(feicoes >= 0)
+        if len(achados) == 0:
+            continue
+        
+        xs, ys = posicionar_km(dados, feicoes[achados], kms[achados])
+        
+        for k, i in enumerate(achados.tolist()):
+            x, y = float(xs[k]), float(ys[k])
+            km_inicial, km_final = cs.extrair_campos_km(dados.shape.atributos(int(feicoes[i])))
+            eixo = (0.0, int(feicoes[i]), km_inicial, km_final, float(kms[i]))
+            
+            fxd_info = sz.localizar_fxd(dados, x, y)
+            municipio = sz.localizar_municipio(dados, x, y)
+            campos = cs.formatar_resultado(
+                cs.montar_resultado(dados, eixo, fxd_info is not None, fxd_info, municipio)
+            )
+            
+            colunas['encontrado'][i] = True
+            colunas['zona'][i] = zona
+            colunas['x'][i] = x
+            colunas['y'][i] = y
+            colunas['dentro_fxd'][i] = campos['dentro_fxd']
+            for campo in ['codigo_sre', 'trecho', 'municipio', 'largura_fxd', 'jurisdicao']:
+                colunas[campo][i] = campos[campo]
+        
+        pendentes[achados] = False
+    
+    return colunas
+
+
+def localizar_km(rodovia: Any, km: float) -> Optional[Dict[str, Any]]:
+    """
+    Consulta inversa de um único par (rodovia, KM).
+    
+    Returns:
+        Dicionário com os campos de COLUNAS_INVERSA, ou None se o KM não
+        pertencer a nenhum trecho da rodovia
+    """
+    lote = localizar_km_lote([rodovia], [km])
+    if not lote['encontrado'][0]:
+        return None
+    
+    return {
+        campo: valores[0].item() if isinstance(valores, np.ndarray) else valores[0]
+        for campo, valores in lote.items()
+    }
+
+
+# ============================================
+# PROCESSAMENTO DE PLANILHAS CSV
+# ============================================
+
+def _consultar_bloco_csv(bloco: List[Tuple[List[str], Any, Optional[float]]], escritor) -> int:
+    """
+    Consulta e grava um bloco de linhas da planilha.
+    
+    Args:
+        bloco: Linhas como (valores originais, rodovia, km); km None quando não pôde ser lido
+        escritor: csv.writer da planilha de saída
+    
+    Returns:
+        Número de linhas localizadas
+    """
+    validos = [(rodovia, km) for _, rodovia, km in bloco if km is not None]
+    lote = localizar_km_lote([r for r, _ in validos], [k for _, k in validos])
+    
+    encontrados = 0
+    i = 0
+    
+    for valores, _, km in bloco:
+        if km is None:
+            escritor.writerow(valores + ['', '', '', 'KM INVALIDO'] + [''] * 6)
+            continue
+        
+        j = i
+        i += 1
+        
+        if not lote['encontrado'][j]:
+            escritor.writerow(valores + ['', '', '', 'NAO ENCONTRADO'] + [''] * 6)
+            continue
+        
+        encontrados += 1
+        escritor.writerow(valores + [
+            cs.formatar_numero(lote['x'][j], 2),
+            cs.formatar_numero(lote['y'][j], 2),
+            lote['zona'][j],
+            'OK',
+            lote['codigo_sre'][j] or '',
+            lote['trecho'][j] or '',
+            lote['municipio'][j] or '',
+            'SIM' if lote['dentro_fxd'][j] else 'NAO',
+            lote['largura_fxd'][j] or '',
+            lote['jurisdicao'][j] or ''
+        ])
+    
+    return encontrados
+
+
+def processar_csv(caminho_entrada: str, caminho_saida: Optional[str] = None,
+                  tamanho_bloco: int = cs.TAMANHO_BLOCO_CSV) -> Dict[str, Any]:
+    """
+    Consulta inversa de todas as linhas de uma planilha CSV com RODOVIA/KM.
+    
+    Mesmo formato de consulta_standalone.processar_csv (';', decimais com
+    vírgula), lida e gravada em fluxo, em blocos de `tamanho_bloco` linhas.
+    
+    Args:
+        caminho_entrada: Planilha de entrada
+        caminho_saida: Planilha de saída (padrão: <entrada>_utm.csv)
+        tamanho_bloco: Linhas consultadas por vez
+    
+    Returns:
+        Estatísticas: 'linhas', 'encontrados', 'segundos', 'linhas_por_segundo', 'saida'
+    """
+    entrada = Path(caminho_entrada)
+    saida = Path(caminho_saida) if caminho_saida else entrada.with_name(f"{entrada.stem}_utm.csv")
+    
+    inicio = time.monotonic()
+    linhas = 0
+    encontrados = 0
+    
+    with open(entrada, 'r', encoding='utf-8-sig', newline='') as arq_entrada, \
+         open(saida, 'w', encoding='utf-8-sig', newline='') as arq_saida:
+        leitor = csv.reader(arq_entrada, delimiter=';')
+        escritor = csv.writer(arq_saida, delimiter=';')
+        
+        cabecalho = next(leitor)
+        nomes = [c.strip().upper() for c in cabecalho]
+        
+        if 'RODOVIA' not in nomes or 'KM' not in nomes:
+            raise ValueError(f"Colunas RODOVIA/KM não encontradas em {entrada.name}: {cabecalho}")
+        
+        idx_rodovia = nomes.index('RODOVIA')
+        idx_km = nomes.index('KM')
+        escritor.writerow(cabecalho + COLUNAS_SAIDA_CSV)
+        
+        bloco = []
+        for valores in leitor:
+            if not any(v.strip() for v in valores):
+                continue
+            
+            try:
+                rodovia = valores[idx_rodovia]
+                km = ler_km(valores[idx_km])
+            except (ValueError, IndexError):
+                rodovia, km = None, None
+            
+            bloco.append((valores, rodovia, km))
+            
+            if len(bloco) >= tamanho_bloco:
+                encontrados += _consultar_bloco_csv(bloco, escritor)
+                linhas += len(bloco)
+                bloco = []
+                
+                decorrido = time.monotonic() - inicio
+                print(f"   Processadas: {linhas} linhas ({linhas / decorrido:.1f} linhas/s)")
+        
+        if bloco:
+            encontrados += _consultar_bloco_csv(bloco, escritor)
+            linhas += len(bloco)
+    
+    segundos = time.monotonic() - inicio
+    
+    return {
+        'linhas': linhas,
+        'encontrados': encontrados,
+        'segundos': segundos,
+        'linhas_por_segundo': linhas / segundos if segundos > 0 else 0.0,
+        'saida': str(saida)
+    }
+
+
+# ============================================
+# EXIBIÇÃO DE RESULTADOS
+# ============================================
+
+def exibir_resultado(resultado: Dict[str, Any]) -> None:
+    """Exibe o resultado da consulta inversa de forma formatada."""
+    
+    def texto(valor):
+        return valor if valor not in [None, ''] else 'N/A'
+    
+    print("\n" + "=" * 76)
+    print(f"RODOVIA:           {resultado['rodovia']}")
+    print(f"KM:                {resultado['km']:.3f}")
+    print(f"X (ESTE):          {resultado['x']:.2f}")
+    print(f"Y (NORTE):         {resultado['y']:.2f}")
+    print(f"ZONA UTM:          {resultado['zona']}")
+    print(f"CÓDIGO SRE:        {texto(resultado['codigo_sre'])}")
+    print(f"TRECHO:            {texto(resultado['trecho'])}")
+    print(f"MUNICÍPIO:         {texto(resultado['municipio'])}")
+    print(f"DENTRO DA FXD:     {'SIM' if resultado['dentro_fxd'] else 'NÃO'}")
+    print(f"LARGURA FXD:       {texto(resultado['largura_fxd'])}")
+    print(f"JURISDIÇÃO:        {texto(resultado['jurisdicao'])}")
+    print("=" * 76)
+
+
+# ============================================
+# EXECUÇÃO DIRETA
+# ============================================
+
+def main():
+    """Função principal - execução CLI."""
+    
+    parser = argparse.ArgumentParser(
+        description='Localiza rodovia + KM no eixo e devolve as coordenadas UTM',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos:
+  %(prog)s --rodovia BA-099 --km 57,3
+  %(prog)s -r BA099 -k 057+300
+  %(prog)s --csv marcos.csv --saida marcos_utm.csv
+        """
+    )
+    
+    parser.add_argument('--rodovia', '-r',
+                       help='Rodovia (ex: BA-099)')
+    parser.add_argument('--km', '-k',
+                       help='KM (ex: 57,3 ou 057+300)')
+    parser.add_argument('--csv', metavar='ARQUIVO',
+                       help='Planilha CSV (;) com colunas RODOVIA/KM')
+    parser.add_argument('--saida', '-o', metavar='ARQUIVO',
+                       help='Planilha CSV de saída (modo --csv)')
+    
+    args = parser.parse_args()
+    
+    if not args.csv and (args.rodovia is None or args.km is None):
+        parser.error('informe --rodovia e --km, ou --csv')
+    
+    print("=" * 76)
+    print("  CONSULTA INVERSA - RODOVIA + KM")
+    print("=" * 76)
+    
+    try:
+        if args.csv:
+            print(f"\nPlanilha: {args.csv}")
+            print("\n🔄 Processando planilha...")
+            estatisticas = processar_csv(args.csv, args.saida)
+            
+            print(f"\n✅ {estatisticas['linhas']} linhas processadas "
+                  f"({estatisticas['encontrados']} localizadas)")
+            print(f"⏱️  {estatisticas['segundos']:.1f} s - "
+                  f"{estatisticas['linhas_por_segundo']:.1f} linhas/s")
+            print(f"📁 Resultado: {estatisticas['saida']}")
+            exit_code = 0
+        else:
+            resultado = localizar_km(args.rodovia, ler_km(args.km))
+            
+            if resultado:
+                exibir_resultado(resultado)
+                exit_code = 0
+            else:
+                print(f"\n❌ KM {args.km} não encontrado na rodovia {args.rodovia}.")
+                exit_code = 1
+    
+    except Exception as e:
+        print(f"\n❌ ERRO CRÍTICO: {e}")
+        import traceback
+        traceback.print_exc()
+        exit_code = 2
+    
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
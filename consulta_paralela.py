@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistema de Consulta de Coordenadas - Execução Paralela em Lote
+Distribui lotes de coordenadas entre vários processos, cada um com o motor
+de consulta inicializado e os dados das zonas carregados uma única vez.
+
+Com --backend snapshot os processos mapeiam o mesmo snapshot compilado
+(snapshot_zona.py) em modo somente leitura: os dados ficam uma única vez
+na memória física, e cada processo adicional quase não ocupa memória
+própria com eles.
+
+Uso: python consulta_paralela.py --csv <planilha> [--saida <arquivo>] [--processos N]
+                                 [--backend qgis|shapely|snapshot]
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+import sys
+import os
+import atexit
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Optional, Dict, List, Iterable
+
+import numpy as np
+
+# Configuração PyQGIS
+os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+
+import consulta_standalone as cs
+
+if cs.QGIS_DISPONIVEL:
+    from qgis.core import QgsApplication
+
+
+# ============================================
+# CONFIGURAÇÕES
+# ============================================
+
+# Pontos enviados a cada processo por tarefa
+TAMANHO_FRAGMENTO = 2000
+
+# Lado (m) dos ladrilhos usados para agrupar pontos próximos no mesmo fragmento
+TAMANHO_LADRILHO = 20000.0
+
+# Instância do QGIS de cada processo trabalhador
+_QGS = None
+
+# Motor de consulta do processo trabalhador (ver consulta_standalone.obter_backend)
+_BACKEND = None
+
+
+# ============================================
+# PROCESSO TRABALHADOR
+# ============================================
+
+def inicializar_trabalhador(zonas: Iterable[int], backend: str = 'qgis') -> None:
+    """
+    Inicializa o motor de consulta e carrega as zonas no processo trabalhador (uma única vez).
+    
+    Args:
+        zonas: Zonas UTM a pré-carregar
+        backend: Motor de consulta ('qgis', 'shapely' ou 'snapshot')
+    """
+    global _QGS, _BACKEND
+    
+    if backend == 'qgis':
+        QgsApplication.setPrefixPath(cs.QGIS_PATH, True)
+        _QGS = QgsApplication([], False)
+        _QGS.initQgis()
+        atexit.register(_QGS.exitQgis)
+    
+    _BACKEND = cs.obter_backend(backend)
+    
+    for zona in zonas:
+        _BACKEND.CACHE_ZONAS.obter(zona)
+
+
+def _consultar_fragmento(indices: np.ndarray, xs: np.ndarray, ys: np.ndarray,
+                         zonas: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Consulta um fragmento no processo trabalhador, devolvendo também os índices."""
+    return indices, _BACKEND.consultar_lote(xs, ys, zonas)
+
+
+# ============================================
+# FRAGMENTAÇÃO E EXECUÇÃO
+# ============================================
+
+def fragmentar(xs: np.ndarray, ys: np.ndarray, zonas: np.ndarray,
+               tamanho_fragmento: int = TAMANHO_FRAGMENTO,
+               tamanho_ladrilho: float = TAMANHO_LADRILHO) -> List[np.ndarray]:
+    """
+    Divide os pontos em fragmentos agrupados por zona e ladrilho espacial.
+    
+    Pontos da mesma zona e do mesmo ladrilho ficam juntos, o que mantém
+    cada processo trabalhando sobre uma região compacta dos índices.
+    
+    Args:
+        xs: Coordenadas X
+        ys: Coordenadas Y
+        zonas: Zonas UTM
+        tamanho_fragmento: Pontos por fragmento
+        tamanho_ladrilho: Lado do ladrilho em metros
+    
+    Returns:
+        Lista de arrays com os índices (posições de entrada) de cada fragmento
+    """
+    ladrilho_x = np.floor(xs / tamanho_ladrilho).astype(np.int64)
+    ladrilho_y = np.floor(ys / tamanho_ladrilho).astype(np.int64)
+    
+    # lexsort ordena pela última chave primeiro: zona, depois ladrilho Y, depois X
+    ordem = np.lexsort((ladrilho_x, ladrilho_y, zonas))
+    
+    return [ordem[i:i + tamanho_fragmento] for i in range(0, len(ordem), tamanho_fragmento)]
+
+
+class ExecutorParalelo:
+    """
+    Pool de processos para consultas em lote.
+    
+    Cada processo inicializa o motor de consulta e carrega as zonas uma
+    única vez; os lotes são fragmentados por zona/ladrilho, distribuídos
+    entre os processos e os resultados são recombinados na ordem de entrada.
+    """
+    
+    def __init__(self, processos: Optional[int] = None,
+                 zonas: Iterable[int] = tuple(cs.ZONA_EPSG),
+                 tamanho_fragmento: int = TAMANHO_FRAGMENTO,
+                 backend: str = 'qgis'):
+        self.processos = processos or os.cpu_count() or 1
+        self.tamanho_fragmento = tamanho_fragmento
+        self.backend = backend
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.processos,
+            initializer=inicializar_trabalhador,
+            initargs=(list(zonas), backend)
+        )
+    
+    def consultar_lote(self, xs, ys, zonas) -> Dict[str, np.ndarray]:
+        """
+        Versão paralela de consulta_standalone.consultar_lote.
+        
+        Args:
+            xs: Coordenadas X
+            ys: Coordenadas Y
+            zonas: Zonas UTM (array ou valor único)
+        
+        Returns:
+            Resultado colunar, na mesma ordem dos pontos de entrada
+        """
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        zonas = np.broadcast_to(np.asarray(zonas, dtype=int), xs.shape)
+        n = len(xs)
+        
+        if n == 0:
+            return cs.consultar_lote(xs, ys, zonas)
+        
+        fragmentos = fragmentar(xs, ys, zonas, self.tamanho_fragmento)
+        tarefas = [
+            self._pool.submit(_consultar_fragmento, idx, xs[idx], ys[idx], zonas[idx])
+            for idx in fragmentos
+        ]
+        
+        colunas = None
+        for tarefa in tarefas:
+            indices, parcial = tarefa.result()
+            
+            if colunas is None:
+                colunas = {
+                    nome: np.empty(n, dtype=valores.dtype) for nome, valores in parcial.items()
+                }
+            
+            for nome, valores in parcial.items():
+                colunas[nome][indices] = valores
+        
+        return colunas
+    
+    def encerrar(self) -> None:
+        """Encerra os processos trabalhadores."""
+        self._pool.shutdown()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.encerrar()
+
+
+# ============================================
+# MAIN - INTERFACE CLI
+# ============================================
+
+def main():
+    """Função principal - execução CLI."""
+    
+    parser = argparse.ArgumentParser(
+        description='Consulta paralela de planilhas CSV (LATITUDE/LONGITUDE em GD)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos:
+  %(prog)s --csv "CONVERSOR KMZ/CONSOLIDADO.csv"
+  %(prog)s --csv pontos.csv --saida resultado.csv --processos 16
+  %(prog)s --csv pontos.csv --processos 16 --backend snapshot
+        """
+    )
+    
+    parser.add_argument('--csv', required=True, metavar='ARQUIVO',
+                       help='Planilha CSV (;) com colunas LATITUDE/LONGITUDE em GD')
+    parser.add_argument('--saida', '-o', metavar='ARQUIVO',
+                       help='Planilha CSV de saída')
+    parser.add_argument('--processos', '-p', type=int, default=None,
+                       help='Número de processos (padrão: núcleos da máquina)')
+    parser.add_argument('--backend', choices=sorted(cs.MODULOS_BACKENDS), default='qgis',
+                       help='Motor de consulta dos processos (padrão: qgis)')
+    
+    args = parser.parse_args()
+    
+    if args.backend == 'qgis' and not cs.QGIS_DISPONIVEL:
+        parser.error('PyQGIS não encontrado; use --backend snapshot ou shapely')
+    
+    print("=" * 76)
+    print(f"  CONSULTA PARALELA - {cs.NOMES_BACKENDS[args.backend]}")
+    print("=" * 76)
+    print(f"\nPlanilha: {args.csv}")
+    
+    qgs = None
+    
+    if args.backend == 'qgis':
+        # QGIS do processo principal (apenas para a conversão GD → UTM)
+        print("\n🔧 Inicializando PyQGIS...")
+        
+        QgsApplication.setPrefixPath(cs.QGIS_PATH, True)
+        qgs = QgsApplication([], False)
+        qgs.initQgis()
+    
+    elif args.backend == 'snapshot':
+        # Compila (se preciso) antes de abrir os processos, que apenas mapeiam o arquivo
+        import snapshot_zona
+        for zona in cs.ZONA_EPSG:
+            snapshot_zona.abrir_snapshot(zona)
+    
+    try:
+        with ExecutorParalelo(args.processos, backend=args.backend) as executor:
+            print(f"🚀 {executor.processos} processos trabalhadores")
+            print("\n🔄 Processando planilha...")
+            
+            estatisticas = cs.processar_csv(
+                args.csv, args.saida,
+                tamanho_bloco=executor.processos * executor.tamanho_fragmento,
+                funcao_lote=executor.consultar_lote,
+                funcao_conversao=cs.obter_backend(args.backend).converter_gd_para_utm_lote
+            )
+        
+        print(f"\n✅ {estatisticas['linhas']} linhas processadas "
+              f"({estatisticas['encontrados']} com eixo encontrado)")
+        print(f"⏱️  {estatisticas['segundos']:.1f} s - "
+              f"{estatisticas['linhas_por_segundo']:.1f} linhas/s")
+        print(f"📁 Resultado: {estatisticas['saida']}")
+        exit_code = 0
+    
+    except Exception as e:
+        print(f"\n❌ ERRO CRÍTICO: {e}")
+        import traceback
+        traceback.print_exc()
+        exit_code = 2
+    
+    finally:
+        if qgs is not None:
+            qgs.exitQgis()
+    
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistema de Consulta de Coordenadas - Backend Shapely/pyogrio (sem QGIS)
+Mesma consulta de consulta_standalone.py (FXD, município, eixo e KM), com
+leitura dos shapefiles pelo pyogrio e geometrias/índices do Shapely 2,
+para servidores e contêineres sem instalação do QGIS.
+
+O KM é calculado por continuidade.calcular_km_por_proporcao, a mesma
+lógica de orientação usada pelo backend PyQGIS.
+
+Uso: python consulta_standalone.py --x 510807 --y 8649627 --zona 24 --backend shapely
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+from pathlib import Path
+from typing import Tuple, Optional, Dict, Any, List
+
+import numpy as np
+import shapely
+from pyogrio.raw import read as ler_ogr
+from pyproj import Transformer
+
+import consulta_standalone as cs
+import instrumentacao
+from continuidade import TabelaContinuidade, calcular_km_por_proporcao
+
+
+# Campos da FXD que não são repassados em fxd_info (mesmos de indices_espaciais.py)
+CAMPOS_IGNORADOS_FXD = ['FID', 'SHAPE_LENG', 'SHAPE_LEN', 'OBJECTID', 'SHAPE_AREA']
+
+
+# ============================================
+# CONVERSÃO GD ↔ UTM (pyproj)
+# ============================================
+
+# Transformadores já construídos, por par (EPSG de origem, EPSG de destino)
+_TRANSFORMADORES: Dict[Tuple[int, int], Transformer] = {}
+
+
+def obter_transformador(epsg_origem: int, epsg_destino: int) -> Transformer:
+    """
+    Retorna o transformador entre dois sistemas, criando-o uma única vez.
+    
+    Args:
+        epsg_origem: EPSG das coordenadas de entrada
+        epsg_destino: EPSG das coordenadas de saída
+    
+    Returns:
+        Transformador pyproj (ordem x/y, isto é, longitude/latitude)
+    """
+    transformador = _TRANSFORMADORES.get((epsg_origem, epsg_destino))
+    
+    if transformador is None:
+        transformador = Transformer.from_crs(f"EPSG:{epsg_origem}", f"EPSG:{epsg_destino}",
+                                             always_xy=True)
+        _TRANSFORMADORES[(epsg_origem, epsg_destino)] = transformador
+    
+    return transformador
+
+
+def converter_gd_para_utm(latitude: float, longitude: float,
+                          zona: Optional[int] = None) -> Tuple[float, float, int]:
+    """
+    Converte latitude/longitude em graus decimais para UTM, detectando a zona.
+    
+    Args:
+        latitude: Latitude em graus decimais
+        longitude: Longitude em graus decimais
+        zona: Zona de destino (padrão: a da longitude)
+    
+    Returns:
+        Tupla (x, y, zona)
+    """
+    zona = zona or cs.calcular_zona_utm(longitude)
+    x, y = obter_transformador(cs.EPSG_GD, 31960 + zona).transform(longitude, latitude)
+    return x, y, zona
+
+
+def converter_gd_para_utm_lote(latitudes, longitudes,
+                               zonas=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Converte arrays de latitude/longitude para UTM, uma chamada vetorizada por zona.
+    
+    Args:
+        latitudes: Latitudes em graus decimais
+        longitudes: Longitudes em graus decimais
+        zonas: Zona de destino de cada ponto (array ou valor único; padrão:
+            a da longitude)
+    
+    Returns:
+        Tupla (xs, ys, zonas)
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    
+    if zonas is None:
+        zonas = cs.calcular_zonas_utm(longitudes)
+    zonas = np.broadcast_to(np.asarray(zonas, dtype=int), latitudes.shape).copy()
+    
+    xs = np.empty(len(latitudes))
+    ys = np.empty(len(latitudes))
+    
+    for zona in np.unique(zonas).tolist():
+        selecao = zonas == zona
+        xs[selecao], ys[selecao] = obter_transformador(cs.EPSG_GD, 31960 + zona).transform(
+            longitudes[selecao], latitudes[selecao]
+        )
+    
+    return xs, ys, zonas
+
+
+def converter_utm_para_gd_lote(xs: np.ndarray, ys: np.ndarray, zona: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte arrays de coordenadas UTM de uma zona para graus decimais.
+    
+    Args:
+        xs: Coordenadas X (Este)
+        ys: Coordenadas Y (Norte)
+        zona: Zona UTM (23 ou 24)
+    
+    Returns:
+        Tupla (latitudes, longitudes)
+    """
+    longitudes, latitudes = obter_transformador(cs.ZONA_EPSG[zona], cs.EPSG_GD).transform(
+        np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+    )
+    return latitudes, longitudes
+
+
+# ============================================
+# LEITURA DOS SHAPEFILES
+# ============================================
+
+def _valores_coluna(coluna: np.ndarray) -> List[Any]:
+    """Converte uma coluna lida pelo pyogrio em valores Python (NaN/NULL viram None)."""
+    valores = coluna.tolist()
+    
+    if coluna.dtype.kind == 'f':
+        return [None if v != v else v for v in valores]
+    
+    return valores
+
+
+def ler_camada(caminho: Path) -> Optional[Tuple[List[str], List[Tuple[Any, Dict[str, Any]]]]]:
+    """
+    Lê um shapefile inteiro para memória.
+    
+    Args:
+        caminho: Caminho do shapefile
+    
+    Returns:
+        Tupla (nomes dos campos, lista de (geometria Shapely, atributos)),
+        ignorando geometrias vazias, ou None se o arquivo não existir ou for inválido
+    """
+    if not caminho.exists():
+        return None
+    
+    try:
+        meta, _, wkb, colunas = ler_ogr(str(caminho))
+    except Exception:
+        return None
+    
+    campos = list(meta['fields'])
+    geometrias = shapely.from_wkb(wkb)
+    valores = [_valores_coluna(coluna) for coluna in colunas]
+    
+    features = []
+    for i, geom in enumerate(geometrias):
+        if geom is None or geom.is_empty:
+            continue
+        
+        features.append((geom, {campo: valores[j][i] for j, campo in enumerate(campos)}))
+    
+    return campos, features
+
+
+class DadosZonaShapely:
+    """
+    Feições e índices de uma zona UTM para o backend Shapely.
+    
+    Mesmos atributos de consulta_standalone.DadosZona usados na montagem
+    do resultado (zona, todas_features, continuidade), com as geometrias
+    em arrays Shapely, índices STRtree e polígonos preparados.
+    """
+    
+    def __init__(self, zona: int):
+        self.zona = zona
+        carga = instrumentacao.iniciar()
+        
+        with carga.etapa('fxd'):
+            camada_fxd = ler_camada(cs.SHAPES_DIR / f"FXD{zona}.shp")
+        with carga.etapa('municipios'):
+            camada_munic = ler_camada(cs.SHAPES_DIR / f"municipios{zona}.shp")
+        with carga.etapa('shape'):
+            camada_shape = ler_camada(cs.SHAPES_DIR / f"shape{zona}.shp")
+        
+        self.fxd_features = camada_fxd[1] if camada_fxd else []
+        self.munic_features = camada_munic[1] if camada_munic else []
+        self.todas_features = camada_shape[1] if camada_shape else []
+        self.shape_carregado = camada_shape is not None
+        
+        self.geoms_fxd = np.array([g for g, _ in self.fxd_features], dtype=object)
+        self.geoms_munic = np.array([g for g, _ in self.munic_features], dtype=object)
+        self.geoms_eixos = np.array([g for g, _ in self.todas_features], dtype=object)
+        
+        with carga.etapa('indices'):
+            # Polígonos preparados: os predicados vetorizados passam a usar o índice interno do GEOS
+            shapely.prepare(self.geoms_fxd)
+            shapely.prepare(self.geoms_munic)
+            
+            self.arvore_fxd = shapely.STRtree(self.geoms_fxd)
+            self.arvore_munic = shapely.STRtree(self.geoms_munic)
+            self.arvore_eixos = shapely.STRtree(self.geoms_eixos)
+            self.comprimentos_eixos = shapely.length(self.geoms_eixos)
+        
+        with carga.etapa('continuidade'):
+            # Trechos de cada rodovia ordenados por SRE, com vizinhos e continuidade
+            self.continuidade = TabelaContinuidade(self.todas_features)
+        
+        # Campo com o nome do município (primeiro que casar com as palavras-chave)
+        self.campo_municipio = None
+        for field in (camada_munic[0] if camada_munic else []):
+            if any(x in field.upper() for x in ['NM_MUN', 'MUNICIPIO', 'MUNIC', 'NOME']):
+                self.campo_municipio = field
+                break
+        
+        # Tempos da carga, incorporados às métricas da consulta que a provocou
+        self.metricas_carga = carga.como_dict()
+
+
+# Cache único do processo para o backend Shapely
+CACHE_ZONAS = cs.CacheZonas(DadosZonaShapely)
+
+
+# ============================================
+# ETAPAS DA CONSULTA (VETORIZADAS)
+# ============================================
+
+def _primeiro_por_ponto(pares: np.ndarray, n: int) -> np.ndarray:
+    """
+    Para cada ponto, o menor índice de feição entre os pares (ponto, feição).
+    
+    Args:
+        pares: Array 2 x k com (índice do ponto, índice da feição)
+        n: Número de pontos
+    
+    Returns:
+        Índice da feição por ponto (-1 quando não houver)
+    """
+    sem_feicao = np.iinfo(np.int64).max
+    primeiro = np.full(n, sem_feicao, dtype=np.int64)
+    np.minimum.at(primeiro, pares[0], pares[1])
+    primeiro[primeiro == sem_feicao] = -1
+    return primeiro
+
+
+def localizar_fxd(dados: DadosZonaShapely, pontos: np.ndarray,
+                  metricas=instrumentacao.DESATIVADAS) -> np.ndarray:
+    """
+    Localiza o polígono da FXD de cada ponto (o de menor índice, como na varredura original).
+    
+    Args:
+        dados: Dados da zona
+        pontos: Array de pontos Shapely
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Índice do polígono por ponto (-1 fora da FXD)
+    """
+    pares = dados.arvore_fxd.query(pontos)
+    metricas.contar('feicoes_varridas', pares.shape[1])
+    metricas.contar('operacoes_geometricas', pares.shape[1])
+    # intersects cobre também pontos sobre a borda do polígono
+    dentro = shapely.intersects(dados.geoms_fxd[pares[1]], pontos[pares[0]])
+    return _primeiro_por_ponto(pares[:, dentro], len(pontos))
+
+
+def localizar_municipios(dados: DadosZonaShapely, pontos: np.ndarray,
+                         metricas=instrumentacao.DESATIVADAS) -> np.ndarray:
+    """
+    Localiza o município de cada ponto.
+    
+    Args:
+        dados: Dados da zona
+        pontos: Array de pontos Shapely
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Índice do município por ponto (-1 quando nenhum contiver o ponto)
+    """
+    pares = dados.arvore_munic.query(pontos)
+    metricas.contar('feicoes_varridas', pares.shape[1])
+    metricas.contar('operacoes_geometricas', pares.shape[1])
+    dentro = shapely.contains(dados.geoms_munic[pares[1]], pontos[pares[0]])
+    return _primeiro_por_ponto(pares[:, dentro], len(pontos))
+
+
+def buscar_candidatos_eixo(dados: DadosZonaShapely, pontos: np.ndarray,
+                           distancia_maxima: float = cs.DISTANCIA_MAXIMA_EIXO,
+                           metricas=instrumentacao.DESATIVADAS
+                           ) -> Tuple[Tuple[np.ndarray, np.ndarray, np.ndarray], np.ndarray]:
+    """
+    Busca os eixos dentro da distância máxima de cada ponto.
+    
+    Os eixos cujo retângulo toca o quadrado de meio-lado `distancia_maxima`
+    têm a distância medida uma vez; os que ficam fora do limite dão a menor
+    distância já conhecida, usada no raio inicial da busca em anéis
+    (cs.raio_inicial_aneis), como nos outros motores.
+    
+    Args:
+        dados: Dados da zona
+        pontos: Array de pontos Shapely
+        distancia_maxima: Raio de busca em metros
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Tupla (candidatos, menor_distancia_fora): candidatos como (índices dos
+        pontos, índices dos eixos, distâncias), ordenados por ponto, depois por
+        distância e, em caso de empate, pela ordem das feições; e, por ponto,
+        a menor distância entre os eixos medidos fora do limite
+    """
+    xs, ys = shapely.get_x(pontos), shapely.get_y(pontos)
+    pares = dados.arvore_eixos.query(shapely.box(xs - distancia_maxima, ys - distancia_maxima,
+                                                 xs + distancia_maxima, ys + distancia_maxima))
+    distancias = shapely.distance(pontos[pares[0]], dados.geoms_eixos[pares[1]])
+    
+    fora = distancias > distancia_maxima
+    menor_distancia = np.full(len(pontos), np.inf)
+    np.minimum.at(menor_distancia, pares[0][fora], distancias[fora])
+    
+    metricas.contar('feicoes_varridas', pares.shape[1])
+    metricas.contar('candidatos_no_raio', pares.shape[1] - int(fora.sum()))
+    metricas.contar('operacoes_geometricas', pares.shape[1])
+    
+    # lexsort ordena pela última chave primeiro: ponto, depois distância, depois feição
+    ordem = np.lexsort((pares[1], distancias, pares[0]))
+    ordem = ordem[~fora[ordem]]
+    return (pares[0][ordem], pares[1][ordem], distancias[ordem]), menor_distancia
+
+
+def buscar_eixo_mais_proximo(dados: DadosZonaShapely, ponto: Any, raio_inicial: float,
+                             metricas=instrumentacao.DESATIVADAS
+                             ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Eixos mais próximos do ponto além de DISTANCIA_MAXIMA_EIXO (ver cs.buscar_em_aneis).
+    
+    Args:
+        dados: Dados da zona
+        ponto: Ponto Shapely
+        raio_inicial: Raio do primeiro anel (m)
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Candidatos no formato dos de buscar_candidatos_eixo (todos do ponto 0)
+    """
+    x, y = shapely.get_x(ponto), shapely.get_y(ponto)
+    
+    proximos = cs.buscar_em_aneis(
+        lambda raio: dados.arvore_eixos.query(shapely.box(x - raio, y - raio, x + raio, y + raio)).tolist(),
+        lambda indices: shapely.distance(ponto, dados.geoms_eixos[np.asarray(indices, dtype=np.int64)]).tolist(),
+        raio_inicial, cs.DISTANCIA_MAXIMA_BUSCA, metricas
+    )
+    
+    distancias = np.array([distancia for distancia, _ in proximos], dtype=float)
+    eixos = np.array([idx for _, idx in proximos], dtype=np.int64)
+    return np.zeros(len(eixos), dtype=np.int64), eixos, distancias
+
+
+def escolher_eixos(dados: DadosZonaShapely, pontos: np.ndarray,
+                   candidatos: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                   verbose: bool = True,
+                   metricas=instrumentacao.DESATIVADAS) -> List[Optional[Tuple[float, int, Any, Any, float]]]:
+    """
+    Escolhe, para cada ponto, o eixo mais próximo cujo KM pode ser calculado.
+    
+    Args:
+        dados: Dados da zona
+        pontos: Array de pontos Shapely
+        candidatos: Candidatos de buscar_candidatos_eixo
+        verbose: Exibe as mensagens de diagnóstico do cálculo de KM
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Por ponto, tupla (distância, índice, km_inicial, km_final, km_calculado)
+        ou None (mesmo formato de consulta_standalone.escolher_eixo)
+    """
+    idx_pontos, idx_eixos, distancias = candidatos
+    eixos: List[Optional[Tuple[float, int, Any, Any, float]]] = [None] * len(pontos)
+    
+    # Posição relativa do ponto projetado em cada eixo candidato
+    comprimentos = dados.comprimentos_eixos[idx_eixos]
+    ao_longo = shapely.line_locate_point(dados.geoms_eixos[idx_eixos], pontos[idx_pontos])
+    metricas.contar('operacoes_geometricas', len(idx_eixos))
+    
+    for i, idx, distancia, distancia_ao_longo, comprimento_total in zip(
+            idx_pontos.tolist(), idx_eixos.tolist(), distancias.tolist(),
+            ao_longo.tolist(), comprimentos.tolist()):
+        if eixos[i] is not None or comprimento_total == 0:
+            continue
+        
+        atributos_dict = dados.todas_features[idx][1]
+        
+        # Buscar campos de KM
+        km_inicial, km_final = cs.extrair_campos_km(atributos_dict)
+        
+        if km_inicial is None or km_final is None:
+            continue
+        
+        try:
+            km_calculado = calcular_km_por_proporcao(distancia_ao_longo / comprimento_total,
+                                                     km_inicial, km_final,
+                                                     atributos=atributos_dict,
+                                                     continuidade=dados.continuidade,
+                                                     verbose=verbose)
+        except Exception as e:
+            print(f"❌ Erro ao calcular KM: {e}")
+            continue
+        
+        eixos[i] = (distancia, idx, km_inicial, km_final, km_calculado)
+    
+    return eixos
+
+
+def _nome_municipio(dados: DadosZonaShapely, idx: int) -> Optional[str]:
+    """Nome do município de índice `idx` (-1 ou sem campo de nome: None)."""
+    if idx < 0 or not dados.campo_municipio:
+        return None
+    
+    return dados.munic_features[idx][1][dados.campo_municipio]
+
+
+def _info_fxd(dados: DadosZonaShapely, idx: int) -> Optional[Dict[str, Any]]:
+    """Atributos do polígono da FXD de índice `idx` (fxd_info), ou None fora da FXD."""
+    if idx < 0:
+        return None
+    
+    return {
+        field: valor for field, valor in dados.fxd_features[idx][1].items()
+        if field.upper() not in CAMPOS_IGNORADOS_FXD
+    }
+
+
+# ============================================
+# FUNÇÃO PRINCIPAL - CONSULTA
+# ============================================
+
+def consultar_coordenadas(x: float, y: float, zona: int) -> Optional[Dict[str, Any]]:
+    """
+    Executa consulta completa de coordenadas nos shapefiles, sem QGIS.
+    Mesmo resultado de consulta_standalone.consultar_coordenadas.
+    
+    Args:
+        x: Coordenada X (Este) em metros
+        y: Coordenada Y (Norte) em metros
+        zona: Zona UTM (23 ou 24)
+    
+    Returns:
+        Dicionário com resultados ou None se não encontrado ('fora_do_limite'
+        e 'metricas' como em consulta_standalone.consultar_coordenadas)
+    """
+    # Validações
+    if not cs.validar_coordenadas(x, y, zona):
+        return None
+    
+    pontos = shapely.points([x], [y])
+    metricas = instrumentacao.iniciar()
+    
+    with metricas.etapa('carga_zona'):
+        carregada = zona in CACHE_ZONAS
+        dados = CACHE_ZONAS.obter(zona)
+    
+    if not carregada:
+        metricas.incorporar(dados.metricas_carga, prefixo='carga.')
+    
+    # 1. FXD
+    with metricas.etapa('fxd'):
+        fxd_info = _info_fxd(dados, int(localizar_fxd(dados, pontos, metricas)[0]))
+    dentro_fxd = fxd_info is not None
+    
+    if dentro_fxd:
+        print(f"\n✅ Ponto DENTRO da Faixa de Domínio")
+    
+    # 2. Município
+    with metricas.etapa('municipio'):
+        municipio = _nome_municipio(dados, int(localizar_municipios(dados, pontos, metricas)[0]))
+    
+    # 3. Eixo rodoviário mais próximo
+    if not (cs.SHAPES_DIR / f"shape{zona}.shp").exists():
+        print(f"\n❌ Shapefile shape{zona}.shp não encontrado")
+        return None
+    
+    if not dados.shape_carregado:
+        print(f"   ❌ Erro ao carregar shape{zona}.shp")
+        return None
+    
+    distancia_maxima = cs.DISTANCIA_MAXIMA_EIXO
+    with metricas.etapa('busca_eixos'):
+        candidatos, menor_distancia = buscar_candidatos_eixo(dados, pontos, distancia_maxima, metricas)
+    
+    # 4. KM no eixo mais próximo
+    with metricas.etapa('calculo_km'):
+        eixo = escolher_eixos(dados, pontos, candidatos, metricas=metricas)[0]
+    
+    if eixo:
+        with metricas.etapa('montagem'):
+            resultado = cs.montar_resultado(dados, eixo, dentro_fxd, fxd_info, municipio)
+        return instrumentacao.publicar(metricas, resultado)
+    
+    print(f"\n❌ Nenhuma feição encontrada dentro do limite de {distancia_maxima}m.")
+    
+    # 5. Eixo mais próximo fora do limite (busca em anéis)
+    with metricas.etapa('busca_aneis'):
+        proximos = buscar_eixo_mais_proximo(dados, pontos[0],
+                                            cs.raio_inicial_aneis(distancia_maxima, float(menor_distancia[0])),
+                                            metricas)
+    
+    with metricas.etapa('calculo_km'):
+        eixo = escolher_eixos(dados, pontos, proximos, verbose=False, metricas=metricas)[0]
+    
+    if eixo:
+        print(f"ℹ️  Rodovia mais próxima está a {eixo[0]:.2f}m de distância (resultado fora do limite).")
+        with metricas.etapa('montagem'):
+            resultado = cs.montar_resultado(dados, eixo, dentro_fxd, fxd_info, municipio, fora_do_limite=True)
+        return instrumentacao.publicar(metricas, resultado)
+    
+    instrumentacao.publicar(metricas)
+    if cs.DISTANCIA_MAXIMA_BUSCA > distancia_maxima:
+        print(f"ℹ️  Nenhuma rodovia a menos de {cs.DISTANCIA_MAXIMA_BUSCA:g}m.")
+    return None
+
+
+# ============================================
+# CONSULTA EM LOTE
+# ============================================
+
+def consultar_lote(xs, ys, zonas, como_dataframe: bool = False):
+    """
+    Consulta um lote de coordenadas sem QGIS, com cada etapa vetorizada.
+    
+    Mesma entrada e saída de consulta_standalone.consultar_lote, de modo
+    que pode ser passada como `funcao_lote` para processar_csv.
+    
+    Args:
+        xs: Coordenadas X (array NumPy, lista ou coluna)
+        ys: Coordenadas Y
+        zonas: Zonas UTM (array ou um único valor para todo o lote)
+        como_dataframe: Retorna um pandas.DataFrame em vez de dicionário
+    
+    Returns:
+        Resultado colunar (ver consulta_standalone.COLUNAS_LOTE) ou DataFrame;
+        com a instrumentação ativa, as métricas do lote ficam em
+        instrumentacao.ultimas()
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    zonas = np.broadcast_to(np.asarray(zonas, dtype=int), xs.shape)
+    
+    colunas = cs.iniciar_colunas_lote(xs, ys, zonas)
+    metricas = instrumentacao.iniciar()
+    metricas.contar('pontos', len(xs))
+    
+    validas = cs.validar_coordenadas_lote(xs, ys, zonas)
+    
+    for zona in np.unique(zonas[validas]):
+        with metricas.etapa('carga_zona'):
+            carregada = int(zona) in CACHE_ZONAS
+            dados = CACHE_ZONAS.obter(int(zona))
+        
+        if not carregada:
+            metricas.incorporar(dados.metricas_carga, prefixo='carga.')
+        
+        indices = np.flatnonzero(validas & (zonas == zona))
+        pontos = shapely.points(xs[indices], ys[indices])
+        
+        # Etapas 1 e 2: FXD e município
+        with metricas.etapa('fxd'):
+            fxd = [_info_fxd(dados, idx) for idx in localizar_fxd(dados, pontos, metricas).tolist()]
+        with metricas.etapa('municipio'):
+            municipios = [_nome_municipio(dados, idx)
+                          for idx in localizar_municipios(dados, pontos, metricas).tolist()]
+        
+        colunas['dentro_fxd'][indices] = [f is not None for f in fxd]
+        colunas['municipio'][indices] = municipios
+        
+        if not dados.shape_carregado:
+            continue
+        
+        # Etapas 3 e 4: eixos candidatos e KM no mais próximo
+        with metricas.etapa('busca_eixos'):
+            candidatos, _ = buscar_candidatos_eixo(dados, pontos, metricas=metricas)
+        with metricas.etapa('calculo_km'):
+            eixos = escolher_eixos(dados, pontos, candidatos, verbose=False, metricas=metricas)
+        
+        with metricas.etapa('montagem'):
+            for i, eixo, fxd_info, municipio in zip(indices, eixos, fxd, municipios):
+                if eixo is None:
+                    continue
+                
+                resultado = cs.montar_resultado(dados, eixo, fxd_info is not None, fxd_info, municipio)
+                cs.gravar_resultado_lote(colunas, i, resultado)
+    
+    instrumentacao.publicar(metricas)
+    
+    if como_dataframe:
+        import pandas as pd
+        return pd.DataFrame(colunas, columns=cs.COLUNAS_LOTE)
+    
+    return colunas
@@ -8,24 +8,44 @@ Autor: Sistema de Gestão Rodoviária
 Data: 2025
 """
 
+from __future__ import annotations
+
 import sys
 import os
 import argparse
+import csv
+import hashlib
+import importlib
+import threading
+import time
 from pathlib import Path
-from typing import Tuple, Optional, Dict, Any, List
+from typing import Tuple, Optional, Dict, Any, List, Callable
+
+import numpy as np
 
 # Configuração PyQGIS
 os.environ['QT_QPA_PLATFORM'] = 'offscreen'
 
-from qgis.core import (
-    QgsApplication,
-    QgsProject,
-    QgsVectorLayer,
-    QgsPointXY,
-    QgsGeometry,
-    QgsCoordinateReferenceSystem,
-    QgsFeature
-)
+try:
+    from qgis.core import (
+        QgsApplication,
+        QgsProject,
+        QgsVectorLayer,
+        QgsPointXY,
+        QgsGeometry,
+        QgsCoordinateReferenceSystem,
+        QgsCoordinateTransform,
+        QgsFeature
+    )
+    from qgis.PyQt.QtCore import QVariant
+    
+    from indices_espaciais import IndiceEixos, MotorFXD, ResolvedorMunicipios
+    QGIS_DISPONIVEL = True
+except ImportError:
+    # Sem PyQGIS apenas o backend Shapely (consulta_shapely.py) pode ser usado
+    QGIS_DISPONIVEL = False
+from continuidade import TabelaContinuidade, calcular_km_por_proporcao
+import instrumentacao
 
 
 # ============================================
@@ -46,6 +66,20 @@ PREFIXOS_SHAPEFILES = ['shape']  # Apenas eixos rodoviários (linhas)
 PREFIXOS_FXD = ['FXD']  # Faixa de Domínio (polígonos)
 PREFIXOS_MUNICIPIOS = ['municipios']  # Municípios
 
+# Distância máxima (m) entre o ponto e o eixo para aceitar a feição
+DISTANCIA_MAXIMA_EIXO = 200
+
+# Raio máximo (m) da busca em anéis pelo eixo mais próximo quando nenhum está
+# a DISTANCIA_MAXIMA_EIXO; o resultado volta marcado 'fora_do_limite' (0 desativa)
+DISTANCIA_MAXIMA_BUSCA = 5000
+
+# Coordenadas geográficas (GD) de entrada: WGS84, como exportado pelo Google Earth
+EPSG_GD = 4326
+
+# Distância (graus de longitude) à divisa entre zonas abaixo da qual um ponto
+# GD sem eixo na própria zona é consultado também na zona vizinha
+FAIXA_DIVISA_ZONAS = 0.5
+
 
 # ============================================
 # FUNÇÕES AUXILIARES - VALIDAÇÃO
@@ -67,16 +101,17 @@ def validar_coordenadas(x: float, y: float, zona: int) -> bool:
         print(f"❌ ERRO: Zona {zona} inválida. Use 23 ou 24.")
         return False
     
-    # Validação de coordenadas UTM por zona (Bahia)
+    # Validação de coordenadas UTM por zona (Bahia); perto da divisa 23/24
+    # (-42°) os ranges se sobrepõem, cobrindo FAIXA_DIVISA_ZONAS além dela
     if zona == 23:
         # Zona 23: Oeste da Bahia (valores X menores)
-        if not (160000 <= x <= 850000):
-            print(f"❌ ERRO: Coordenada X {x} fora do range esperado para zona 23 (160000-850000)")
+        if not (160000 <= x <= 890000):
+            print(f"❌ ERRO: Coordenada X {x} fora do range esperado para zona 23 (160000-890000)")
             return False
     elif zona == 24:
         # Zona 24: Leste da Bahia (valores X maiores)
-        if not (200000 <= x <= 850000):
-            print(f"❌ ERRO: Coordenada X {x} fora do range esperado para zona 24 (200000-850000)")
+        if not (110000 <= x <= 850000):
+            print(f"❌ ERRO: Coordenada X {x} fora do range esperado para zona 24 (110000-850000)")
             return False
     
     # Coordenada Y válida para toda Bahia
@@ -122,48 +157,431 @@ def buscar_municipio_por_coordenadas(ponto: QgsPointXY, zona: int) -> Optional[s
         Nome do município ou None
     """
     try:
-        # Procurar shapefile de municípios
-        municipios_shapes = []
-        for pattern in ['municipio*.shp', 'munic*.shp']:
-            municipios_shapes.extend(SHAPES_DIR.glob(pattern))
+        # Municípios da zona, resolvidos pela grade hierárquica em cache
+        atributos = CACHE_ZONAS.obter(zona).municipio_em(ponto)
         
-        if not municipios_shapes:
+        if atributos is None:
             return None
         
-        # Criar geometria do ponto
-        ponto_geom = QgsGeometry.fromPointXY(ponto)
-        
-        # Tentar cada shapefile de municípios
-        for shape_path in municipios_shapes:
-            layer = QgsVectorLayer(str(shape_path), "municipios", "ogr")
-            
-            if not layer.isValid():
-                continue
-            
-            # Buscar feição que contém o ponto
-            for feature in layer.getFeatures():
-                geom = feature.geometry()
-                
-                if geom.contains(ponto_geom):
-                    # Buscar campo com nome do município
-                    fields = [f.name() for f in layer.fields()]
-                    attrs = feature.attributes()
-                    
-                    for i, field in enumerate(fields):
-                        field_upper = field.upper()
-                        if any(x in field_upper for x in ['MUNICIPIO', 'MUNIC', 'NOME', 'NM_MUN']):
-                            return attrs[i]
-                    
-                    # Se não encontrou campo específico, retorna primeiro campo de texto
-                    return attrs[0] if attrs else None
+        # Buscar campo com nome do município
+        for field, valor in atributos.items():
+            field_upper = field.upper()
+            if any(x in field_upper for x in ['MUNICIPIO', 'MUNIC', 'NOME', 'NM_MUN']):
+                return valor
         
-        return None
+        # Se não encontrou campo específico, retorna primeiro campo de texto
+        valores = list(atributos.values())
+        return valores[0] if valores else None
     
     except Exception as e:
         print(f"⚠️  Aviso ao buscar município: {e}")
         return None
 
 
+# ============================================
+# CONVERSÃO GD → UTM
+# ============================================
+
+# Transformações já construídas, por par (EPSG de origem, EPSG de destino)
+_TRANSFORMACOES: Dict[Tuple[int, int], QgsCoordinateTransform] = {}
+
+
+def calcular_zona_utm(longitude: float) -> int:
+    """
+    Calcula a zona UTM com base na longitude.
+    
+    Args:
+        longitude: Longitude em graus decimais
+    
+    Returns:
+        Número da zona UTM (23 ou 24 para a Bahia)
+    """
+    return int((longitude + 180) / 6) + 1
+
+
+def calcular_zonas_utm(longitudes: np.ndarray) -> np.ndarray:
+    """Versão vetorizada de calcular_zona_utm."""
+    return (np.floor((np.asarray(longitudes, dtype=float) + 180) / 6) + 1).astype(int)
+
+
+def zonas_vizinhas(longitudes: np.ndarray) -> np.ndarray:
+    """
+    Zona vizinha a consultar para cada ponto perto da divisa entre zonas.
+    
+    Args:
+        longitudes: Longitudes em graus decimais
+    
+    Returns:
+        Por ponto, a zona (de ZONA_EPSG) do outro lado da divisa mais próxima,
+        se o ponto estiver a menos de FAIXA_DIVISA_ZONAS dela; 0 nos demais
+    """
+    longitudes = np.asarray(longitudes, dtype=float)
+    zonas = calcular_zonas_utm(longitudes)
+    oeste = -180.0 + 6.0 * (zonas - 1)
+    
+    vizinhas = np.where(longitudes - oeste < FAIXA_DIVISA_ZONAS, zonas - 1, 0)
+    vizinhas = np.where(oeste + 6.0 - longitudes < FAIXA_DIVISA_ZONAS, zonas + 1, vizinhas)
+    
+    return np.where(np.isin(vizinhas, list(ZONA_EPSG)), vizinhas, 0)
+
+
+def obter_transformacao(epsg_origem: int, epsg_destino: int) -> QgsCoordinateTransform:
+    """
+    Retorna a transformação entre dois sistemas, criando-a uma única vez.
+    
+    Args:
+        epsg_origem: EPSG das coordenadas de entrada
+        epsg_destino: EPSG das coordenadas de saída
+    
+    Returns:
+        Transformação de coordenadas
+    """
+    transformacao = _TRANSFORMACOES.get((epsg_origem, epsg_destino))
+    
+    if transformacao is None:
+        transformacao = QgsCoordinateTransform(
+            QgsCoordinateReferenceSystem(f"EPSG:{epsg_origem}"),
+            QgsCoordinateReferenceSystem(f"EPSG:{epsg_destino}"),
+            QgsProject.instance()
+        )
+        _TRANSFORMACOES[(epsg_origem, epsg_destino)] = transformacao
+    
+    return transformacao
+
+
+def converter_gd_para_utm(latitude: float, longitude: float,
+                          zona: Optional[int] = None) -> Tuple[float, float, int]:
+    """
+    Converte latitude/longitude em graus decimais para UTM, detectando a zona.
+    
+    Args:
+        latitude: Latitude em graus decimais
+        longitude: Longitude em graus decimais
+        zona: Zona de destino (padrão: a da longitude, ver calcular_zona_utm)
+    
+    Returns:
+        Tupla (x, y, zona)
+    """
+    zona = zona or calcular_zona_utm(longitude)
+    ponto_utm = obter_transformacao(EPSG_GD, 31960 + zona).transform(QgsPointXY(longitude, latitude))
+    return ponto_utm.x(), ponto_utm.y(), zona
+
+
+def converter_gd_para_utm_lote(latitudes, longitudes,
+                               zonas=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Converte arrays de latitude/longitude para UTM, uma transformação por zona.
+    
+    Args:
+        latitudes: Latitudes em graus decimais
+        longitudes: Longitudes em graus decimais
+        zonas: Zona de destino de cada ponto (array ou valor único; padrão:
+            a da longitude)
+    
+    Returns:
+        Tupla (xs, ys, zonas)
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    
+    if zonas is None:
+        zonas = calcular_zonas_utm(longitudes)
+    zonas = np.broadcast_to(np.asarray(zonas, dtype=int), latitudes.shape).copy()
+    
+    xs = np.empty(len(latitudes))
+    ys = np.empty(len(latitudes))
+    
+    for zona in np.unique(zonas).tolist():
+        transformacao = obter_transformacao(EPSG_GD, 31960 + zona)
+        for i in np.flatnonzero(zonas == zona).tolist():
+            ponto_utm = transformacao.transform(QgsPointXY(longitudes[i], latitudes[i]))
+            xs[i] = ponto_utm.x()
+            ys[i] = ponto_utm.y()
+    
+    return xs, ys, zonas
+
+
+# ============================================
+# VERSÃO DOS SHAPEFILES
+# ============================================
+
+# Arquivos de cada shapefile que entram na versão (hash) dos dados
+EXTENSOES_FONTE = ['.shp', '.shx', '.dbf', '.prj', '.cpg']
+
+
+def arquivos_fonte(zona: int) -> List[Path]:
+    """
+    Lista os arquivos dos shapefiles da zona que existem em disco.
+    
+    Args:
+        zona: Zona UTM
+    
+    Returns:
+        Caminhos em ordem fixa (camada, extensão)
+    """
+    arquivos = []
+    
+    for prefixo in PREFIXOS_SHAPEFILES + PREFIXOS_FXD + PREFIXOS_MUNICIPIOS:
+        for extensao in EXTENSOES_FONTE:
+            caminho = SHAPES_DIR / f"{prefixo}{zona}{extensao}"
+            if caminho.exists():
+                arquivos.append(caminho)
+    
+    return arquivos
+
+
+def assinatura_fontes(zona: int) -> List[List[Any]]:
+    """
+    Assinatura rápida das fontes (nome, tamanho, data de modificação), sem ler os arquivos.
+    
+    Args:
+        zona: Zona UTM
+    
+    Returns:
+        Lista [nome, tamanho, mtime_ns] por arquivo
+    """
+    assinatura = []
+    
+    for caminho in arquivos_fonte(zona):
+        info = caminho.stat()
+        assinatura.append([caminho.name, info.st_size, info.st_mtime_ns])
+    
+    return assinatura
+
+
+def hash_fontes(zona: int) -> str:
+    """
+    Calcula o hash SHA-256 do conteúdo dos shapefiles da zona.
+    
+    Args:
+        zona: Zona UTM
+    
+    Returns:
+        Hash hexadecimal
+    """
+    sha = hashlib.sha256()
+    
+    for caminho in arquivos_fonte(zona):
+        sha.update(caminho.name.encode('utf-8'))
+        with open(caminho, 'rb') as arq:
+            for bloco in iter(lambda: arq.read(1 << 20), b''):
+                sha.update(bloco)
+    
+    return sha.hexdigest()
+
+
+# ============================================
+# CACHE DE CAMADAS POR ZONA
+# ============================================
+
+def carregar_camada(caminho: Path, nome_camada: str) -> Optional[QgsVectorLayer]:
+    """
+    Carrega um shapefile como camada QGIS.
+    
+    Args:
+        caminho: Caminho do shapefile
+        nome_camada: Nome da camada
+    
+    Returns:
+        Camada carregada ou None se o arquivo não existir ou for inválido
+    """
+    if not caminho.exists():
+        return None
+    
+    camada = QgsVectorLayer(str(caminho), nome_camada, "ogr")
+    
+    if not camada.isValid():
+        return None
+    
+    return camada
+
+
+def ler_features(camada: Optional[QgsVectorLayer]) -> List[Tuple[QgsGeometry, Dict[str, Any]]]:
+    """
+    Lê todas as feições de uma camada para memória.
+    
+    Args:
+        camada: Camada QGIS (ou None)
+    
+    Returns:
+        Lista de tuplas (geometria, dicionário de atributos), ignorando geometrias vazias
+    """
+    if camada is None:
+        return []
+    
+    fields = [f.name() for f in camada.fields()]
+    features = []
+    
+    for feature in camada.getFeatures():
+        geom = feature.geometry()
+        if geom.isEmpty():
+            continue
+        
+        attrs = feature.attributes()
+        atributos_dict = {}
+        
+        for i, field in enumerate(fields):
+            valor = attrs[i]
+            # NULL do QGIS vira None (serializável entre processos e em JSON)
+            if isinstance(valor, QVariant) and valor.isNull():
+                valor = None
+            atributos_dict[field] = valor
+        
+        features.append((geom, atributos_dict))
+    
+    return features
+
+
+class DadosZona:
+    """
+    Camadas e feições de uma zona UTM mantidas em memória.
+    
+    Abre FXD{zona}, municipios{zona} e shape{zona} uma única vez e guarda
+    geometrias e atributos já lidos, de modo que as consultas seguintes
+    não precisem reabrir os shapefiles nem reler os DBFs.
+    """
+    
+    def __init__(self, zona: int):
+        self.zona = zona
+        carga = instrumentacao.iniciar()
+        
+        with carga.etapa('fxd'):
+            self.fxd_layer = carregar_camada(SHAPES_DIR / f"FXD{zona}.shp", "FXD")
+            self.fxd_features = ler_features(self.fxd_layer)
+        
+        with carga.etapa('municipios'):
+            self.munic_layer = carregar_camada(SHAPES_DIR / f"municipios{zona}.shp", "municipios")
+            self.munic_features = ler_features(self.munic_layer)
+        
+        with carga.etapa('shape'):
+            self.shape_layer = carregar_camada(SHAPES_DIR / f"shape{zona}.shp", "shape")
+        
+        with carga.etapa('todas_features'):
+            self.todas_features = ler_features(self.shape_layer)
+        
+        with carga.etapa('indices'):
+            # Pertinência à FXD (R-tree + geometrias preparadas)
+            self.motor_fxd = MotorFXD(self.fxd_features)
+            
+            # Índice espacial dos eixos para a busca por proximidade
+            self.indice_eixos = IndiceEixos(self.todas_features)
+        
+        with carga.etapa('continuidade'):
+            # Trechos de cada rodovia ordenados por SRE, com vizinhos e continuidade
+            self.continuidade = TabelaContinuidade(self.todas_features)
+        
+        # Campo com o nome do município (primeiro que casar com as palavras-chave)
+        self.campo_municipio = None
+        if self.munic_layer is not None:
+            for field in [f.name() for f in self.munic_layer.fields()]:
+                if any(x in field.upper() for x in ['NM_MUN', 'MUNICIPIO', 'MUNIC', 'NOME']):
+                    self.campo_municipio = field
+                    break
+        
+        with carga.etapa('indices'):
+            # Resolução de município por grade hierárquica + geometria preparada
+            self.resolvedor_municipios = ResolvedorMunicipios(self.munic_features)
+        
+        # Tempos da carga, incorporados às métricas da consulta que a provocou
+        self.metricas_carga = carga.como_dict()
+    
+    def municipio_em(self, ponto: QgsPointXY,
+                     metricas=instrumentacao.DESATIVADAS) -> Optional[Dict[str, Any]]:
+        """
+        Retorna os atributos do município que contém o ponto.
+        
+        Args:
+            ponto: Ponto de consulta
+            metricas: Métricas da consulta (ver instrumentacao.py)
+        
+        Returns:
+            Atributos do município ou None
+        """
+        idx = self.resolvedor_municipios.localizar(ponto, metricas)
+        if idx is None:
+            return None
+        
+        return self.munic_features[idx][1]
+    
+    def nome_municipio_em(self, ponto: QgsPointXY,
+                          metricas=instrumentacao.DESATIVADAS) -> Optional[str]:
+        """
+        Retorna o nome do município que contém o ponto.
+        
+        Args:
+            ponto: Ponto de consulta
+            metricas: Métricas da consulta (ver instrumentacao.py)
+        
+        Returns:
+            Nome do município ou None
+        """
+        atributos = self.municipio_em(ponto, metricas)
+        if atributos is None or not self.campo_municipio:
+            return None
+        
+        return atributos[self.campo_municipio]
+
+
+class CacheZonas:
+    """
+    Cache de processo com os dados de cada zona UTM.
+    
+    Cada zona é carregada na primeira consulta e reaproveitada nas demais.
+    Use invalidate() quando os shapefiles forem alterados em disco.
+    
+    Args:
+        fabrica: Construtor dos dados de uma zona (padrão: DadosZona)
+    """
+    
+    def __init__(self, fabrica: Callable[[int], Any] = None):
+        self._fabrica = fabrica
+        self._zonas: Dict[int, DadosZona] = {}
+        self._lock = threading.Lock()
+    
+    def __contains__(self, zona: int) -> bool:
+        """Se os dados da zona já estão em memória."""
+        return zona in self._zonas
+    
+    def obter(self, zona: int) -> DadosZona:
+        """
+        Retorna os dados da zona, carregando-os na primeira chamada.
+        
+        Args:
+            zona: Zona UTM (23 ou 24)
+        
+        Returns:
+            Dados da zona em memória
+        """
+        with self._lock:
+            dados = self._zonas.get(zona)
+            if dados is None:
+                dados = (self._fabrica or DadosZona)(zona)
+                self._zonas[zona] = dados
+            return dados
+    
+    def carregar_todas(self) -> None:
+        """Pré-carrega todas as zonas conhecidas (aquecimento do cache)."""
+        for zona in ZONA_EPSG:
+            self.obter(zona)
+    
+    def invalidate(self, zona: Optional[int] = None) -> None:
+        """
+        Descarta os dados em memória para que sejam relidos do disco.
+        
+        Args:
+            zona: Zona a invalidar (None invalida todas)
+        """
+        with self._lock:
+            if zona is None:
+                self._zonas.clear()
+            else:
+                self._zonas.pop(zona, None)
+
+
+# Cache único do processo, compartilhado por todas as consultas
+CACHE_ZONAS = CacheZonas()
+
+
 # ============================================
 # FUNÇÕES AUXILIARES - CÁLCULO DE KM
 # ============================================
@@ -247,7 +665,9 @@ def verificar_continuidade_trechos(trecho_atual: str, trecho_comparacao: str, po
 def calcular_km_no_eixo(geometria: QgsGeometry, ponto: QgsPointXY, 
                          km_inicial: float, km_final: float,
                          atributos: Dict[str, Any] = None,
-                         todas_features: List[Tuple] = None) -> Optional[float]:
+                         todas_features: List[Tuple] = None,
+                         continuidade: Optional[TabelaContinuidade] = None,
+                         verbose: bool = True) -> Optional[float]:
     """
     Calcula o KM no eixo rodoviário baseado na posição do ponto.
     Considera continuidade entre trechos para validar orientação da geometria.
@@ -259,11 +679,17 @@ def calcular_km_no_eixo(geometria: QgsGeometry, ponto: QgsPointXY,
         km_final: KM final do trecho
         atributos: Atributos da feature atual (incluindo TRECHO)
         todas_features: Lista de todas as features para análise de continuidade
+            (usada apenas se `continuidade` não for informada)
+        continuidade: Tabela de continuidade pré-calculada da zona
+        verbose: Exibe as mensagens de diagnóstico da orientação
     
     Returns:
         KM calculado ou None se erro
     """
     try:
+        if continuidade is None and todas_features:
+            continuidade = TabelaContinuidade(todas_features)
+        
         # Projeta o ponto na linha
         ponto_projetado = geometria.nearestPoint(QgsGeometry.fromPointXY(ponto))
         if ponto_projetado.isEmpty():
@@ -276,193 +702,11 @@ def calcular_km_no_eixo(geometria: QgsGeometry, ponto: QgsPointXY,
         if comprimento_total == 0:
             return None
         
-        # Calcula percentual percorrido
-        percentual = (distancia_ao_longo / comprimento_total) * 100
-        
-        # Calcula ambas as opções
-        proporcao = distancia_ao_longo / comprimento_total
-        km_opcao1 = km_inicial + (proporcao * (km_final - km_inicial))  # Normal
-        km_opcao2 = km_final - (proporcao * (km_final - km_inicial))    # Invertida
-        
-        # ====================================================================
-        # VALIDAÇÃO POR CONTINUIDADE DE TRECHOS (NOVA LÓGICA)
-        # ====================================================================
-        orientacao_validada = None
-        
-        if atributos and todas_features:
-            trecho_atual = atributos.get('TRECHO', '') or atributos.get('LOCAL_IN_', '') + ' - ' + atributos.get('LOCAL_FIM', '')
-            rodovia_atual = atributos.get('RODOVIA', '')
-            codigo_sre_atual = atributos.get('CÓDIGO SRE', atributos.get('COD_SRE', atributos.get('CODIGO_SRE', '')))
-            
-            if trecho_atual and rodovia_atual and codigo_sre_atual:
-                # Busca trechos anterior e posterior na mesma rodovia
-                trechos_rodovia = []
-                
-                for feat in todas_features:
-                    feat_rodovia = feat[1].get('RODOVIA', '')
-                    feat_cod_sre = feat[1].get('CÓDIGO SRE', feat[1].get('COD_SRE', feat[1].get('CODIGO_SRE', '')))
-                    feat_km_ini = feat[1].get('KM_INICIAL')
-                    feat_km_fim = feat[1].get('KM_FINAL')
-                    feat_local_ini = feat[1].get('LOCAL_IN_', '')
-                    feat_local_fim = feat[1].get('LOCAL_FIM', '')
-                    
-                    if feat_rodovia == rodovia_atual and feat_cod_sre and feat_km_ini is not None:
-                        trechos_rodovia.append({
-                            'cod_sre': feat_cod_sre,
-                            'km_ini': float(feat_km_ini),
-                            'km_fim': float(feat_km_fim) if feat_km_fim is not None else float(feat_km_ini),
-                            'local_ini': feat_local_ini,
-                            'local_fim': feat_local_fim
-                        })
-                
-                # Ordena por código SRE (indica sequência lógica dos trechos)
-                trechos_rodovia.sort(key=lambda x: x['cod_sre'])
-                
-                # Encontra índice do trecho atual
-                idx_atual = None
-                for i, t in enumerate(trechos_rodovia):
-                    if t['cod_sre'] == codigo_sre_atual:
-                        idx_atual = i
-                        break
-                
-                if idx_atual is not None and len(trechos_rodovia) > 1:
-                    continuidade_detectada = False
-                    
-                    # Verifica trecho anterior
-                    if idx_atual > 0:
-                        trecho_anterior = trechos_rodovia[idx_atual - 1]
-                        
-                        # O KM FINAL do anterior deve ser igual ao KM INICIAL do atual
-                        dif_km = abs(trecho_anterior['km_fim'] - km_inicial)
-                        
-                        if dif_km < 0.5:  # Tolerância de 500m
-                            continuidade_detectada = True
-                    
-                    # Verifica trecho posterior
-                    if idx_atual < len(trechos_rodovia) - 1:
-                        trecho_posterior = trechos_rodovia[idx_atual + 1]
-                        
-                        # O KM FINAL do atual deve ser igual ao KM INICIAL do posterior
-                        dif_km = abs(km_final - trecho_posterior['km_ini'])
-                        
-                        if dif_km < 0.5:
-                            continuidade_detectada = True
-                    
-                    # Se há continuidade validada, detectar orientação da geometria
-                    if continuidade_detectada and idx_atual is not None:
-                        # ESTRATÉGIA DEFINITIVA: Usar continuidade para determinar orientação
-                        # Se temos trecho anterior: o fim do anterior deve conectar com o início do atual
-                        # Isso nos diz QUAL extremo do trecho atual é o "início lógico"
-                        
-                        if km_inicial < km_final and idx_atual > 0:
-                            # Temos trecho anterior - verificar qual extremo conecta
-                            trecho_anterior = trechos_rodovia[idx_atual - 1]
-                            km_fim_anterior = trecho_anterior['km_fim']
-                            
-                            # Qual extremo do trecho atual está mais próximo do fim do anterior?
-                            dist_inicial_anterior = abs(km_inicial - km_fim_anterior)
-                            dist_final_anterior = abs(km_final - km_fim_anterior)
-                            
-                            if dist_inicial_anterior < dist_final_anterior:
-                                # KM_INICIAL conecta com o anterior = início lógico é KM_INICIAL
-                                # Portanto: geometria deveria começar no percentual 0% e ir até 100%
-                                # Se percentual BAIXO resulta em KM próximo de KM_INICIAL → NORMAL
-                                # Se percentual ALTO resulta em KM próximo de KM_INICIAL → INVERTIDA
-                                
-                                # Testar: onde está o ponto na geometria?
-                                if percentual < 50:  # Início da geometria
-                                    # Início da geometria deve ter KM baixo (próximo de KM_INICIAL)
-                                    dist_opcao1_inicial = abs(km_opcao1 - km_inicial)
-                                    dist_opcao2_inicial = abs(km_opcao2 - km_inicial)
-                                    
-                                    if dist_opcao1_inicial < dist_opcao2_inicial:
-                                        orientacao_validada = 'normal'
-                                    else:
-                                        orientacao_validada = 'invertida'
-                                else:  # Fim da geometria (percentual >= 50%)
-                                    # Fim da geometria deve ter KM alto (próximo de KM_FINAL)
-                                    # Testar se km_opcao1 (cálculo normal) está próximo do fim
-                                    dist_opcao1_final = abs(km_opcao1 - km_final)
-                                    dist_opcao1_inicial = abs(km_opcao1 - km_inicial)
-                                    comprimento_trecho = km_final - km_inicial
-                                    
-                                    # Calcular proximidade RELATIVA (em % do comprimento do trecho)
-                                    prox_final_percent = (dist_opcao1_final / comprimento_trecho) * 100
-                                    prox_inicial_percent = (dist_opcao1_inicial / comprimento_trecho) * 100
-                                    
-                                    # Se está dentro de 10% do fim, considera próximo do fim
-                                    if prox_final_percent < 10:
-                                        # Muito próximo do fim = NORMAL
-                                        orientacao_validada = 'normal'
-                                    elif prox_inicial_percent < 10:
-                                        # Muito próximo do início = INVERTIDA
-                                        orientacao_validada = 'invertida'
-                                    elif dist_opcao1_inicial < dist_opcao1_final:
-                                        # Mais próximo do início = INVERTIDA
-                                        orientacao_validada = 'invertida'
-                                    else:
-                                        # Mais próximo do fim = NORMAL
-                                        orientacao_validada = 'normal'
-                            else:
-                                # KM_FINAL conecta com o anterior = início lógico é KM_FINAL
-                                # Geometria foi desenhada invertida em relação à quilometragem
-                                orientacao_validada = 'invertida'
-                        
-                        elif km_inicial < km_final and idx_atual == 0:
-                            # Primeiro trecho da rodovia - usar KM 0 como referência
-                            # Se km_inicial ≈ 0, o início lógico é KM_INICIAL
-                            if km_inicial < 1.0:  # Começa próximo do KM 0
-                                # Percentual baixo deve resultar em KM baixo
-                                if percentual < 50:
-                                    dist_opcao1_inicial = abs(km_opcao1 - km_inicial)
-                                    dist_opcao2_inicial = abs(km_opcao2 - km_inicial)
-                                    orientacao_validada = 'normal' if dist_opcao1_inicial < dist_opcao2_inicial else 'invertida'
-                                    print(f"   🎯 Primeiro trecho: geometria {'NORMAL' if orientacao_validada == 'normal' else 'INVERTIDA'}")
-                                else:
-                                    dist_opcao1_final = abs(km_opcao1 - km_final)
-                                    dist_opcao2_final = abs(km_opcao2 - km_final)
-                                    orientacao_validada = 'normal' if dist_opcao1_final < dist_opcao2_final else 'invertida'
-                                    print(f"   🎯 Primeiro trecho: geometria {'NORMAL' if orientacao_validada == 'normal' else 'INVERTIDA'}")
-                            else:
-                                # Não começa no KM 0 - usar heurística
-                                orientacao_validada = 'normal'
-                                print(f"   🎯 Primeiro trecho sem KM 0: assumindo NORMAL")
-                        
-                        elif km_inicial < km_final:
-                            # Sem trecho anterior válido - usar heurística
-                            if percentual > 70:
-                                dist_opcao1_final = abs(km_opcao1 - km_final)
-                                dist_opcao2_final = abs(km_opcao2 - km_final)
-                                orientacao_validada = 'normal' if dist_opcao1_final < dist_opcao2_final else 'invertida'
-                            else:
-                                dist_opcao1_inicial = abs(km_opcao1 - km_inicial)
-                                dist_opcao2_inicial = abs(km_opcao2 - km_inicial)
-                                orientacao_validada = 'normal' if dist_opcao1_inicial < dist_opcao2_inicial else 'invertida'
-                            print(f"   🎯 Heurística: geometria {'NORMAL' if orientacao_validada == 'normal' else 'INVERTIDA'}")
-                        else:
-                            # KM decrescente
-                            orientacao_validada = 'normal'
-        
-        # ====================================================================
-        # ESCOLHA DO KM BASEADO EM VALIDAÇÃO
-        # ====================================================================
-        
-        if orientacao_validada == 'normal':
-            # Validação confirmou: usar cálculo normal
-            km_calculado = km_opcao1
-        elif orientacao_validada == 'invertida':
-            # Validação confirmou: usar cálculo invertido
-            km_calculado = km_opcao2
-        else:
-            # SEM VALIDAÇÃO: usar heurística baseada em crescente/decrescente
-            if km_inicial < km_final:
-                # KM crescente: geometria deve seguir ordem normal
-                km_calculado = km_opcao1
-            else:
-                # KM decrescente: geometria deve seguir ordem invertida
-                km_calculado = km_opcao2
-        
-        return km_calculado
+        return calcular_km_por_proporcao(distancia_ao_longo / comprimento_total,
+                                         km_inicial, km_final,
+                                         atributos=atributos,
+                                         continuidade=continuidade,
+                                         verbose=verbose)
     
     except Exception as e:
         print(f"❌ Erro ao calcular KM: {e}")
@@ -485,195 +729,855 @@ def calcular_distancia_do_eixo(ponto: QgsPointXY, geometria: QgsGeometry) -> flo
 
 
 # ============================================
-# FUNÇÃO PRINCIPAL - CONSULTA
+# ETAPAS DA CONSULTA
 # ============================================
 
-def consultar_coordenadas(x: float, y: float, zona: int) -> Optional[Dict[str, Any]]:
+def extrair_campos_km(atributos: Dict[str, Any]) -> Tuple[Any, Any]:
     """
-    Executa consulta completa de coordenadas nos shapefiles.
-    Verifica: FXD (polígonos), Shape (linhas do eixo), Municípios
+    Busca os campos de KM inicial e final pelos nomes dos campos.
     
     Args:
-        x: Coordenada X (Este) em metros
-        y: Coordenada Y (Norte) em metros
-        zona: Zona UTM (23 ou 24)
+        atributos: Atributos da feição do eixo
     
     Returns:
-        Dicionário com resultados ou None se não encontrado
+        Tupla (km_inicial, km_final); None onde o campo não existir
     """
-    # Validações
-    if not validar_coordenadas(x, y, zona):
-        return None
-    
-    # Criar ponto de consulta
-    epsg = ZONA_EPSG[zona]
-    crs = QgsCoordinateReferenceSystem(f"EPSG:{epsg}")
-    ponto = QgsPointXY(x, y)
-    ponto_geom = QgsGeometry.fromPointXY(ponto)
-    
-    # ========================================
-    # 1. VERIFICAR SE ESTÁ DENTRO DA FXD (polígono)
-    # ========================================
-    fxd_info = None
-    dentro_fxd = False
-    
-    fxd_shape = SHAPES_DIR / f"FXD{zona}.shp"
-    if fxd_shape.exists():
-        fxd_layer = QgsVectorLayer(str(fxd_shape), "FXD", "ogr")
-        
-        if fxd_layer.isValid():
-            for feature in fxd_layer.getFeatures():
-                if feature.geometry().contains(ponto_geom) or feature.geometry().intersects(ponto_geom):
-                    dentro_fxd = True
-                    attrs = feature.attributes()
-                    fields = [f.name() for f in fxd_layer.fields()]
-                    
-                    fxd_info = {}
-                    for i, field in enumerate(fields):
-                        if field.upper() not in ['FID', 'SHAPE_LENG', 'SHAPE_LEN', 'OBJECTID', 'SHAPE_AREA']:
-                            fxd_info[field] = attrs[i]
-                    
-                    print(f"\n✅ Ponto DENTRO da Faixa de Domínio")
-                    break
-    
-    # ========================================
-    # 2. BUSCAR MUNICÍPIO
-    # ========================================
-    municipio = None
-    
-    munic_shape = SHAPES_DIR / f"municipios{zona}.shp"
-    if munic_shape.exists():
-        munic_layer = QgsVectorLayer(str(munic_shape), "municipios", "ogr")
-        
-        if munic_layer.isValid():
-            for feature in munic_layer.getFeatures():
-                if feature.geometry().contains(ponto_geom):
-                    attrs = feature.attributes()
-                    fields = [f.name() for f in munic_layer.fields()]
-                    
-                    for i, field in enumerate(fields):
-                        if any(x in field.upper() for x in ['NM_MUN', 'MUNICIPIO', 'MUNIC', 'NOME']):
-                            municipio = attrs[i]
-                            break
-                    break
+    km_inicial = None
+    km_final = None
     
-    # ========================================
-    # 3. BUSCAR EIXO RODOVIÁRIO MAIS PRÓXIMO
-    # ========================================
-    shape_shape = SHAPES_DIR / f"shape{zona}.shp"
-    if not shape_shape.exists():
-        print(f"\n❌ Shapefile shape{zona}.shp não encontrado")
-        return None
+    for field, valor in atributos.items():
+        field_lower = field.lower()
+        if 'km' in field_lower and 'inicial' in field_lower:
+            km_inicial = valor
+        elif 'km' in field_lower and 'final' in field_lower:
+            km_final = valor
     
-    shape_layer = QgsVectorLayer(str(shape_shape), "shape", "ogr")
+    return km_inicial, km_final
+
+
+def buscar_candidatos_eixo(dados: DadosZona, ponto: QgsPointXY,
+                           distancia_maxima: float = DISTANCIA_MAXIMA_EIXO,
+                           metricas=instrumentacao.DESATIVADAS) -> Tuple[List[Tuple[float, int]], float]:
+    """
+    Busca os eixos dentro da distância máxima do ponto.
     
-    if not shape_layer.isValid():
-        print(f"   ❌ Erro ao carregar shape{zona}.shp")
-        return None
+    Args:
+        dados: Dados da zona
+        ponto: Ponto de consulta
+        distancia_maxima: Raio de busca em metros
+        metricas: Métricas da consulta (ver instrumentacao.py)
     
-    # Buscar feição mais próxima
-    resultado_final = None
+    Returns:
+        Tupla (candidatos, menor_distancia_fora): candidatos como (distância, índice)
+        ordenados por distância, e a menor distância entre os eixos fora do limite
+    """
+    todas_features = dados.todas_features
     menor_distancia = float('inf')
-    total_features = shape_layer.featureCount()
-    features_processadas = 0
-    features_dentro_limite = 0
-    distancia_maxima = 200  # Aumentado para 200m
-    
-    # Primeiro, coletar TODAS as features para análise de continuidade
-    todas_features = []
-    fields = [f.name() for f in shape_layer.fields()]
+    candidatos = []
     
-    for feature in shape_layer.getFeatures():
-        geom = feature.geometry()
-        if geom.isEmpty():
+    # Apenas os eixos cujo retângulo envolvente está dentro do raio de busca
+    proximos = dados.indice_eixos.candidatos(ponto, distancia_maxima)
+    for idx in proximos:
+        distancia = calcular_distancia_do_eixo(ponto, todas_features[idx][0])
+        
+        # Filtrar por distância máxima
+        if distancia > distancia_maxima:
+            # Guardar menor distância para feedback (mesmo fora do limite)
+            if distancia < menor_distancia:
+                menor_distancia = distancia
             continue
         
-        attrs = feature.attributes()
-        atributos_dict = {}
-        
-        for i, field in enumerate(fields):
-            atributos_dict[field] = attrs[i]
-        
-        todas_features.append((geom, atributos_dict))
+        candidatos.append((distancia, idx))
+    
+    metricas.contar('feicoes_varridas', len(proximos))
+    metricas.contar('operacoes_geometricas', len(proximos))
+    metricas.contar('candidatos_no_raio', len(candidatos))
+    
+    # Ordenação estável: em caso de empate vale a ordem das feições
+    candidatos.sort(key=lambda c: c[0])
+    
+    return candidatos, menor_distancia
+
+
+def buscar_em_aneis(candidatos_no_retangulo: Callable[[float], List[int]],
+                    medir_distancias: Callable[[List[int]], List[float]],
+                    raio_inicial: float, raio_maximo: float,
+                    metricas=instrumentacao.DESATIVADAS) -> List[Tuple[float, int]]:
+    """
+    Busca o eixo mais próximo em anéis crescentes, sem medir a rede inteira.
     
-    # Agora processar cada feature para encontrar a mais próxima
-    for feature_data in todas_features:
-        features_processadas += 1
-        geom, atributos_dict = feature_data
+    A cada anel o índice espacial devolve apenas os eixos cujo retângulo
+    envolvente toca o quadrado de lado 2 x raio; só esses (e só uma vez
+    cada) têm a distância exata medida. Qualquer eixo a até `raio` do ponto
+    tem o retângulo dentro do quadrado, de modo que a busca termina assim
+    que algum eixo medido estiver a até `raio`. O raio dobra a cada anel,
+    mas nunca passa da menor distância já medida (com ela o próximo anel
+    certamente contém o mais próximo) nem de `raio_maximo`.
+    
+    Args:
+        candidatos_no_retangulo: Índices dos eixos cujo retângulo toca o
+            quadrado de meio-lado `raio` centrado no ponto
+        medir_distancias: Distância exata do ponto a cada eixo da lista
+        raio_inicial: Raio do primeiro anel (m)
+        raio_maximo: Raio máximo da busca (m)
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Eixos a até o raio final como (distância, índice), ordenados por
+        distância (empate: ordem das feições); lista vazia se nenhum eixo
+        estiver a até `raio_maximo`
+    """
+    medidas: Dict[int, float] = {}
+    raio = min(raio_inicial, raio_maximo)
+    
+    while raio > 0:
+        metricas.contar('aneis')
+        novos = [idx for idx in candidatos_no_retangulo(raio) if idx not in medidas]
+        medidas.update(zip(novos, medir_distancias(novos)))
         
-        # Calcular distância ao eixo
-        distancia = calcular_distancia_do_eixo(ponto, geom)
+        metricas.contar('feicoes_varridas', len(novos))
+        metricas.contar('operacoes_geometricas', len(novos))
         
-        # Filtrar por distância máxima
-        if distancia > distancia_maxima:
-            # Guardar menor distância para feedback (mesmo fora do limite)
-            if distancia < menor_distancia:
-                menor_distancia = distancia
-            continue
+        no_raio = sorted((distancia, idx) for idx, distancia in medidas.items() if distancia <= raio)
+        if no_raio or raio >= raio_maximo:
+            return no_raio
         
-        features_dentro_limite += 1
+        raio = min(2 * raio, min(medidas.values(), default=float('inf')), raio_maximo)
+    
+    return []
+
+
+def buscar_eixo_mais_proximo(dados: DadosZona, ponto: QgsPointXY, raio_inicial: float,
+                             metricas=instrumentacao.DESATIVADAS) -> List[Tuple[float, int]]:
+    """
+    Eixos mais próximos do ponto além de DISTANCIA_MAXIMA_EIXO (ver buscar_em_aneis).
+    
+    Args:
+        dados: Dados da zona
+        ponto: Ponto de consulta
+        raio_inicial: Raio do primeiro anel (m)
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Candidatos (distância, índice) ordenados por distância
+    """
+    todas_features = dados.todas_features
+    
+    return buscar_em_aneis(
+        lambda raio: dados.indice_eixos.candidatos(ponto, raio),
+        lambda indices: [calcular_distancia_do_eixo(ponto, todas_features[idx][0]) for idx in indices],
+        raio_inicial, DISTANCIA_MAXIMA_BUSCA, metricas
+    )
+
+
+def raio_inicial_aneis(distancia_maxima: float, menor_distancia_fora: float) -> float:
+    """
+    Raio do primeiro anel após a busca no limite: o dobro do limite, ou menos
+    se um eixo já medido fora do limite estiver mais perto que isso.
+    """
+    return min(2 * distancia_maxima, menor_distancia_fora)
+
+
+def escolher_eixo(dados: DadosZona, ponto: QgsPointXY,
+                  candidatos: List[Tuple[float, int]],
+                  verbose: bool = True,
+                  metricas=instrumentacao.DESATIVADAS) -> Optional[Tuple[float, int, Any, Any, float]]:
+    """
+    Escolhe o eixo mais próximo cujo KM pode ser calculado.
+    
+    Args:
+        dados: Dados da zona
+        ponto: Ponto de consulta
+        candidatos: Candidatos (distância, índice) ordenados por distância
+        verbose: Exibe as mensagens de diagnóstico do cálculo de KM
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Tupla (distância, índice, km_inicial, km_final, km_calculado) ou None
+    """
+    for distancia, idx in candidatos:
+        geom, atributos_dict = dados.todas_features[idx]
         
         # Buscar campos de KM
-        km_inicial = None
-        km_final = None
-        
-        for field, valor in atributos_dict.items():
-            field_lower = field.lower()
-            if 'km' in field_lower and 'inicial' in field_lower:
-                km_inicial = valor
-            elif 'km' in field_lower and 'final' in field_lower:
-                km_final = valor
+        km_inicial, km_final = extrair_campos_km(atributos_dict)
         
         if km_inicial is None or km_final is None:
             continue
         
-        # Calcular KM exato (passando atributos e todas as features para análise de continuidade)
+        # Calcular KM exato (passando atributos e a tabela de continuidade da zona)
+        # nearestPoint, lineLocatePoint e length: três operações geométricas
+        metricas.contar('operacoes_geometricas', 3)
         km_calculado = calcular_km_no_eixo(geom, ponto, km_inicial, km_final, 
                                            atributos=atributos_dict, 
-                                           todas_features=todas_features)
+                                           continuidade=dados.continuidade,
+                                           verbose=verbose)
         
         if km_calculado is None:
             continue
         
-        # Se é o mais próximo até agora (já passou pelo filtro de distância máxima)
-        if resultado_final is None or distancia < resultado_final['distancia_eixo']:
-            menor_distancia = distancia
-            
-            # Montar resultado
-            resultado_final = {
-                'shapefile': f'shape{zona}',
-                'distancia_eixo': distancia,
-                'km_inicial': km_inicial,
-                'km_final': km_final,
-                'km_calculado': km_calculado,
-                'dentro_fxd': dentro_fxd,
-                'municipio': municipio,
-                'attributes': atributos_dict.copy()
-            }
-            
-            # Adicionar atributos da FXD se estiver dentro
-            if fxd_info:
-                resultado_final['fxd_info'] = fxd_info
+        return distancia, idx, km_inicial, km_final, km_calculado
+    
+    return None
+
+
+def montar_resultado(dados: DadosZona, eixo: Tuple[float, int, Any, Any, float],
+                     dentro_fxd: bool, fxd_info: Optional[Dict[str, Any]],
+                     municipio: Optional[str], fora_do_limite: bool = False) -> Dict[str, Any]:
+    """
+    Monta o dicionário de resultado da consulta.
+    
+    Args:
+        dados: Dados da zona
+        eixo: Eixo escolhido (ver escolher_eixo)
+        dentro_fxd: Se o ponto está dentro da FXD
+        fxd_info: Atributos da FXD (se dentro)
+        municipio: Nome do município
+        fora_do_limite: Eixo achado pela busca em anéis, além de DISTANCIA_MAXIMA_EIXO
+    
+    Returns:
+        Dicionário com os resultados
+    """
+    distancia, idx, km_inicial, km_final, km_calculado = eixo
+    
+    resultado = {
+        'shapefile': f'shape{dados.zona}',
+        'distancia_eixo': distancia,
+        'km_inicial': km_inicial,
+        'km_final': km_final,
+        'km_calculado': km_calculado,
+        'dentro_fxd': dentro_fxd,
+        'municipio': municipio,
+        'fora_do_limite': fora_do_limite,
+        'attributes': dados.todas_features[idx][1].copy()
+    }
+    
+    # Adicionar atributos da FXD se estiver dentro
+    if fxd_info:
+        resultado['fxd_info'] = fxd_info
+    
+    return resultado
+
+
+# ============================================
+# FUNÇÃO PRINCIPAL - CONSULTA
+# ============================================
+
+def consultar_coordenadas(x: float, y: float, zona: int) -> Optional[Dict[str, Any]]:
+    """
+    Executa consulta completa de coordenadas nos shapefiles.
+    Verifica: FXD (polígonos), Shape (linhas do eixo), Municípios
+    
+    Args:
+        x: Coordenada X (Este) em metros
+        y: Coordenada Y (Norte) em metros
+        zona: Zona UTM (23 ou 24)
+    
+    Returns:
+        Dicionário com resultados ou None se não encontrado. Sem eixo a até
+        DISTANCIA_MAXIMA_EIXO, o eixo mais próximo a até DISTANCIA_MAXIMA_BUSCA
+        volta com 'fora_do_limite' True. Com a instrumentação ativa
+        (instrumentacao.py), inclui 'metricas' com o tempo de cada etapa e
+        os contadores da consulta
+    """
+    # Validações
+    if not validar_coordenadas(x, y, zona):
+        return None
+    
+    # Criar ponto de consulta
+    ponto = QgsPointXY(x, y)
+    metricas = instrumentacao.iniciar()
+    
+    # Camadas e feições da zona (carregadas uma única vez por processo)
+    with metricas.etapa('carga_zona'):
+        carregada = zona in CACHE_ZONAS
+        dados = CACHE_ZONAS.obter(zona)
     
-    if resultado_final:
-        return resultado_final
+    if not carregada:
+        metricas.incorporar(dados.metricas_carga, prefixo='carga.')
+    
+    # ========================================
+    # 1. VERIFICAR SE ESTÁ DENTRO DA FXD (polígono)
+    # ========================================
+    with metricas.etapa('fxd'):
+        fxd_info = dados.motor_fxd.localizar(ponto, metricas)
+    dentro_fxd = fxd_info is not None
+    
+    if dentro_fxd:
+        print(f"\n✅ Ponto DENTRO da Faixa de Domínio")
+    
+    # ========================================
+    # 2. BUSCAR MUNICÍPIO
+    # ========================================
+    with metricas.etapa('municipio'):
+        municipio = dados.nome_municipio_em(ponto, metricas)
+    
+    # ========================================
+    # 3. BUSCAR EIXO RODOVIÁRIO MAIS PRÓXIMO
+    # ========================================
+    shape_shape = SHAPES_DIR / f"shape{zona}.shp"
+    if not shape_shape.exists():
+        print(f"\n❌ Shapefile shape{zona}.shp não encontrado")
+        return None
+    
+    if dados.shape_layer is None:
+        print(f"   ❌ Erro ao carregar shape{zona}.shp")
+        return None
+    
+    distancia_maxima = DISTANCIA_MAXIMA_EIXO
+    with metricas.etapa('busca_eixos'):
+        candidatos, menor_distancia = buscar_candidatos_eixo(dados, ponto, distancia_maxima, metricas)
+    
+    # ========================================
+    # 4. CALCULAR KM NO EIXO MAIS PRÓXIMO
+    # ========================================
+    with metricas.etapa('calculo_km'):
+        eixo = escolher_eixo(dados, ponto, candidatos, metricas=metricas)
+    
+    if eixo:
+        with metricas.etapa('montagem'):
+            resultado = montar_resultado(dados, eixo, dentro_fxd, fxd_info, municipio)
+        return instrumentacao.publicar(metricas, resultado)
     
     print(f"\n❌ Nenhuma feição encontrada dentro do limite de {distancia_maxima}m.")
-    if menor_distancia != float('inf'):
-        print(f"ℹ️  Rodovia mais próxima está a {menor_distancia:.2f}m de distância.")
+    
+    # ========================================
+    # 5. EIXO MAIS PRÓXIMO FORA DO LIMITE (busca em anéis)
+    # ========================================
+    with metricas.etapa('busca_aneis'):
+        proximos = buscar_eixo_mais_proximo(dados, ponto, raio_inicial_aneis(distancia_maxima, menor_distancia),
+                                            metricas)
+    
+    with metricas.etapa('calculo_km'):
+        eixo = escolher_eixo(dados, ponto, proximos, verbose=False, metricas=metricas)
+    
+    if eixo:
+        print(f"ℹ️  Rodovia mais próxima está a {eixo[0]:.2f}m de distância (resultado fora do limite).")
+        with metricas.etapa('montagem'):
+            resultado = montar_resultado(dados, eixo, dentro_fxd, fxd_info, municipio, fora_do_limite=True)
+        return instrumentacao.publicar(metricas, resultado)
+    
+    instrumentacao.publicar(metricas)
+    if DISTANCIA_MAXIMA_BUSCA > distancia_maxima:
+        print(f"ℹ️  Nenhuma rodovia a menos de {DISTANCIA_MAXIMA_BUSCA:g}m.")
     return None
 
 
+# ============================================
+# CONSULTA EM LOTE
+# ============================================
+
+# Colunas do resultado em lote (mesmos campos de resultado_final)
+COLUNAS_LOTE = [
+    'x', 'y', 'zona', 'encontrado', 'shapefile', 'distancia_eixo',
+    'km_inicial', 'km_final', 'km_calculado', 'dentro_fxd', 'municipio',
+    'attributes', 'fxd_info'
+]
+
+
+def validar_coordenadas_lote(xs: np.ndarray, ys: np.ndarray, zonas: np.ndarray) -> np.ndarray:
+    """
+    Versão vetorizada (e silenciosa) de validar_coordenadas.
+    
+    Args:
+        xs: Coordenadas X (Este)
+        ys: Coordenadas Y (Norte)
+        zonas: Zonas UTM
+    
+    Returns:
+        Máscara booleana com os pontos válidos
+    """
+    validas = (
+        ((zonas == 23) & (xs >= 160000) & (xs <= 890000)) |
+        ((zonas == 24) & (xs >= 110000) & (xs <= 850000))
+    )
+    return validas & (ys >= 8000000) & (ys <= 9200000)
+
+
+def iniciar_colunas_lote(xs: np.ndarray, ys: np.ndarray, zonas: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Cria as colunas vazias do resultado em lote (ver COLUNAS_LOTE).
+    
+    Args:
+        xs: Coordenadas X
+        ys: Coordenadas Y
+        zonas: Zonas UTM
+    
+    Returns:
+        Dicionário coluna -> array, com 'encontrado' False e NaN nos KMs
+    """
+    n = len(xs)
+    
+    return {
+        'x': xs.copy(),
+        'y': ys.copy(),
+        'zona': zonas.copy(),
+        'encontrado': np.zeros(n, dtype=bool),
+        'shapefile': np.full(n, None, dtype=object),
+        'distancia_eixo': np.full(n, np.nan),
+        'km_inicial': np.full(n, np.nan),
+        'km_final': np.full(n, np.nan),
+        'km_calculado': np.full(n, np.nan),
+        'dentro_fxd': np.zeros(n, dtype=bool),
+        'municipio': np.full(n, None, dtype=object),
+        'attributes': np.full(n, None, dtype=object),
+        'fxd_info': np.full(n, None, dtype=object)
+    }
+
+
+def gravar_resultado_lote(colunas: Dict[str, np.ndarray], i: int, resultado: Dict[str, Any]) -> None:
+    """
+    Grava o resultado de montar_resultado na linha `i` do lote.
+    
+    Args:
+        colunas: Colunas criadas por iniciar_colunas_lote
+        i: Linha do lote
+        resultado: Resultado da consulta do ponto
+    """
+    colunas['encontrado'][i] = True
+    for campo in COLUNAS_LOTE[4:]:
+        valor = resultado.get(campo)
+        if campo in ('km_inicial', 'km_final', 'km_calculado', 'distancia_eixo'):
+            valor = float(valor)
+        colunas[campo][i] = valor
+
+
+def consultar_lote(xs, ys, zonas, como_dataframe: bool = False):
+    """
+    Consulta um lote de coordenadas, executando cada etapa para o lote inteiro.
+    
+    Os pontos são agrupados por zona; para cada zona as etapas (FXD,
+    município, eixo e KM) rodam sobre todos os pontos do grupo, sem
+    mensagens por ponto.
+    
+    Args:
+        xs: Coordenadas X (array NumPy, lista ou coluna)
+        ys: Coordenadas Y
+        zonas: Zonas UTM (array ou um único valor para todo o lote)
+        como_dataframe: Retorna um pandas.DataFrame em vez de dicionário
+    
+    Returns:
+        Resultado colunar: dicionário coluna -> array (ver COLUNAS_LOTE)
+        ou DataFrame. Pontos sem eixo têm 'encontrado' False e NaN nos KMs.
+        Com a instrumentação ativa, as métricas do lote ficam em
+        instrumentacao.ultimas().
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    zonas = np.broadcast_to(np.asarray(zonas, dtype=int), xs.shape)
+    
+    colunas = iniciar_colunas_lote(xs, ys, zonas)
+    metricas = instrumentacao.iniciar()
+    metricas.contar('pontos', len(xs))
+    
+    validas = validar_coordenadas_lote(xs, ys, zonas)
+    
+    for zona in np.unique(zonas[validas]):
+        with metricas.etapa('carga_zona'):
+            carregada = int(zona) in CACHE_ZONAS
+            dados = CACHE_ZONAS.obter(int(zona))
+        
+        if not carregada:
+            metricas.incorporar(dados.metricas_carga, prefixo='carga.')
+        
+        indices = np.flatnonzero(validas & (zonas == zona))
+        pontos = [QgsPointXY(xs[i], ys[i]) for i in indices]
+        
+        # Etapa 1: FXD
+        with metricas.etapa('fxd'):
+            fxd = [dados.motor_fxd.localizar(p, metricas) for p in pontos]
+        
+        # Etapa 2: município
+        with metricas.etapa('municipio'):
+            municipios = [dados.nome_municipio_em(p, metricas) for p in pontos]
+        
+        colunas['dentro_fxd'][indices] = [f is not None for f in fxd]
+        colunas['municipio'][indices] = municipios
+        
+        if dados.shape_layer is None:
+            continue
+        
+        # Etapa 3: eixos candidatos
+        with metricas.etapa('busca_eixos'):
+            candidatos = [buscar_candidatos_eixo(dados, p, metricas=metricas)[0] for p in pontos]
+        
+        # Etapa 4: KM no eixo mais próximo
+        with metricas.etapa('calculo_km'):
+            eixos = [escolher_eixo(dados, p, c, verbose=False, metricas=metricas)
+                     for p, c in zip(pontos, candidatos)]
+        
+        with metricas.etapa('montagem'):
+            for i, eixo, fxd_info, municipio in zip(indices, eixos, fxd, municipios):
+                if eixo is None:
+                    continue
+                
+                resultado = montar_resultado(dados, eixo, fxd_info is not None, fxd_info, municipio)
+                gravar_resultado_lote(colunas, i, resultado)
+    
+    # Lote: métricas somadas de todos os pontos, em instrumentacao.ultimas()
+    instrumentacao.publicar(metricas)
+    
+    if como_dataframe:
+        import pandas as pd
+        return pd.DataFrame(colunas, columns=COLUNAS_LOTE)
+    
+    return colunas
+
+
+# ============================================
+# CONSULTA POR LATITUDE/LONGITUDE (GD)
+# ============================================
+
+def consultar_gd(latitude: float, longitude: float,
+                 funcao_consulta: Callable = None,
+                 funcao_conversao: Callable = None) -> Optional[Dict[str, Any]]:
+    """
+    Consulta um ponto dado em latitude/longitude (graus decimais).
+    
+    A zona UTM é detectada pela longitude (calcular_zona_utm). A menos de
+    FAIXA_DIVISA_ZONAS da divisa entre as zonas 23 e 24, se a zona da
+    longitude não tiver eixo dentro do limite, o ponto é reprojetado e
+    consultado também na zona vizinha, ficando o resultado mais próximo.
+    
+    Args:
+        latitude: Latitude em graus decimais
+        longitude: Longitude em graus decimais
+        funcao_consulta: Consulta UTM (x, y, zona) (padrão: consultar_coordenadas)
+        funcao_conversao: Conversão GD → UTM (latitude, longitude, zona)
+            (padrão: converter_gd_para_utm)
+    
+    Returns:
+        Resultado de consultar_coordenadas acrescido de 'x', 'y' e 'zona'
+        (coordenadas UTM efetivamente consultadas), ou None
+    """
+    consultar = funcao_consulta or consultar_coordenadas
+    converter = funcao_conversao or converter_gd_para_utm
+    metricas = instrumentacao.iniciar()
+    
+    zona = calcular_zona_utm(longitude)
+    zonas = [z for z in (zona, int(zonas_vizinhas([longitude])[0])) if z in ZONA_EPSG]
+    
+    if not zonas:
+        print(f"❌ ERRO: Longitude {longitude} fora das zonas {sorted(ZONA_EPSG)}.")
+        return None
+    
+    with metricas.etapa('conversao'):
+        convertidos = [converter(latitude, longitude, z) for z in zonas]
+    
+    validos = validar_coordenadas_lote(
+        np.array([c[0] for c in convertidos]),
+        np.array([c[1] for c in convertidos]),
+        np.array([c[2] for c in convertidos])
+    )
+    
+    if not validos.any():
+        # Repete a validação da primeira zona apenas para exibir o motivo
+        validar_coordenadas(*convertidos[0])
+        return None
+    
+    melhor = None
+    
+    for (x, y, zona_consulta), valido in zip(convertidos, validos):
+        if not valido:
+            continue
+        
+        if melhor is not None and not melhor['fora_do_limite']:
+            break
+        
+        if zona_consulta != zona:
+            print(f"🔄 Ponto a menos de {FAIXA_DIVISA_ZONAS:g}° da divisa: consultando também a zona {zona_consulta}")
+        
+        instrumentacao.ultimas(descartar=True)
+        resultado = consultar(x, y, zona_consulta)
+        metricas.incorporar(instrumentacao.ultimas(descartar=True))
+        
+        if resultado is None:
+            continue
+        
+        resultado.update({'x': x, 'y': y, 'zona': zona_consulta})
+        
+        if melhor is None or (resultado['fora_do_limite'], resultado['distancia_eixo']) < \
+                (melhor['fora_do_limite'], melhor['distancia_eixo']):
+            melhor = resultado
+    
+    if melhor is None:
+        instrumentacao.publicar(metricas)
+        return None
+    
+    return instrumentacao.publicar(metricas, melhor)
+
+
+def consultar_lote_gd(latitudes, longitudes, funcao_lote: Callable = None,
+                      funcao_conversao: Callable = None, como_dataframe: bool = False):
+    """
+    Consulta um lote de pontos dados em latitude/longitude (graus decimais).
+    
+    Cada ponto é convertido para a zona da sua longitude (uma transformação
+    por zona, ver converter_gd_para_utm_lote). Os pontos sem eixo a menos de
+    FAIXA_DIVISA_ZONAS da divisa são reprojetados na zona vizinha e
+    consultados de novo em um segundo lote.
+    
+    Args:
+        latitudes: Latitudes em graus decimais
+        longitudes: Longitudes em graus decimais
+        funcao_lote: Consulta em lote UTM (padrão: consultar_lote)
+        funcao_conversao: Conversão GD → UTM em lote (latitudes, longitudes,
+            zonas) (padrão: converter_gd_para_utm_lote)
+        como_dataframe: Retorna um pandas.DataFrame em vez de dicionário
+    
+    Returns:
+        Resultado colunar de consultar_lote; 'x', 'y' e 'zona' são as
+        coordenadas UTM efetivamente consultadas
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    consultar = funcao_lote or consultar_lote
+    converter = funcao_conversao or converter_gd_para_utm_lote
+    metricas = instrumentacao.iniciar()
+    
+    with metricas.etapa('conversao'):
+        xs, ys, zonas = converter(latitudes, longitudes)
+    
+    instrumentacao.ultimas(descartar=True)
+    colunas = consultar(xs, ys, zonas)
+    metricas.incorporar(instrumentacao.ultimas(descartar=True))
+    
+    # Pontos perto da divisa sem eixo na própria zona: segunda tentativa na vizinha
+    vizinhas = zonas_vizinhas(longitudes)
+    refazer = np.flatnonzero(~colunas['encontrado'] & (vizinhas > 0))
+    
+    if len(refazer):
+        with metricas.etapa('conversao'):
+            xs_vizinha, ys_vizinha, zonas_vizinha = converter(
+                latitudes[refazer], longitudes[refazer], vizinhas[refazer]
+            )
+        
+        segundo = consultar(xs_vizinha, ys_vizinha, zonas_vizinha)
+        metricas.incorporar(instrumentacao.ultimas(descartar=True))
+        
+        achados = np.flatnonzero(segundo['encontrado'])
+        for coluna in COLUNAS_LOTE:
+            colunas[coluna][refazer[achados]] = segundo[coluna][achados]
+    
+    instrumentacao.publicar(metricas)
+    
+    if como_dataframe:
+        import pandas as pd
+        return pd.DataFrame(colunas, columns=COLUNAS_LOTE)
+    
+    return colunas
+
+
+# ============================================
+# PROCESSAMENTO DE PLANILHAS CSV (GD)
+# ============================================
+
+# Linhas lidas e consultadas por vez no modo CSV (limita a memória usada)
+TAMANHO_BLOCO_CSV = 1000
+
+# Colunas acrescentadas a cada linha da planilha de saída
+COLUNAS_SAIDA_CSV = [
+    'X_UTM', 'Y_UTM', 'ZONA', 'STATUS', 'CODIGO_SRE', 'RODOVIA', 'TRECHO',
+    'MUNICIPIO', 'KM', 'DISTANCIA_EIXO_M', 'DENTRO_FXD', 'LARGURA_FXD', 'JURISDICAO'
+]
+
+
+def ler_numero(texto: str) -> float:
+    """
+    Converte texto numérico em float, aceitando vírgula como separador decimal.
+    
+    Args:
+        texto: Valor lido da planilha (ex: "-14,295984")
+    
+    Returns:
+        Valor numérico
+    """
+    return float(texto.strip().replace(',', '.'))
+
+
+def formatar_numero(valor: float, casas: int) -> str:
+    """Formata número com vírgula decimal, como nas planilhas de entrada."""
+    return f"{valor:.{casas}f}".replace('.', ',')
+
+
+def _consultar_bloco_csv(bloco: List[Tuple[List[str], Optional[float], Optional[float]]],
+                         escritor, funcao_lote: Callable = None,
+                         funcao_conversao: Callable = None) -> int:
+    """
+    Converte, consulta e grava um bloco de linhas da planilha.
+    
+    Args:
+        bloco: Linhas como (valores originais, latitude, longitude); lat/lon
+            None quando não puderam ser lidas
+        escritor: csv.writer da planilha de saída
+        funcao_lote: Função de consulta em lote (padrão: consultar_lote)
+        funcao_conversao: Conversão GD → UTM em lote (padrão: converter_gd_para_utm_lote)
+    
+    Returns:
+        Número de linhas com eixo encontrado
+    """
+    lidos = [(latitude, longitude) for _, latitude, longitude in bloco if latitude is not None]
+    
+    lote = consultar_lote_gd(
+        np.array([p[0] for p in lidos], dtype=float),
+        np.array([p[1] for p in lidos], dtype=float),
+        funcao_lote, funcao_conversao
+    )
+    dentro_area = validar_coordenadas_lote(lote['x'], lote['y'], lote['zona'])
+    
+    encontrados = 0
+    i = -1
+    
+    for valores, latitude, _ in bloco:
+        if latitude is None:
+            escritor.writerow(valores + ['', '', '', 'COORDENADA INVALIDA'] + [''] * 9)
+            continue
+        
+        i += 1
+        extras = [formatar_numero(lote['x'][i], 2), formatar_numero(lote['y'][i], 2), int(lote['zona'][i])]
+        
+        if not dentro_area[i]:
+            escritor.writerow(valores + extras + ['FORA DA AREA'] + [''] * 9)
+            continue
+        
+        if not lote['encontrado'][i]:
+            escritor.writerow(
+                valores + extras + ['SEM EIXO', '', '', '', lote['municipio'][i] or '', '', '',
+                                    'SIM' if lote['dentro_fxd'][i] else 'NAO', '', '']
+            )
+            continue
+        
+        encontrados += 1
+        campos = formatar_resultado({
+            'attributes': lote['attributes'][i],
+            'fxd_info': lote['fxd_info'][i],
+            'municipio': lote['municipio'][i],
+            'km_calculado': lote['km_calculado'][i],
+            'distancia_eixo': lote['distancia_eixo'][i],
+            'dentro_fxd': lote['dentro_fxd'][i]
+        })
+        
+        escritor.writerow(valores + extras + [
+            'OK',
+            campos['codigo_sre'] or '',
+            campos['rodovia'] or '',
+            campos['trecho'] or '',
+            campos['municipio'] or '',
+            formatar_numero(campos['km_calculado'], 3),
+            formatar_numero(campos['distancia_eixo'], 2),
+            'SIM' if campos['dentro_fxd'] else 'NAO',
+            campos['largura_fxd'] or '',
+            campos['jurisdicao'] or ''
+        ])
+    
+    return encontrados
+
+
+def processar_csv(caminho_entrada: str, caminho_saida: Optional[str] = None,
+                  tamanho_bloco: int = TAMANHO_BLOCO_CSV,
+                  funcao_lote: Callable = None,
+                  funcao_conversao: Callable = None) -> Dict[str, Any]:
+    """
+    Consulta todas as linhas de uma planilha CSV com LATITUDE/LONGITUDE em GD.
+    
+    A planilha (separada por ';', decimais com vírgula, como em
+    CONVERSOR KMZ/CONSOLIDADO.csv) é lida e gravada em fluxo, em blocos de
+    `tamanho_bloco` linhas, sem carregar o arquivo inteiro em memória.
+    
+    Args:
+        caminho_entrada: Planilha de entrada
+        caminho_saida: Planilha de saída (padrão: <entrada>_resultado.csv)
+        tamanho_bloco: Linhas consultadas por vez
+        funcao_lote: Função de consulta em lote (padrão: consultar_lote;
+            ver consulta_paralela.py para a versão multiprocesso)
+        funcao_conversao: Conversão GD → UTM em lote (padrão:
+            converter_gd_para_utm_lote; ver consultar_lote_gd)
+    
+    Returns:
+        Estatísticas: 'linhas', 'encontrados', 'segundos', 'linhas_por_segundo', 'saida'
+        e, com a instrumentação ativa, 'metricas' (agregadas de todos os blocos)
+    """
+    entrada = Path(caminho_entrada)
+    saida = Path(caminho_saida) if caminho_saida else entrada.with_name(f"{entrada.stem}_resultado.csv")
+    
+    inicio = time.monotonic()
+    linhas = 0
+    encontrados = 0
+    metricas_blocos = []
+    instrumentacao.ultimas(descartar=True)
+    
+    with open(entrada, 'r', encoding='utf-8-sig', newline='') as arq_entrada, \
+         open(saida, 'w', encoding='utf-8-sig', newline='') as arq_saida:
+        leitor = csv.reader(arq_entrada, delimiter=';')
+        escritor = csv.writer(arq_saida, delimiter=';')
+        
+        cabecalho = next(leitor)
+        nomes = [c.strip().upper() for c in cabecalho]
+        
+        if 'LATITUDE' not in nomes or 'LONGITUDE' not in nomes:
+            raise ValueError(f"Colunas LATITUDE/LONGITUDE não encontradas em {entrada.name}: {cabecalho}")
+        
+        idx_lat = nomes.index('LATITUDE')
+        idx_lon = nomes.index('LONGITUDE')
+        escritor.writerow(cabecalho + COLUNAS_SAIDA_CSV)
+        
+        bloco = []
+        for valores in leitor:
+            if not any(v.strip() for v in valores):
+                continue
+            
+            try:
+                latitude = ler_numero(valores[idx_lat])
+                longitude = ler_numero(valores[idx_lon])
+            except (ValueError, IndexError):
+                latitude = longitude = None
+            
+            bloco.append((valores, latitude, longitude))
+            
+            if len(bloco) >= tamanho_bloco:
+                encontrados += _consultar_bloco_csv(bloco, escritor, funcao_lote, funcao_conversao)
+                metricas_blocos.append(instrumentacao.ultimas(descartar=True))
+                linhas += len(bloco)
+                bloco = []
+                
+                decorrido = time.monotonic() - inicio
+                print(f"   Processadas: {linhas} linhas ({linhas / decorrido:.1f} linhas/s)")
+        
+        if bloco:
+            encontrados += _consultar_bloco_csv(bloco, escritor, funcao_lote, funcao_conversao)
+            metricas_blocos.append(instrumentacao.ultimas(descartar=True))
+            linhas += len(bloco)
+    
+    segundos = time.monotonic() - inicio
+    
+    estatisticas = {
+        'linhas': linhas,
+        'encontrados': encontrados,
+        'segundos': segundos,
+        'linhas_por_segundo': linhas / segundos if segundos > 0 else 0.0,
+        'saida': str(saida)
+    }
+    
+    if instrumentacao.ATIVA:
+        estatisticas['metricas'] = instrumentacao.agregar(metricas_blocos)
+    
+    return estatisticas
+
+
 # ============================================
 # EXIBIÇÃO DE RESULTADOS
 # ============================================
 
-def exibir_resultado(resultado: Dict[str, Any]) -> None:
+def formatar_resultado(resultado: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Exibe resultado da consulta de forma formatada.
+    Extrai os campos exibidos ao usuário a partir do resultado da consulta.
     
     Args:
         resultado: Dicionário com dados da consulta
+    
+    Returns:
+        Dicionário com codigo_sre, rodovia, trecho, municipio, km_calculado,
+        jurisdicao, amparo_legal, largura_fxd, pavimentacao, distancia_eixo
+        e dentro_fxd (None onde a informação não existir)
     """
     attrs = resultado['attributes']
     fxd_info = resultado.get('fxd_info', {})
@@ -699,15 +1603,15 @@ def exibir_resultado(resultado: Dict[str, Any]) -> None:
         return None
     
     # Extrair informações (priorizar FXD quando dentro)
-    rodovia = buscar_campo(['RODOVIA', 'NOME', 'SIGLA']) or 'N/A'
-    cod_sre = buscar_campo(['COD_SRE', 'SRE', 'CODIGO', 'CODIGO_SRE']) or 'N/A'
+    rodovia = buscar_campo(['RODOVIA', 'NOME', 'SIGLA'])
+    cod_sre = buscar_campo(['COD_SRE', 'SRE', 'CODIGO', 'CODIGO_SRE'])
     jurisdicao = buscar_campo(['JURISDI_C', 'JURISDICAO', 'JURISD', 'ESFERA'])
     largura_fxd = buscar_campo(['TOTAL FXD', 'LARGURA', 'LARG_FXD', 'FXD', 'FAIXA'])
     amparo_legal = buscar_campo(['AMPARO LEG', 'AMPARO', 'LEI', 'LEGAL', 'LEGISL'])
     tipo_pavimento = buscar_campo(['TIPO_DE_RE', 'PAVIMENTO', 'REVESTIMENTO', 'TIPO'])
     
     # Município
-    municipio = resultado.get('municipio') or buscar_campo(['MUNICIPIO', 'MUNIC', 'NM_MUN']) or 'N/A'
+    municipio = resultado.get('municipio') or buscar_campo(['MUNICIPIO', 'MUNIC', 'NM_MUN'])
     
     # Trecho (priorizar FXD)
     local_ini = buscar_campo(['LOCAL_IN_', 'LOCAL_INI', 'INICIO'])
@@ -716,30 +1620,58 @@ def exibir_resultado(resultado: Dict[str, Any]) -> None:
     if local_ini and local_fim:
         trecho = f"{local_ini} - {local_fim}"
     else:
-        trecho = buscar_campo(['TRECHO', 'DESCRICAO', 'DESC']) or 'N/A'
+        trecho = buscar_campo(['TRECHO', 'DESCRICAO', 'DESC'])
     
     # Formatar rodovia (adicionar BA - se necessário)
-    if rodovia and rodovia != 'N/A' and not rodovia.startswith('BA'):
+    if rodovia and not rodovia.startswith('BA'):
         rodovia = f"BA - {rodovia}"
     
+    return {
+        'codigo_sre': cod_sre,
+        'rodovia': rodovia,
+        'trecho': trecho,
+        'municipio': municipio.upper() if municipio else None,
+        'km_calculado': resultado['km_calculado'],
+        'jurisdicao': jurisdicao,
+        'amparo_legal': amparo_legal,
+        'largura_fxd': largura_fxd,
+        'pavimentacao': tipo_pavimento,
+        'distancia_eixo': resultado['distancia_eixo'],
+        'dentro_fxd': bool(resultado.get('dentro_fxd', False))
+    }
+
+
+def exibir_resultado(resultado: Dict[str, Any]) -> None:
+    """
+    Exibe resultado da consulta de forma formatada.
+    
+    Args:
+        resultado: Dicionário com dados da consulta
+    """
+    campos = formatar_resultado(resultado)
+    
+    def texto(valor):
+        return valor if valor else 'N/A'
+    
     # Status FXD
-    dentro_fxd = resultado.get('dentro_fxd', False)
-    status_fxd = "⚠️  DENTRO DA FXD" if dentro_fxd else "✅ FORA DA FXD"
+    status_fxd = "⚠️  DENTRO DA FXD" if campos['dentro_fxd'] else "✅ FORA DA FXD"
     
     # EXIBIR RESULTADO
     print(f"\n{'='*76}")
     print(status_fxd)
+    if resultado.get('fora_do_limite'):
+        print(f"⚠️  EIXO FORA DO LIMITE DE {DISTANCIA_MAXIMA_EIXO} m (rodovia mais próxima)")
     print(f"{'='*76}")
-    print(f"\nCÓDIGO SRE:        {cod_sre}")
-    print(f"RODOVIA:           {rodovia}")
-    print(f"TRECHO:            {trecho}")
-    print(f"MUNICÍPIO:         {municipio.upper() if municipio != 'N/A' else 'N/A'}")
-    print(f"KM CALCULADO:      {resultado['km_calculado']:.2f} km")
-    print(f"JURISDIÇÃO:        {jurisdicao if jurisdicao else 'N/A'}")
-    print(f"AMPARO LEGAL:      {amparo_legal if amparo_legal else 'N/A'}")
-    print(f"LARGURA FXD:       {largura_fxd if largura_fxd else 'N/A'}")
-    print(f"PAVIMENTAÇÃO:      {tipo_pavimento if tipo_pavimento else 'N/A'}")
-    print(f"DISTÂNCIA DO EIXO: {resultado['distancia_eixo']:.2f} m")
+    print(f"\nCÓDIGO SRE:        {texto(campos['codigo_sre'])}")
+    print(f"RODOVIA:           {texto(campos['rodovia'])}")
+    print(f"TRECHO:            {texto(campos['trecho'])}")
+    print(f"MUNICÍPIO:         {texto(campos['municipio'])}")
+    print(f"KM CALCULADO:      {campos['km_calculado']:.2f} km")
+    print(f"JURISDIÇÃO:        {texto(campos['jurisdicao'])}")
+    print(f"AMPARO LEGAL:      {texto(campos['amparo_legal'])}")
+    print(f"LARGURA FXD:       {texto(campos['largura_fxd'])}")
+    print(f"PAVIMENTAÇÃO:      {texto(campos['pavimentacao'])}")
+    print(f"DISTÂNCIA DO EIXO: {campos['distancia_eixo']:.2f} m")
     print(f"\n{'='*76}")
 
 
@@ -747,55 +1679,191 @@ def exibir_resultado(resultado: Dict[str, Any]) -> None:
 # MAIN - INTERFACE CLI
 # ============================================
 
+# Nome exibido no cabeçalho para cada motor de consulta (--backend)
+NOMES_BACKENDS = {
+    'qgis': 'PyQGIS',
+    'shapely': 'Shapely',
+    'snapshot': 'Snapshot'
+}
+
+# Módulo que implementa cada motor de consulta
+MODULOS_BACKENDS = {
+    'qgis': 'consulta_standalone',
+    'shapely': 'consulta_shapely',
+    'snapshot': 'snapshot_zona'
+}
+
+
+def obter_backend(nome: str):
+    """
+    Retorna o módulo do motor de consulta.
+    
+    Todos expõem consultar_coordenadas, consultar_lote, converter_gd_para_utm
+    e converter_gd_para_utm_lote com as mesmas assinaturas e resultados.
+    
+    Args:
+        nome: 'qgis', 'shapely' ou 'snapshot'
+    
+    Returns:
+        Módulo do backend
+    """
+    return importlib.import_module(MODULOS_BACKENDS[nome])
+
+
 def main():
     """Função principal - execução CLI."""
     
     parser = argparse.ArgumentParser(
-        description='Consulta coordenadas UTM em shapefiles rodoviários',
+        description='Consulta coordenadas UTM ou GD em shapefiles rodoviários',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Exemplos:
   %(prog)s --x 510807 --y 8649627 --zona 24
   %(prog)s -x 496787 -y 8640850 -z 24
+  %(prog)s --lat -12.2245 --lon -38.9021
+  %(prog)s --csv "CONVERSOR KMZ/CONSOLIDADO.csv" --saida resultado.csv
+  %(prog)s --x 510807 --y 8649627 --zona 24 --backend shapely
+  %(prog)s --x 510807 --y 8649627 --zona 24 --cache
+  %(prog)s --x 510807 --y 8649627 --zona 24 --metricas
+  %(prog)s --x 510807 --y 8649627 --zona 24 --raio-maximo 20000
         """
     )
     
-    parser.add_argument('--x', '-x', type=float, required=True,
+    parser.add_argument('--x', '-x', type=float,
                        help='Coordenada X (Este) em metros')
-    parser.add_argument('--y', '-y', type=float, required=True,
+    parser.add_argument('--y', '-y', type=float,
                        help='Coordenada Y (Norte) em metros')
-    parser.add_argument('--zona', '-z', type=int, required=True,
+    parser.add_argument('--zona', '-z', type=int,
                        choices=[23, 24],
                        help='Zona UTM (23 ou 24)')
+    parser.add_argument('--lat', type=float,
+                       help='Latitude em graus decimais (zona UTM detectada pela longitude)')
+    parser.add_argument('--lon', type=float,
+                       help='Longitude em graus decimais')
+    parser.add_argument('--csv', metavar='ARQUIVO',
+                       help='Planilha CSV (;) com colunas LATITUDE/LONGITUDE em GD')
+    parser.add_argument('--saida', '-o', metavar='ARQUIVO',
+                       help='Planilha CSV de saída (modo --csv)')
+    parser.add_argument('--backend', choices=['qgis', 'shapely', 'snapshot'], default='qgis',
+                       help='Motor de consulta: PyQGIS, Shapely/pyogrio ou snapshot compilado '
+                            '(snapshot_zona.py), os dois últimos sem QGIS (padrão: qgis)')
+    parser.add_argument('--cache', nargs='?', const='', metavar='ARQUIVO',
+                       help='Usa o cache persistente de resultados (cache_resultados.py); '
+                            'ARQUIVO opcional (padrão: na pasta dos shapefiles)')
+    parser.add_argument('--raio-maximo', type=float, metavar='METROS',
+                       help='Raio máximo da busca pela rodovia mais próxima quando nenhuma está a '
+                            f'{DISTANCIA_MAXIMA_EIXO} m; 0 desativa (padrão: {DISTANCIA_MAXIMA_BUSCA})')
+    parser.add_argument('--metricas', action='store_true',
+                       help='Mede o tempo de cada etapa e conta feições e operações '
+                            '(instrumentacao.py)')
     
     args = parser.parse_args()
     
+    gd = args.lat is not None or args.lon is not None
+    
+    if gd and (args.lat is None or args.lon is None):
+        parser.error('informe --lat e --lon')
+    
+    if not args.csv and not gd and (args.x is None or args.y is None or args.zona is None):
+        parser.error('informe --x, --y e --zona, --lat e --lon, ou --csv')
+    
+    if args.backend == 'qgis' and not QGIS_DISPONIVEL:
+        parser.error('PyQGIS não encontrado; use --backend shapely')
+    
     # Cabeçalho simplificado
     print("=" * 76)
-    print("  CONSULTA - PyQGIS")
+    print(f"  CONSULTA - {NOMES_BACKENDS[args.backend]}")
     print("=" * 76)
-    print(f"\nCoordenadas:")
-    print(f"  X:    {int(args.x)}")
-    print(f"  Y:    {int(args.y)}")
-    print(f"  Zona: {args.zona}")
     
-    # Inicializar QGIS
-    print("\n🔧 Inicializando PyQGIS...")
+    if args.csv:
+        print(f"\nPlanilha: {args.csv}")
+    elif gd:
+        print(f"\nCoordenadas:")
+        print(f"  Latitude:  {args.lat}")
+        print(f"  Longitude: {args.lon}")
+    else:
+        print(f"\nCoordenadas:")
+        print(f"  X:    {int(args.x)}")
+        print(f"  Y:    {int(args.y)}")
+        print(f"  Zona: {args.zona}")
     
-    QgsApplication.setPrefixPath(QGIS_PATH, True)
-    qgs = QgsApplication([], False)
-    qgs.initQgis()
+    if args.metricas:
+        instrumentacao.ativar()
     
-    try:
-        # Executar consulta
-        resultado = consultar_coordenadas(args.x, args.y, args.zona)
+    if args.raio_maximo is not None:
+        # Executado como script, este módulo é __main__: os backends leem a configuração
+        # do módulo consulta_standalone
+        for modulo in {sys.modules[__name__], importlib.import_module('consulta_standalone')}:
+            modulo.DISTANCIA_MAXIMA_BUSCA = args.raio_maximo
+    
+    qgs = None
+    
+    if args.backend == 'qgis':
+        # Inicializar QGIS
+        print("\n🔧 Inicializando PyQGIS...")
+        
+        QgsApplication.setPrefixPath(QGIS_PATH, True)
+        qgs = QgsApplication([], False)
+        qgs.initQgis()
+        
+        consultar = consultar_coordenadas
+        funcao_lote = consultar_lote
+        converter = converter_gd_para_utm
+        funcao_conversao = converter_gd_para_utm_lote
+    else:
+        backend = obter_backend(args.backend)
         
-        if resultado:
-            exibir_resultado(resultado)
+        consultar = backend.consultar_coordenadas
+        funcao_lote = backend.consultar_lote
+        converter = backend.converter_gd_para_utm
+        funcao_conversao = backend.converter_gd_para_utm_lote
+    
+    try:
+        if args.csv:
+            # Consulta em lote da planilha
+            print("\n🔄 Processando planilha...")
+            estatisticas = processar_csv(args.csv, args.saida,
+                                         funcao_lote=funcao_lote,
+                                         funcao_conversao=funcao_conversao)
+            
+            print(f"\n✅ {estatisticas['linhas']} linhas processadas "
+                  f"({estatisticas['encontrados']} com eixo encontrado)")
+            print(f"⏱️  {estatisticas['segundos']:.1f} s - "
+                  f"{estatisticas['linhas_por_segundo']:.1f} linhas/s")
+            print(f"📁 Resultado: {estatisticas['saida']}")
+            instrumentacao.exibir_metricas(estatisticas.get('metricas'))
             exit_code = 0
         else:
-            print("\n❌ Consulta sem resultados.")
-            exit_code = 1
+            # Executar consulta
+            def consultar_entrada(funcao_consulta):
+                if not gd:
+                    return funcao_consulta(args.x, args.y, args.zona)
+                return consultar_gd(args.lat, args.lon, funcao_consulta, converter)
+            
+            if args.cache is not None:
+                from cache_resultados import CacheResultados
+                
+                with CacheResultados(args.cache or None) as cache:
+                    resultado = consultar_entrada(
+                        lambda x, y, zona: cache.consultar(x, y, zona, consultar)
+                    )
+                    print(f"\n💾 Cache: {'acerto' if cache.acertos else 'falha'} "
+                          f"({cache.estatisticas()['entradas']} entradas)")
+            else:
+                resultado = consultar_entrada(consultar)
+            
+            if resultado and gd:
+                print(f"\n📍 UTM: X {resultado['x']:.2f}  Y {resultado['y']:.2f}  Zona {resultado['zona']}")
+            
+            if resultado:
+                exibir_resultado(resultado)
+                exit_code = 1 if resultado.get('fora_do_limite') else 0
+            else:
+                print("\n❌ Consulta sem resultados.")
+                exit_code = 1
+            
+            if args.metricas:
+                instrumentacao.exibir_metricas(instrumentacao.ultimas())
     
     except Exception as e:
         print(f"\n❌ ERRO CRÍTICO: {e}")
@@ -805,7 +1873,8 @@ Exemplos:
     
     finally:
         # Finalizar QGIS
-        qgs.exitQgis()
+        if qgs is not None:
+            qgs.exitQgis()
     
     return exit_code
 
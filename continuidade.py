@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tabela de continuidade dos trechos rodoviários.
+
+Para cada rodovia, guarda os trechos ordenados por código SRE com os
+vizinhos anterior/posterior, as diferenças de KM entre eles e o
+indicador de continuidade usados no cálculo do KM, além da própria
+lógica de orientação (calcular_km_por_proporcao), comum aos backends
+PyQGIS (consulta_standalone.py) e Shapely (consulta_shapely.py), e da
+sua inversa (calcular_proporcao_por_km, usada em consulta_inversa.py).
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+from typing import Tuple, Optional, Dict, Any, List
+
+
+# Tolerância (km) para considerar dois trechos contínuos
+TOLERANCIA_CONTINUIDADE_KM = 0.5
+
+
+def obter_codigo_sre(atributos: Dict[str, Any]) -> str:
+    """
+    Retorna o código SRE de uma feição, aceitando as variações de nome do campo.
+    
+    Args:
+        atributos: Atributos da feição
+    
+    Returns:
+        Código SRE ou string vazia
+    """
+    return atributos.get('CÓDIGO SRE', atributos.get('COD_SRE', atributos.get('CODIGO_SRE', '')))
+
+
+class TabelaContinuidade:
+    """
+    Trechos de cada rodovia ordenados por código SRE, montados uma única vez.
+    
+    A consulta por (rodovia, código SRE) é feita em tempo constante e
+    devolve o trecho com seus vizinhos e a continuidade já avaliada.
+    """
+    
+    def __init__(self, todas_features: List[Tuple[Any, Dict[str, Any]]]):
+        trechos_por_rodovia: Dict[Any, List[Dict[str, Any]]] = {}
+        
+        for feicao, (_, atributos) in enumerate(todas_features):
+            rodovia = atributos.get('RODOVIA', '')
+            cod_sre = obter_codigo_sre(atributos)
+            km_ini = atributos.get('KM_INICIAL')
+            km_fim = atributos.get('KM_FINAL')
+            
+            if not rodovia or not cod_sre or km_ini is None:
+                continue
+            
+            trechos_por_rodovia.setdefault(rodovia, []).append({
+                'feicao': feicao,
+                'cod_sre': cod_sre,
+                'km_ini': float(km_ini),
+                'km_fim': float(km_fim) if km_fim is not None else float(km_ini),
+                'local_ini': atributos.get('LOCAL_IN_', ''),
+                'local_fim': atributos.get('LOCAL_FIM', '')
+            })
+        
+        self._entradas: Dict[Tuple[Any, str], Dict[str, Any]] = {}
+        
+        for rodovia, trechos in trechos_por_rodovia.items():
+            # Ordena por código SRE (indica sequência lógica dos trechos)
+            trechos.sort(key=lambda x: x['cod_sre'])
+            total = len(trechos)
+            
+            for i, trecho in enumerate(trechos):
+                chave = (rodovia, trecho['cod_sre'])
+                
+                # Código SRE repetido: vale a primeira ocorrência na ordenação
+                if chave in self._entradas:
+                    continue
+                
+                anterior = trechos[i - 1] if i > 0 else None
+                posterior = trechos[i + 1] if i < total - 1 else None
+                
+                # O KM FINAL do anterior deve ser igual ao KM INICIAL do atual,
+                # e o KM FINAL do atual igual ao KM INICIAL do posterior
+                gap_anterior = abs(anterior['km_fim'] - trecho['km_ini']) if anterior else None
+                gap_posterior = abs(trecho['km_fim'] - posterior['km_ini']) if posterior else None
+                
+                continuidade = (
+                    (gap_anterior is not None and gap_anterior < TOLERANCIA_CONTINUIDADE_KM) or
+                    (gap_posterior is not None and gap_posterior < TOLERANCIA_CONTINUIDADE_KM)
+                )
+                
+                self._entradas[chave] = {
+                    'trecho': trecho,
+                    'indice': i,
+                    'total': total,
+                    'anterior': anterior,
+                    'posterior': posterior,
+                    'gap_anterior': gap_anterior,
+                    'gap_posterior': gap_posterior,
+                    'continuidade': continuidade
+                }
+    
+    def obter(self, rodovia: Any, codigo_sre: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna a entrada de continuidade de um trecho.
+        
+        Args:
+            rodovia: Valor do campo RODOVIA
+            codigo_sre: Código SRE do trecho
+        
+        Returns:
+            Dicionário com 'indice', 'total', 'anterior', 'posterior',
+            'gap_anterior', 'gap_posterior' e 'continuidade', ou None
+        """
+        return self._entradas.get((rodovia, codigo_sre))
+    
+    def itens(self):
+        """Percorre as entradas como ((rodovia, código SRE), entrada)."""
+        return iter(self._entradas.items())
+
+
+# ============================================
+# ORIENTAÇÃO DA GEOMETRIA E CÁLCULO DO KM
+# ============================================
+
+def calcular_km_por_proporcao(proporcao: float, km_inicial: float, km_final: float,
+                              atributos: Optional[Dict[str, Any]] = None,
+                              continuidade: Optional[TabelaContinuidade] = None,
+                              verbose: bool = True) -> float:
+    """
+    Calcula o KM a partir da posição relativa do ponto projetado no eixo.
+    
+    Decide se a geometria foi desenhada no sentido da quilometragem ou
+    invertida, usando a continuidade com os trechos vizinhos. Lógica
+    compartilhada por todos os backends de consulta.
+    
+    Args:
+        proporcao: Distância ao longo da linha / comprimento total (0 a 1)
+        km_inicial: KM inicial do trecho
+        km_final: KM final do trecho
+        atributos: Atributos da feature atual (incluindo TRECHO)
+        continuidade: Tabela de continuidade da zona
+        verbose: Exibe as mensagens de diagnóstico da orientação
+    
+    Returns:
+        KM calculado
+    """
+    # Calcula percentual percorrido
+    percentual = proporcao * 100
+    
+    # Calcula ambas as opções
+    km_opcao1 = km_inicial + (proporcao * (km_final - km_inicial))  # Normal
+    km_opcao2 = km_final - (proporcao * (km_final - km_inicial))    # Invertida
+    
+    # ====================================================================
+    # VALIDAÇÃO POR CONTINUIDADE DE TRECHOS (NOVA LÓGICA)
+    # ====================================================================
+    orientacao_validada = None
+    
+    if atributos and continuidade is not None:
+        trecho_atual = atributos.get('TRECHO', '') or atributos.get('LOCAL_IN_', '') + ' - ' + atributos.get('LOCAL_FIM', '')
+        rodovia_atual = atributos.get('RODOVIA', '')
+        codigo_sre_atual = obter_codigo_sre(atributos)
+        
+        if trecho_atual and rodovia_atual and codigo_sre_atual:
+            # Busca trechos anterior e posterior na mesma rodovia (tabela pré-calculada)
+            entrada = continuidade.obter(rodovia_atual, codigo_sre_atual)
+            idx_atual = entrada['indice'] if entrada else None
+            
+            if idx_atual is not None and entrada['total'] > 1:
+                continuidade_detectada = entrada['continuidade']
+                
+                # Se há continuidade validada, detectar orientação da geometria
+                if continuidade_detectada and idx_atual is not None:
+                    # ESTRATÉGIA DEFINITIVA: Usar continuidade para determinar orientação
+                    # Se temos trecho anterior: o fim do anterior deve conectar com o início do atual
+                    # Isso nos diz QUAL extremo do trecho atual é o "início lógico"
+                    
+                    if km_inicial < km_final and idx_atual > 0:
+                        # Temos trecho anterior - verificar qual extremo conecta
+                        trecho_anterior = entrada['anterior']
+                        km_fim_anterior = trecho_anterior['km_fim']
+                        
+                        # Qual extremo do trecho atual está mais próximo do fim do anterior?
+                        dist_inicial_anterior = abs(km_inicial - km_fim_anterior)
+                        dist_final_anterior = abs(km_final - km_fim_anterior)
+                        
+                        if dist_inicial_anterior < dist_final_anterior:
+                            # KM_INICIAL conecta com o anterior = início lógico é KM_INICIAL
+                            # Portanto: geometria deveria começar no percentual 0% e ir até 100%
+                            # Se percentual BAIXO resulta em KM próximo de KM_INICIAL → NORMAL
+                            # Se percentual ALTO resulta em KM próximo de KM_INICIAL → INVERTIDA
+                            
+                            # Testar: onde está o ponto na geometria?
+                            if percentual < 50:  # Início da geometria
+                                # Início da geometria deve ter KM baixo (próximo de KM_INICIAL)
+                                dist_opcao1_inicial = abs(km_opcao1 - km_inicial)
+                                dist_opcao2_inicial = abs(km_opcao2 - km_inicial)
+                                
+                                if dist_opcao1_inicial < dist_opcao2_inicial:
+                                    orientacao_validada = 'normal'
+                                else:
+                                    orientacao_validada = 'invertida'
+                            else:  # Fim da geometria (percentual >= 50%)
+                                # Fim da geometria deve ter KM alto (próximo de KM_FINAL)
+                                # Testar se km_opcao1 (cálculo normal) está próximo do fim
+                                dist_opcao1_final = abs(km_opcao1 - km_final)
+                                dist_opcao1_inicial = abs(km_opcao1 - km_inicial)
+                                comprimento_trecho = km_final - km_inicial
+                                
+                                # Calcular proximidade RELATIVA (em % do comprimento do trecho)
+                                prox_final_percent = (dist_opcao1_final / comprimento_trecho) * 100
+                                prox_inicial_percent = (dist_opcao1_inicial / comprimento_trecho) * 100
+                                
+                                # Se está dentro de 10% do fim, considera próximo do fim
+                                if prox_final_percent < 10:
+                                    # Muito próximo do fim = NORMAL
+                                    orientacao_validada = 'normal'
+                                elif prox_inicial_percent < 10:
+                                    # Muito próximo do início = INVERTIDA
+                                    orientacao_validada = 'invertida'
+                                elif dist_opcao1_inicial < dist_opcao1_final:
+                                    # Mais próximo do início = INVERTIDA
+                                    orientacao_validada = 'invertida'
+                                else:
+                                    # Mais próximo do fim = NORMAL
+                                    orientacao_validada = 'normal'
+                        else:
+                            # KM_FINAL conecta com o anterior = início lógico é KM_FINAL
+                            # Geometria foi desenhada invertida em relação à quilometragem
+                            orientacao_validada = 'invertida'
+                    
+                    elif km_inicial < km_final and idx_atual == 0:
+                        # Primeiro trecho da rodovia - usar KM 0 como referência
+                        # Se km_inicial ≈ 0, o início lógico é KM_INICIAL
+                        if km_inicial < 1.0:  # Começa próximo do KM 0
+                            # Percentual baixo deve resultar em KM baixo
+                            if percentual < 50:
+                                dist_opcao1_inicial = abs(km_opcao1 - km_inicial)
+                                dist_opcao2_inicial = abs(km_opcao2 - km_inicial)
+                                orientacao_validada = 'normal' if dist_opcao1_inicial < dist_opcao2_inicial else 'invertida'
+                                if verbose:
+                                    print(f"   🎯 Primeiro trecho: geometria {'NORMAL' if orientacao_validada == 'normal' else 'INVERTIDA'}")
+                            else:
+                                dist_opcao1_final = abs(km_opcao1 - km_final)
+                                dist_opcao2_final = abs(km_opcao2 - km_final)
+                                orientacao_validada = 'normal' if dist_opcao1_final < dist_opcao2_final else 'invertida'
+                                if verbose:
+                                    print(f"   🎯 Primeiro trecho: geometria {'NORMAL' if orientacao_validada == 'normal' else 'INVERTIDA'}")
+                        else:
+                            # Não começa no KM 0 - usar heurística
+                            orientacao_validada = 'normal'
+                            if verbose:
+                                print(f"   🎯 Primeiro trecho sem KM 0: assumindo NORMAL")
+                    
+                    elif km_inicial < km_final:
+                        # Sem trecho anterior válido - usar heurística
+                        if percentual > 70:
+                            dist_opcao1_final = abs(km_opcao1 - km_final)
+                            dist_opcao2_final = abs(km_opcao2 - km_final)
+                            orientacao_validada = 'normal' if dist_opcao1_final < dist_opcao2_final else 'invertida'
+                        else:
+                            dist_opcao1_inicial = abs(km_opcao1 - km_inicial)
+                            dist_opcao2_inicial = abs(km_opcao2 - km_inicial)
+                            orientacao_validada = 'normal' if dist_opcao1_inicial < dist_opcao2_inicial else 'invertida'
+                        if verbose:
+                            print(f"   🎯 Heurística: geometria {'NORMAL' if orientacao_validada == 'normal' else 'INVERTIDA'}")
+                    else:
+                        # KM decrescente
+                        orientacao_validada = 'normal'
+    
+    # ====================================================================
+    # ESCOLHA DO KM BASEADO EM VALIDAÇÃO
+    # ====================================================================
+    
+    if orientacao_validada == 'normal':
+        # Validação confirmou: usar cálculo normal
+        km_calculado = km_opcao1
+    elif orientacao_validada == 'invertida':
+        # Validação confirmou: usar cálculo invertido
+        km_calculado = km_opcao2
+    else:
+        # SEM VALIDAÇÃO: usar heurística baseada em crescente/decrescente
+        if km_inicial < km_final:
+            # KM crescente: geometria deve seguir ordem normal
+            km_calculado = km_opcao1
+        else:
+            # KM decrescente: geometria deve seguir ordem invertida
+            km_calculado = km_opcao2
+    
+    return km_calculado
+
+
+def calcular_proporcao_por_km(km: float, km_inicial: float, km_final: float,
+                              atributos: Optional[Dict[str, Any]] = None,
+                              continuidade: Optional[TabelaContinuidade] = None) -> float:
+    """
+    Posição relativa no eixo correspondente a um KM (inverso de calcular_km_por_proporcao).
+    
+    As duas orientações possíveis da geometria dão duas proporções; vale a
+    que, aplicada de volta a calcular_km_por_proporcao, reproduz o KM pedido.
+    Em caso de empate prevalece a orientação padrão (normal para KM
+    crescente, invertida para KM decrescente).
+    
+    Args:
+        km: KM procurado (dentro do intervalo do trecho)
+        km_inicial: KM inicial do trecho
+        km_final: KM final do trecho
+        atributos: Atributos da feature (incluindo RODOVIA e código SRE)
+        continuidade: Tabela de continuidade da zona
+    
+    Returns:
+        Distância ao longo da linha / comprimento total (0 a 1)
+    """
+    extensao = km_final - km_inicial
+    if extensao == 0:
+        return 0.0
+    
+    normal = min(max((km - km_inicial) / extensao, 0.0), 1.0)
+    invertida = min(max((km_final - km) / extensao, 0.0), 1.0)
+    opcoes = [normal, invertida] if km_inicial < km_final else [invertida, normal]
+    
+    return min(opcoes, key=lambda proporcao: abs(
+        calcular_km_por_proporcao(proporcao, km_inicial, km_final, atributos,
+                                  continuidade, verbose=False) - km
+    ))
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extração Paralela de Coordenadas de Início/Fim - Vários Shapefiles
+Executa a extração de extrair_coordenadas_standalone.py sobre um diretório
+ou padrão de arquivos (ex: shapes/*.shp, "LARGURAS FXD/shape*.shp"),
+distribuindo o cálculo entre processos trabalhadores que inicializam o
+QGIS uma única vez cada.
+
+Arquivos grandes são divididos em faixas de ids de feição calculadas em
+processos diferentes. A gravação de cada arquivo é feita pelo processo
+principal, numa única passada (gravar_coordenadas), assim que todas as
+suas faixas terminam; ao final é exibido um resumo consolidado.
+
+Uso: python extrair_coordenadas_paralelo.py <diretorio|padrao> [...] [--processos N]
+                                            [--incremental] [--limite-divisao N]
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+import sys
+import os
+import glob
+import time
+import atexit
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Tuple, Optional, Dict, Any, List
+
+# Configuração PyQGIS
+os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+
+from qgis.core import QgsApplication, QgsVectorLayer, QgsFeatureRequest
+
+import extrair_coordenadas_standalone as ecs
+
+
+# ============================================
+# CONFIGURAÇÕES
+# ============================================
+
+QGIS_PATH = "C:/Program Files/QGIS*"
+
+# Arquivos com mais feições que isto são divididos em faixas entre os processos
+LIMITE_DIVISAO = 50000
+
+# Instância do QGIS de cada processo trabalhador
+_QGS = None
+
+
+# ============================================
+# PROCESSO TRABALHADOR
+# ============================================
+
+def inicializar_trabalhador() -> None:
+    """Inicializa o QGIS no processo trabalhador (uma única vez)."""
+    global _QGS
+    
+    QgsApplication.setPrefixPath(QGIS_PATH, True)
+    _QGS = QgsApplication([], False)
+    _QGS.initQgis()
+    atexit.register(_QGS.exitQgis)
+
+
+def _calcular_faixa(caminho: str, fids: Optional[List[int]], incremental: bool) -> Dict[str, Any]:
+    """Calcula as coordenadas de uma faixa de feições (ou do arquivo inteiro) no trabalhador."""
+    layer = QgsVectorLayer(caminho, "rodovias", "ogr")
+    
+    if not layer.isValid():
+        raise RuntimeError(f"Não foi possível carregar {caminho}")
+    
+    if layer.geometryType() != 1:  # 1 = LineString
+        raise RuntimeError("o shapefile deve conter geometrias lineares (linhas)")
+    
+    return ecs.calcular_coordenadas(layer, incremental, fids, verbose=False)
+
+
+# ============================================
+# SELEÇÃO E DIVISÃO DOS ARQUIVOS
+# ============================================
+
+def listar_shapefiles(entradas: List[str]) -> List[Path]:
+    """
+    Expande diretórios e padrões em uma lista de shapefiles.
+    
+    Args:
+        entradas: Diretórios (todos os .shp dentro), padrões glob ou arquivos
+    
+    Returns:
+        Shapefiles encontrados, sem repetições, em ordem alfabética
+    """
+    caminhos = set()
+    
+    for entrada in entradas:
+        if Path(entrada).is_dir():
+            caminhos.update(Path(entrada).glob('*.shp'))
+        else:
+            caminhos.update(Path(c) for c in glob.glob(entrada) if c.lower().endswith('.shp'))
+    
+    return sorted(c.resolve() for c in caminhos)
+
+
+def dividir_fids(caminho: Path, partes: int, limite_divisao: int = LIMITE_DIVISAO) -> List[Optional[List[int]]]:
+    """
+    Divide as feições do arquivo em faixas de ids consecutivos.
+    
+    Args:
+        caminho: Shapefile
+        partes: Número máximo de faixas (normalmente o número de processos)
+        limite_divisao: Arquivos com até este número de feições não são divididos
+    
+    Returns:
+        Lista de faixas (listas de ids); [None] quando o arquivo vai inteiro
+        para um único processo
+    """
+    layer = QgsVectorLayer(str(caminho), "rodovias", "ogr")
+    
+    if not layer.isValid() or layer.featureCount() <= limite_divisao or partes <= 1:
+        return [None]
+    
+    requisicao = QgsFeatureRequest().setNoAttributes().setFlags(QgsFeatureRequest.NoGeometry)
+    fids = sorted(feature.id() for feature in layer.getFeatures(requisicao))
+    
+    tamanho = -(-len(fids) // partes)
+    return [fids[i:i + tamanho] for i in range(0, len(fids), tamanho)]
+
+
+# ============================================
+# EXECUÇÃO
+# ============================================
+
+def processar_arquivos(caminhos: List[Path], processos: Optional[int] = None,
+                       incremental: bool = False,
+                       limite_divisao: int = LIMITE_DIVISAO) -> List[Dict[str, Any]]:
+    """
+    Extrai as coordenadas de vários shapefiles em paralelo.
+    
+    O cálculo (leitura e reprojeção) roda nos processos trabalhadores; a
+    gravação de cada arquivo roda no processo principal quando todas as
+    suas faixas terminam, enquanto os trabalhadores seguem com os demais.
+    
+    Args:
+        caminhos: Shapefiles a processar
+        processos: Número de processos (padrão: número de CPUs)
+        incremental: Recalcula apenas as feições alteradas (ver extrair_coordenadas_standalone)
+        limite_divisao: Arquivos maiores que isto são divididos em faixas
+    
+    Returns:
+        Resumo por arquivo: 'arquivo', 'sucesso', 'gravadas', 'puladas',
+        'erros', 'faixas', 'segundos' e, em caso de falha, 'mensagem'
+    """
+    processos = processos or os.cpu_count() or 1
+    
+    resumos = {
+        caminho: {'arquivo': str(caminho), 'sucesso': True, 'gravadas': 0, 'puladas': 0,
+                  'erros': 0, 'faixas': 0, 'segundos': 0.0}
+        for caminho in caminhos
+    }
+    coordenadas: Dict[Path, Dict[int, Tuple[str, str, str]]] = {caminho: {} for caminho in caminhos}
+    pendentes: Dict[Path, int] = {}
+    inicio_arquivo: Dict[Path, float] = {}
+    
+    with ProcessPoolExecutor(max_workers=processos, initializer=inicializar_trabalhador) as pool:
+        tarefas = {}
+        
+        for caminho in caminhos:
+            faixas = dividir_fids(caminho, processos, limite_divisao)
+            resumos[caminho]['faixas'] = len(faixas)
+            pendentes[caminho] = len(faixas)
+            inicio_arquivo[caminho] = time.monotonic()
+            
+            for fids in faixas:
+                tarefa = pool.submit(_calcular_faixa, str(caminho), fids, incremental)
+                tarefas[tarefa] = caminho
+        
+        for tarefa in as_completed(tarefas):
+            caminho = tarefas[tarefa]
+            resumo = resumos[caminho]
+            
+            try:
+                calculo = tarefa.result()
+                coordenadas[caminho].update(calculo['coordenadas'])
+                resumo['puladas'] += calculo['puladas']
+                resumo['erros'] += calculo['vazias'] + calculo['erros']
+            except Exception as e:
+                resumo['sucesso'] = False
+                resumo['mensagem'] = str(e)
+            
+            pendentes[caminho] -= 1
+            if pendentes[caminho]:
+                continue
+            
+            # Todas as faixas do arquivo prontas: gravar numa única passada
+            if resumo['sucesso'] and coordenadas[caminho]:
+                print(f"\n📁 {caminho.name}: gravando {len(coordenadas[caminho])} feições")
+                gravadas = ecs.gravar_coordenadas(caminho, coordenadas[caminho])
+                
+                if gravadas is None:
+                    resumo['sucesso'] = False
+                    resumo['mensagem'] = 'falha na gravação (tabela restaurada)'
+                else:
+                    resumo['gravadas'] = gravadas
+            
+            # Liberar a memória do arquivo concluído
+            coordenadas[caminho] = {}
+            resumo['segundos'] = time.monotonic() - inicio_arquivo[caminho]
+            
+            status = "✅" if resumo['sucesso'] else "❌"
+            print(f"{status} {caminho.name}: {resumo['gravadas']} gravadas, "
+                  f"{resumo['puladas']} puladas, {resumo['erros']} com erro")
+    
+    return [resumos[caminho] for caminho in caminhos]
+
+
+def exibir_resumo(resumos: List[Dict[str, Any]], segundos: float) -> None:
+    """
+    Exibe o resumo consolidado da extração.
+    
+    Args:
+        resumos: Resultado de processar_arquivos
+        segundos: Tempo total
+    """
+    print("\n" + "="*70)
+    print("📊 RESUMO CONSOLIDADO")
+    print("="*70)
+    
+    for resumo in resumos:
+        status = "✅" if resumo['sucesso'] else "❌"
+        print(f"{status} {Path(resumo['arquivo']).name:<40} {resumo['gravadas']:>8} gravadas"
+              f"  {resumo['puladas']:>8} puladas  {resumo['erros']:>5} erros"
+              f"  ({resumo['faixas']} faixa(s), {resumo['segundos']:.1f} s)")
+        if not resumo['sucesso']:
+            print(f"   ⚠️  {resumo.get('mensagem', '')}")
+    
+    falhas = sum(1 for r in resumos if not r['sucesso'])
+    print("-"*70)
+    print(f"📁 Arquivos: {len(resumos)} ({falhas} com falha)")
+    print(f"✅ Feições gravadas: {sum(r['gravadas'] for r in resumos)}")
+    print(f"⏭️  Feições puladas: {sum(r['puladas'] for r in resumos)}")
+    print(f"⚠️  Feições com erro: {sum(r['erros'] for r in resumos)}")
+    print(f"⏱️  Tempo total: {segundos:.1f} s")
+    print("="*70)
+
+
+# ============================================
+# MAIN - INTERFACE CLI
+# ============================================
+
+def main():
+    """Função principal - execução CLI."""
+    
+    parser = argparse.ArgumentParser(
+        description='Extrai as coordenadas de início/fim de vários shapefiles em paralelo',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos:
+  %(prog)s shapes
+  %(prog)s "shapes/*.shp" --processos 4
+  %(prog)s "LARGURAS FXD/shape*.shp" --incremental
+        """
+    )
+    
+    parser.add_argument('entradas', nargs='+', metavar='ENTRADA',
+                       help='Diretório (todos os .shp) ou padrão de arquivos')
+    parser.add_argument('--processos', '-p', type=int,
+                       help='Número de processos trabalhadores (padrão: número de CPUs)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Recalcula apenas as feições com geometria alterada ou campos vazios')
+    parser.add_argument('--limite-divisao', type=int, default=LIMITE_DIVISAO, metavar='N',
+                       help=f'Divide entre os processos os arquivos com mais de N feições '
+                            f'(padrão: {LIMITE_DIVISAO})')
+    
+    args = parser.parse_args()
+    
+    caminhos = listar_shapefiles(args.entradas)
+    if not caminhos:
+        print("❌ ERRO: Nenhum shapefile encontrado!")
+        return 1
+    
+    print("="*70)
+    print("🔧 EXTRATOR DE COORDENADAS - PROCESSAMENTO PARALELO")
+    print("="*70)
+    for caminho in caminhos:
+        print(f"   📁 {caminho}")
+    
+    # QGIS do processo principal (divisão em faixas e gravação)
+    print("\n🔧 Inicializando PyQGIS...")
+    
+    QgsApplication.setPrefixPath(QGIS_PATH, True)
+    qgs = QgsApplication([], False)
+    qgs.initQgis()
+    
+    try:
+        inicio = time.monotonic()
+        resumos = processar_arquivos(caminhos, args.processos, args.incremental, args.limite_divisao)
+        exibir_resumo(resumos, time.monotonic() - inicio)
+        exit_code = 0 if all(r['sucesso'] for r in resumos) else 1
+    
+    except Exception as e:
+        print(f"\n❌ ERRO CRÍTICO: {e}")
+        import traceback
+        traceback.print_exc()
+        exit_code = 2
+    
+    finally:
+        # Finalizar QGIS
+        qgs.exitQgis()
+    
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
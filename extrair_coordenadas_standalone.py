@@ -4,7 +4,17 @@
 Script Standalone para extrair coordenadas de início e fim de geometrias lineares
 e adicionar à tabela de atributos do shapefile.
 
-Uso: python extrair_coordenadas_standalone.py <caminho_shapefile>
+Os vértices de início e fim de todas as feições são lidos primeiro e
+reprojetados de uma vez (pyproj, vetorizado), com uma única transformação
+por par de sistemas de coordenadas. Os valores são gravados direto no
+arquivo, em blocos (changeAttributeValues do provedor, sem buffer de
+edição), com cópia de segurança da tabela restaurada em caso de falha.
+
+Junto das coordenadas é gravado o hash da geometria de cada feição
+(campo c_hash). No modo --incremental só são recalculadas as feições
+cuja geometria mudou desde a última extração ou cujos campos estão vazios.
+
+Uso: python extrair_coordenadas_standalone.py <caminho_shapefile> [--incremental]
 
 Autor: Sistema de Gestão Rodoviária
 Data: 2025
@@ -12,7 +22,13 @@ Data: 2025
 
 import sys
 import os
+import shutil
+import hashlib
+import argparse
 from pathlib import Path
+from typing import Tuple, Dict, Any, List, Optional
+
+import numpy as np
 
 # Configuração PyQGIS
 os.environ['QT_QPA_PLATFORM'] = 'offscreen'
@@ -20,6 +36,8 @@ os.environ['QT_QPA_PLATFORM'] = 'offscreen'
 from qgis.core import (
     QgsApplication,
     QgsVectorLayer,
+    QgsFeatureRequest,
+    QgsVectorDataProvider,
     QgsField,
     QgsVectorFileWriter,
     QgsCoordinateReferenceSystem,
@@ -29,6 +47,32 @@ from qgis.core import (
 )
 from qgis.PyQt.QtCore import QVariant
 
+try:
+    from pyproj import Transformer
+    PYPROJ_DISPONIVEL = True
+except ImportError:
+    # Sem pyproj, cada ponto passa pela QgsCoordinateTransform (criada uma vez por par)
+    PYPROJ_DISPONIVEL = False
+
+
+# Coordenadas geográficas usadas para calcular a zona UTM
+EPSG_LATLON = 4326
+
+# Campo com o hash da geometria usada no cálculo de c_inicial/c_final
+CAMPO_HASH = 'c_hash'
+
+# Bytes do hash (BLAKE2b) da geometria; o campo guarda o dobro em hexadecimal
+TAMANHO_HASH = 8
+
+# Feições gravadas por chamada a changeAttributeValues (progresso a cada bloco)
+TAMANHO_BLOCO_GRAVACAO = 10000
+
+# Arquivos do shapefile alterados pela gravação dos atributos (copiados antes)
+EXTENSOES_ATRIBUTOS = ['.dbf', '.cpg']
+
+# Sufixo das cópias de segurança
+SUFIXO_COPIA = '.bak'
+
 
 def calcular_zona_utm(longitude):
     """
@@ -51,13 +95,468 @@ def calcular_zona_utm(longitude):
     return zona
 
 
-def extrair_coordenadas_inicio_fim(caminho_shapefile):
+def calcular_zonas_utm(longitudes: np.ndarray) -> np.ndarray:
+    """Versão vetorizada de calcular_zona_utm."""
+    return (np.floor((np.asarray(longitudes, dtype=float) + 180) / 6) + 1).astype(int)
+
+
+# ============================================
+# TRANSFORMAÇÃO VETORIZADA DE COORDENADAS
+# ============================================
+
+# Transformadores já construídos, por par (CRS de origem, CRS de destino)
+_TRANSFORMADORES: Dict[Tuple[str, str], Any] = {}
+
+
+def identificador_crs(crs: QgsCoordinateReferenceSystem) -> str:
+    """
+    Identificador do CRS aceito tanto pelo pyproj quanto pelo QGIS.
+    
+    Args:
+        crs: Sistema de coordenadas da camada
+    
+    Returns:
+        'EPSG:n' quando houver código EPSG, senão a definição WKT
+    """
+    authid = crs.authid()
+    return authid if authid.upper().startswith('EPSG:') else crs.toWkt()
+
+
+def obter_transformador(crs_origem: str, crs_destino: str):
+    """
+    Retorna o transformador entre dois sistemas, criando-o uma única vez.
+    
+    Args:
+        crs_origem: Identificador do CRS de entrada (ver identificador_crs)
+        crs_destino: Identificador do CRS de saída
+    
+    Returns:
+        pyproj.Transformer (ordem x/y) ou, sem pyproj, QgsCoordinateTransform
+    """
+    transformador = _TRANSFORMADORES.get((crs_origem, crs_destino))
+    
+    if transformador is None:
+        if PYPROJ_DISPONIVEL:
+            transformador = Transformer.from_crs(crs_origem, crs_destino, always_xy=True)
+        else:
+            transformador = QgsCoordinateTransform(
+                QgsCoordinateReferenceSystem(crs_origem),
+                QgsCoordinateReferenceSystem(crs_destino),
+                QgsProject.instance()
+            )
+        _TRANSFORMADORES[(crs_origem, crs_destino)] = transformador
+    
+    return transformador
+
+
+def transformar_pontos(xs: np.ndarray, ys: np.ndarray,
+                       crs_origem: str, crs_destino: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Transforma arrays de coordenadas de um sistema para outro.
+    
+    Com pyproj é uma única chamada vetorizada; sem ele, os pontos passam
+    um a um pela mesma QgsCoordinateTransform (criada uma vez por par).
+    
+    Args:
+        xs: Coordenadas X (ou longitudes)
+        ys: Coordenadas Y (ou latitudes)
+        crs_origem: Identificador do CRS de entrada
+        crs_destino: Identificador do CRS de saída
+    
+    Returns:
+        Tupla (xs, ys) no CRS de destino
+    """
+    transformador = obter_transformador(crs_origem, crs_destino)
+    
+    if PYPROJ_DISPONIVEL:
+        xs_destino, ys_destino = transformador.transform(xs, ys)
+        return np.asarray(xs_destino, dtype=float), np.asarray(ys_destino, dtype=float)
+    
+    xs_destino = np.empty(len(xs))
+    ys_destino = np.empty(len(ys))
+    
+    for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist())):
+        ponto = transformador.transform(QgsPointXY(x, y))
+        xs_destino[i] = ponto.x()
+        ys_destino[i] = ponto.y()
+    
+    return xs_destino, ys_destino
+
+
+def calcular_extremidades_utm(xs: np.ndarray, ys: np.ndarray,
+                              crs_origem: str) -> Dict[str, np.ndarray]:
+    """
+    Converte pontos do CRS da camada para SIRGAS 2000 UTM na zona de cada um.
+    
+    Os pontos passam primeiro para WGS84 (lat/lon), de onde sai a zona UTM
+    pela longitude; depois cada zona é convertida de uma vez.
+    
+    Args:
+        xs: Coordenadas X no CRS da camada
+        ys: Coordenadas Y no CRS da camada
+        crs_origem: Identificador do CRS da camada (ver identificador_crs)
+    
+    Returns:
+        Dicionário com arrays 'longitude', 'latitude', 'zona', 'x' e 'y' (UTM)
+    """
+    longitudes, latitudes = transformar_pontos(xs, ys, crs_origem, f"EPSG:{EPSG_LATLON}")
+    zonas = calcular_zonas_utm(longitudes)
+    
+    xs_utm = np.empty(len(xs))
+    ys_utm = np.empty(len(ys))
+    
+    # SIRGAS 2000 / UTM zone ##S: EPSG = 31960 + zona
+    # Zona 23S = EPSG:31983 (31960 + 23)
+    # Zona 24S = EPSG:31984 (31960 + 24)
+    for zona in np.unique(zonas).tolist():
+        selecao = zonas == zona
+        xs_utm[selecao], ys_utm[selecao] = transformar_pontos(
+            longitudes[selecao], latitudes[selecao], f"EPSG:{EPSG_LATLON}", f"EPSG:{31960 + zona}"
+        )
+    
+    return {
+        'longitude': longitudes,
+        'latitude': latitudes,
+        'zona': zonas,
+        'x': xs_utm,
+        'y': ys_utm
+    }
+
+
+def formatar_coordenada_utm(x: float, y: float, zona: int) -> str:
+    """Formata no padrão dos campos c_inicial/c_final: X Y Zona (inteiros, sem vírgulas)."""
+    return f"{int(round(x))} {int(round(y))} {zona}"
+
+
+# ============================================
+# LEITURA DAS EXTREMIDADES
+# ============================================
+
+def hash_geometria(geom) -> str:
+    """
+    Impressão digital da geometria (BLAKE2b do WKB, em hexadecimal).
+    
+    Args:
+        geom: QgsGeometry da feição
+    
+    Returns:
+        Hash com 2 * TAMANHO_HASH caracteres
+    """
+    return hashlib.blake2b(bytes(geom.asWkb()), digest_size=TAMANHO_HASH).hexdigest()
+
+
+def campo_preenchido(valor) -> bool:
+    """True se o atributo tem texto (NULL e strings vazias contam como vazios)."""
+    return isinstance(valor, str) and bool(valor.strip())
+
+
+def ler_extremidades(layer: QgsVectorLayer, incremental: bool = False,
+                     fids_selecionados: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Lê o primeiro e o último vértice de cada feição e o hash da geometria.
+    
+    Nas multilinhas, o início é o primeiro vértice da primeira parte e o
+    fim, o último vértice da última parte. No modo incremental são puladas
+    as feições cujo hash é igual ao gravado em CAMPO_HASH e cujos
+    c_inicial/c_final estão preenchidos.
+    
+    Args:
+        layer: Camada de linhas
+        incremental: Pula as feições inalteradas desde a última extração
+        fids_selecionados: Lê apenas estas feições (padrão: todas)
+    
+    Returns:
+        Dicionário com 'fids', 'extremidades' (array (n, 4) com x/y inicial
+        e x/y final), 'hashes', 'vazias' (geometrias vazias) e 'puladas'
+    """
+    fids = []
+    extremidades = []
+    hashes = []
+    vazias = 0
+    puladas = 0
+    
+    campos = layer.fields()
+    indices = [campos.indexOf(nome) for nome in ('c_inicial', 'c_final', CAMPO_HASH)]
+    
+    if incremental and min(indices) >= 0:
+        requisicao = QgsFeatureRequest().setSubsetOfAttributes(indices)
+    else:
+        # Sem os três campos não há o que comparar: todas as feições são calculadas
+        incremental = False
+        requisicao = QgsFeatureRequest().setNoAttributes()
+    
+    if fids_selecionados is not None:
+        requisicao.setFilterFids(fids_selecionados)
+    
+    for feature in layer.getFeatures(requisicao):
+        geom = feature.geometry()
+        
+        if geom.isEmpty():
+            print(f"   ⚠️  Feature ID {feature.id()}: geometria vazia - pulando")
+            vazias += 1
+            continue
+        
+        n_vertices = geom.constGet().nCoordinates()
+        if n_vertices == 0:
+            vazias += 1
+            continue
+        
+        assinatura = hash_geometria(geom)
+        
+        if incremental:
+            c_inicial, c_final, hash_gravado = (feature.attribute(i) for i in indices)
+            if hash_gravado == assinatura and campo_preenchido(c_inicial) and campo_preenchido(c_final):
+                puladas += 1
+                continue
+        
+        ponto_inicial = geom.vertexAt(0)
+        ponto_final = geom.vertexAt(n_vertices - 1)
+        
+        fids.append(feature.id())
+        hashes.append(assinatura)
+        extremidades.append((ponto_inicial.x(), ponto_inicial.y(), ponto_final.x(), ponto_final.y()))
+    
+    return {
+        'fids': fids,
+        'extremidades': np.array(extremidades, dtype=float).reshape(-1, 4),
+        'hashes': hashes,
+        'vazias': vazias,
+        'puladas': puladas
+    }
+
+
+def calcular_coordenadas(layer: QgsVectorLayer, incremental: bool = False,
+                         fids_selecionados: Optional[List[int]] = None,
+                         verbose: bool = True) -> Dict[str, Any]:
+    """
+    Calcula c_inicial/c_final das feições (sem gravar nada).
+    
+    Args:
+        layer: Camada de linhas
+        incremental: Pula as feições inalteradas (ver ler_extremidades)
+        fids_selecionados: Calcula apenas estas feições (padrão: todas)
+        verbose: Exibe os detalhes da conversão da primeira feição
+    
+    Returns:
+        Dicionário com 'coordenadas' (id da feição -> (c_inicial, c_final,
+        hash da geometria)), 'vazias', 'puladas' e 'erros'
+    """
+    # Ler início/fim de todas as feições e converter para UTM de uma vez
+    crs_atual = layer.crs()
+    leitura = ler_extremidades(layer, incremental, fids_selecionados)
+    fids = leitura['fids']
+    extremidades = leitura['extremidades']
+    n = len(fids)
+    
+    pontos = calcular_extremidades_utm(
+        np.concatenate([extremidades[:, 0], extremidades[:, 2]]),
+        np.concatenate([extremidades[:, 1], extremidades[:, 3]]),
+        identificador_crs(crs_atual)
+    )
+    
+    # DEBUG: Primeira feição - mostrar detalhes da conversão
+    if n and verbose:
+        crs_utm_inicial = QgsCoordinateReferenceSystem(f"EPSG:{31960 + int(pontos['zona'][0])}")
+        print(f"\n   🔍 DEBUG - Primeira feição:")
+        print(f"      CRS Original: {crs_atual.authid()} - {crs_atual.description()}")
+        print(f"      Ponto Inicial Original: X={extremidades[0, 0]:.6f}, Y={extremidades[0, 1]:.6f}")
+        print(f"      Ponto Inicial Lat/Lon: Lon={pontos['longitude'][0]:.6f}, Lat={pontos['latitude'][0]:.6f}")
+        print(f"      Zona UTM Calculada: {pontos['zona'][0]}")
+        print(f"      CRS UTM Destino: {crs_utm_inicial.authid()} - {crs_utm_inicial.description()}")
+        print(f"      Ponto Inicial UTM: X={pontos['x'][0]:.2f}, Y={pontos['y'][0]:.2f}")
+        print(f"      ✅ Conversão realizada!\n")
+    
+    xs_utm = pontos['x'].tolist()
+    ys_utm = pontos['y'].tolist()
+    zonas = pontos['zona'].tolist()
+    
+    # Formatar coordenadas no formato: X Y Zona (sem vírgulas, valores inteiros)
+    coordenadas = {}
+    erros = 0
+    for i, fid in enumerate(fids):
+        try:
+            coordenadas[fid] = (
+                formatar_coordenada_utm(xs_utm[i], ys_utm[i], zonas[i]),
+                formatar_coordenada_utm(xs_utm[n + i], ys_utm[n + i], zonas[n + i]),
+                leitura['hashes'][i]
+            )
+        except Exception as e:
+            print(f"   ❌ Erro ao processar feature ID {fid}: {e}")
+            erros += 1
+    
+    return {
+        'coordenadas': coordenadas,
+        'vazias': leitura['vazias'],
+        'puladas': leitura['puladas'],
+        'erros': erros
+    }
+
+
+# ============================================
+# GRAVAÇÃO EM LOTE DOS ATRIBUTOS
+# ============================================
+
+def criar_copia_seguranca(caminho_shapefile) -> List[Tuple[Path, Path]]:
+    """
+    Copia os arquivos da tabela de atributos antes da gravação.
+    
+    Args:
+        caminho_shapefile: Caminho do shapefile (ou de outro arquivo OGR)
+    
+    Returns:
+        Lista de (arquivo, cópia)
+    """
+    caminho = Path(caminho_shapefile)
+    
+    if caminho.suffix.lower() == '.shp':
+        arquivos = [caminho.with_suffix(extensao) for extensao in EXTENSOES_ATRIBUTOS]
+    else:
+        arquivos = [caminho]
+    
+    copias = []
+    for arquivo in arquivos:
+        if arquivo.exists():
+            copia = arquivo.with_name(arquivo.name + SUFIXO_COPIA)
+            shutil.copy2(arquivo, copia)
+            copias.append((arquivo, copia))
+    
+    return copias
+
+
+def restaurar_copia_seguranca(copias: List[Tuple[Path, Path]]) -> None:
+    """Devolve os arquivos ao estado anterior à gravação (a camada já deve estar fechada)."""
+    for arquivo, copia in copias:
+        os.replace(copia, arquivo)
+
+
+def remover_copia_seguranca(copias: List[Tuple[Path, Path]]) -> None:
+    """Apaga as cópias após uma gravação bem-sucedida."""
+    for _, copia in copias:
+        copia.unlink(missing_ok=True)
+
+
+def gravar_atributos_em_lote(provedor: QgsVectorDataProvider, valores: Dict[int, Dict[int, Any]],
+                             tamanho_bloco: int = TAMANHO_BLOCO_GRAVACAO) -> int:
+    """
+    Grava os valores direto no provedor, em blocos, numa única passada.
+    
+    Args:
+        provedor: Provedor de dados da camada
+        valores: Mapa id da feição -> {índice do campo: valor}
+        tamanho_bloco: Feições por chamada a changeAttributeValues
+    
+    Returns:
+        Número de feições gravadas
+    
+    Raises:
+        RuntimeError: Se o provedor recusar algum bloco
+    """
+    fids = sorted(valores)
+    total = len(fids)
+    
+    for inicio in range(0, total, tamanho_bloco):
+        bloco = {fid: valores[fid] for fid in fids[inicio:inicio + tamanho_bloco]}
+        
+        if not provedor.changeAttributeValues(bloco):
+            erros = provedor.errors()
+            raise RuntimeError("; ".join(erros) if erros else "changeAttributeValues recusado pelo provedor")
+        
+        gravadas = min(inicio + tamanho_bloco, total)
+        print(f"   Gravadas: {gravadas}/{total} feições ({100 * gravadas / total:.0f}%)")
+    
+    return total
+
+
+def gravar_coordenadas(caminho_shapefile, coordenadas: Dict[int, Tuple[str, str, str]]) -> Optional[int]:
+    """
+    Cria os campos que faltarem e grava c_inicial, c_final e CAMPO_HASH.
+    
+    A gravação vai direto ao arquivo (sem buffer de edição); antes dela é
+    feita uma cópia de segurança da tabela de atributos, restaurada se
+    qualquer etapa falhar. Nenhuma outra camada pode estar com o arquivo aberto.
+    
+    Args:
+        caminho_shapefile: Caminho do shapefile
+        coordenadas: Mapa id da feição -> (c_inicial, c_final, hash da geometria)
+    
+    Returns:
+        Número de feições gravadas, ou None se a gravação falhou (arquivo restaurado)
+    """
+    print("\n🗂️  Criando cópia de segurança da tabela de atributos...")
+    copias = criar_copia_seguranca(caminho_shapefile)
+    
+    layer = QgsVectorLayer(str(caminho_shapefile), "rodovias", "ogr")
+    provedor = layer.dataProvider()
+    
+    try:
+        # Adicionar campos se não existirem
+        field_names = [field.name() for field in layer.fields()]
+        novos_campos = [QgsField(nome, QVariant.String, len=30)
+                        for nome in ('c_inicial', 'c_final') if nome not in field_names]
+        if CAMPO_HASH not in field_names:
+            novos_campos.append(QgsField(CAMPO_HASH, QVariant.String, len=2 * TAMANHO_HASH))
+        
+        if novos_campos:
+            if not provedor.addAttributes(novos_campos):
+                raise RuntimeError("não foi possível adicionar os campos "
+                                   f"{', '.join(c.name() for c in novos_campos)}")
+            layer.updateFields()
+            print(f"   ✅ Campos adicionados: {', '.join(c.name() for c in novos_campos)}")
+        else:
+            print("   ℹ️  Todos os campos já existem, apenas atualizando valores...")
+        
+        # Obter índices dos campos
+        idx_c_inicial = layer.fields().indexOf('c_inicial')
+        idx_c_final = layer.fields().indexOf('c_final')
+        idx_hash = layer.fields().indexOf(CAMPO_HASH)
+        
+        if min(idx_c_inicial, idx_c_final, idx_hash) == -1:
+            raise RuntimeError("não foi possível encontrar os campos criados")
+        
+        # DEBUG: mostrar coordenadas calculadas para a primeira feição
+        if coordenadas:
+            coord_inicial, coord_final, _ = next(iter(coordenadas.values()))
+            print(f"\n   🎯 VALORES A SEREM SALVOS NA PRIMEIRA FEIÇÃO:")
+            print(f"      c_inicial (índice {idx_c_inicial}): '{coord_inicial}'")
+            print(f"      c_final   (índice {idx_c_final}): '{coord_final}'")
+        
+        # Gravar todas as feições numa única passada pela tabela
+        print("\n💾 Salvando alterações...")
+        gravadas = gravar_atributos_em_lote(provedor, {
+            fid: {idx_c_inicial: coord_inicial, idx_c_final: coord_final, idx_hash: assinatura}
+            for fid, (coord_inicial, coord_final, assinatura) in coordenadas.items()
+        })
+    
+    except Exception as e:
+        print(f"❌ ERRO ao salvar alterações: {e}")
+        print("↩️  Restaurando a tabela de atributos original...")
+        
+        # Fechar a camada antes de sobrescrever os arquivos
+        provedor = layer = None
+        restaurar_copia_seguranca(copias)
+        return None
+    
+    provedor = layer = None
+    remover_copia_seguranca(copias)
+    print("✅ Alterações salvas com sucesso!")
+    
+    return gravadas
+
+
+# ============================================
+# EXTRAÇÃO
+# ============================================
+
+def extrair_coordenadas_inicio_fim(caminho_shapefile, incremental=False):
     """
     Extrai coordenadas de início e fim de cada feição linear e adiciona
-    os campos 'c_inicial' e 'c_final' à tabela de atributos.
+    os campos 'c_inicial' e 'c_final' (e o hash da geometria, CAMPO_HASH)
+    à tabela de atributos.
     
     Args:
         caminho_shapefile: Caminho completo para o shapefile
+        incremental: Recalcula apenas as feições com geometria alterada ou
+            campos vazios
     
     Returns:
         True se bem-sucedido, False caso contrário
@@ -92,195 +591,55 @@ def extrair_coordenadas_inicio_fim(caminho_shapefile):
         
         # Verificar se os campos já existem
         field_names = [field.name() for field in layer.fields()]
-        campos_existem = (
-            'c_inicial' in field_names and 
-            'c_final' in field_names
-        )
+        campos_faltantes = [nome for nome in ('c_inicial', 'c_final', CAMPO_HASH) if nome not in field_names]
         
-        if not campos_existem:
+        if campos_faltantes:
             print("\n➕ Campos não existem, serão criados:")
-            print("   - c_inicial: Coordenadas de início (X Y Zona)")
-            print("   - c_final: Coordenadas de fim (X Y Zona)")
+            if 'c_inicial' in campos_faltantes:
+                print("   - c_inicial: Coordenadas de início (X Y Zona)")
+            if 'c_final' in campos_faltantes:
+                print("   - c_final: Coordenadas de fim (X Y Zona)")
+            if CAMPO_HASH in campos_faltantes:
+                print(f"   - {CAMPO_HASH}: Hash da geometria (modo incremental)")
             print("   Formato: 412312 8123123 24")
+        elif incremental:
+            print("\n🔁 Modo incremental: apenas feições alteradas ou sem coordenadas serão recalculadas")
         else:
             print("\n⚠️  AVISO: Campos já existem e serão sobrescritos!")
         
-        # Iniciar edição
-        if not layer.startEditing():
-            print("❌ ERRO: Não foi possível iniciar edição do layer!")
-            return False
-        
-        # Adicionar campos se não existirem
-        campos_adicionados = []
-        
-        if 'c_inicial' not in field_names:
-            if layer.addAttribute(QgsField('c_inicial', QVariant.String, len=30)):
-                campos_adicionados.append('c_inicial')
-            else:
-                print("❌ ERRO: Não foi possível adicionar campo 'c_inicial'!")
-        
-        if 'c_final' not in field_names:
-            if layer.addAttribute(QgsField('c_final', QVariant.String, len=30)):
-                campos_adicionados.append('c_final')
-            else:
-                print("❌ ERRO: Não foi possível adicionar campo 'c_final'!")
+        provedor = layer.dataProvider()
+        capacidades = provedor.capabilities()
         
-        if campos_adicionados:
-            layer.updateFields()
-            print(f"   ✅ Campos adicionados: {', '.join(campos_adicionados)}")
-        else:
-            print("   ℹ️  Todos os campos já existem, apenas atualizando valores...")
+        if not capacidades & QgsVectorDataProvider.ChangeAttributeValues or \
+                (campos_faltantes and not capacidades & QgsVectorDataProvider.AddAttributes):
+            print("❌ ERRO: O formato do arquivo não permite gravar os campos!")
+            return False
         
         # Processar feições
         print("\n🔄 Processando feições...")
         
         features_processadas = 0
-        features_erro = 0
-        
-        # Obter índices dos campos
-        layer.updateFields()
-        idx_c_inicial = layer.fields().indexOf('c_inicial')
-        idx_c_final = layer.fields().indexOf('c_final')
         
-        if idx_c_inicial == -1 or idx_c_final == -1:
-            print("❌ ERRO: Não foi possível encontrar os campos criados!")
-            layer.rollBack()
-            return False
+        calculo = calcular_coordenadas(layer, incremental)
+        coordenadas = calculo['coordenadas']
+        features_erro = calculo['vazias'] + calculo['erros']
         
-        for feature in layer.getFeatures():
-            try:
-                geom = feature.geometry()
-                
-                if geom.isEmpty():
-                    print(f"   ⚠️  Feature ID {feature.id()}: geometria vazia - pulando")
-                    features_erro += 1
-                    continue
-                
-                # Extrair pontos de início e fim
-                if geom.isMultipart():
-                    lines = geom.asMultiPolyline()
-                    if not lines or len(lines) == 0:
-                        features_erro += 1
-                        continue
-                    # Pega a primeira linha da multilinha
-                    first_line = lines[0]
-                    # Pega a última linha da multilinha
-                    last_line = lines[-1]
-                    ponto_inicial = first_line[0]
-                    ponto_final = last_line[-1]
-                else:
-                    line = geom.asPolyline()
-                    if not line or len(line) == 0:
-                        features_erro += 1
-                        continue
-                    ponto_inicial = line[0]
-                    ponto_final = line[-1]
-                
-                # Obter sistema de coordenadas atual
-                crs_atual = layer.crs()
-                
-                # Primeiro, sempre converter para WGS84 (lat/lon) para calcular a zona correta
-                crs_latlon = QgsCoordinateReferenceSystem("EPSG:4326")  # WGS84
-                
-                transformador_para_latlon = QgsCoordinateTransform(
-                    crs_atual, 
-                    crs_latlon, 
-                    QgsProject.instance()
-                )
-                
-                # Converter pontos para lat/lon
-                ponto_inicial_latlon = transformador_para_latlon.transform(ponto_inicial)
-                ponto_final_latlon = transformador_para_latlon.transform(ponto_final)
-                
-                # Calcular zona UTM baseado na longitude
-                zona_inicial = calcular_zona_utm(ponto_inicial_latlon.x())
-                zona_final = calcular_zona_utm(ponto_final_latlon.x())
-                
-                # DEBUG: Primeira feição - mostrar detalhes da conversão
-                if features_processadas == 0:
-                    print(f"\n   🔍 DEBUG - Primeira feição:")
-                    print(f"      CRS Original: {crs_atual.authid()} - {crs_atual.description()}")
-                    print(f"      Ponto Inicial Original: X={ponto_inicial.x():.6f}, Y={ponto_inicial.y():.6f}")
-                    print(f"      Ponto Inicial Lat/Lon: Lon={ponto_inicial_latlon.x():.6f}, Lat={ponto_inicial_latlon.y():.6f}")
-                    print(f"      Zona UTM Calculada: {zona_inicial}")
-                
-                # IMPORTANTE: Agora converter de lat/lon (WGS84) para SIRGAS 2000 UTM
-                # SIRGAS 2000 / UTM zone ##S: EPSG = 31960 + zona
-                # Zona 23S = EPSG:31983 (31960 + 23)
-                # Zona 24S = EPSG:31984 (31960 + 24)
-                epsg_inicial = 31960 + zona_inicial
-                epsg_final = 31960 + zona_final
-                
-                crs_utm_inicial = QgsCoordinateReferenceSystem(f"EPSG:{epsg_inicial}")
-                crs_utm_final = QgsCoordinateReferenceSystem(f"EPSG:{epsg_final}")
-                
-                # Transformar de lat/lon (WGS84) para UTM (SIRGAS 2000)
-                transformador_inicial = QgsCoordinateTransform(
-                    crs_latlon,  # De WGS84 lat/lon
-                    crs_utm_inicial,  # Para SIRGAS UTM
-                    QgsProject.instance()
-                )
-                
-                transformador_final = QgsCoordinateTransform(
-                    crs_latlon,  # De WGS84 lat/lon
-                    crs_utm_final,  # Para SIRGAS UTM
-                    QgsProject.instance()
-                )
-                
-                # Aplicar transformação nos pontos lat/lon
-                ponto_inicial_utm = transformador_inicial.transform(ponto_inicial_latlon)
-                ponto_final_utm = transformador_final.transform(ponto_final_latlon)
-                
-                # DEBUG: Primeira feição - mostrar coordenadas UTM
-                if features_processadas == 0:
-                    print(f"      CRS UTM Destino: {crs_utm_inicial.authid()} - {crs_utm_inicial.description()}")
-                    print(f"      Ponto Inicial UTM: X={ponto_inicial_utm.x():.2f}, Y={ponto_inicial_utm.y():.2f}")
-                    print(f"      ✅ Conversão realizada!\n")
-                
-                # Formatar coordenadas no formato: X Y Zona (sem vírgulas, valores inteiros)
-                coord_inicial = f"{int(round(ponto_inicial_utm.x()))} {int(round(ponto_inicial_utm.y()))} {zona_inicial}"
-                coord_final = f"{int(round(ponto_final_utm.x()))} {int(round(ponto_final_utm.y()))} {zona_final}"
-                
-                # DEBUG: mostrar coordenadas calculadas para a primeira feição
-                if features_processadas == 0:
-                    print(f"\n   🎯 VALORES A SEREM SALVOS NA PRIMEIRA FEIÇÃO:")
-                    print(f"      c_inicial (índice {idx_c_inicial}): '{coord_inicial}'")
-                    print(f"      c_final   (índice {idx_c_final}): '{coord_final}'")
-                
-                # Atualizar atributos
-                if not layer.changeAttributeValue(feature.id(), idx_c_inicial, coord_inicial):
-                    print(f"   ⚠️  Erro ao atualizar c_inicial para feature {feature.id()}")
-                
-                if not layer.changeAttributeValue(feature.id(), idx_c_final, coord_final):
-                    print(f"   ⚠️  Erro ao atualizar c_final para feature {feature.id()}")
-                
-                features_processadas += 1
-                
-                # Mostrar progresso a cada 50 feições
-                if features_processadas % 50 == 0:
-                    print(f"   Processadas: {features_processadas} feições...")
-            
-            except Exception as e:
-                print(f"   ❌ Erro ao processar feature ID {feature.id()}: {e}")
-                features_erro += 1
-                continue
-        
-        # Confirmar alterações
-        print("\n💾 Salvando alterações...")
-        if layer.commitChanges():
-            print("✅ Alterações salvas com sucesso!")
+        if not coordenadas and not campos_faltantes:
+            print("\nℹ️  Nenhuma feição alterada: nada a gravar.")
         else:
-            print("❌ ERRO ao salvar alterações:")
-            for error in layer.commitErrors():
-                print(f"   - {error}")
-            layer.rollBack()
-            return False
+            # A gravação reabre o arquivo (e pode restaurá-lo): liberar a camada de leitura
+            provedor = layer = None
+            features_processadas = gravar_coordenadas(caminho_shapefile, coordenadas)
+            if features_processadas is None:
+                return False
         
         # Resumo
         print("\n" + "="*70)
         print("📊 RESUMO DA OPERAÇÃO")
         print("="*70)
         print(f"✅ Feições processadas com sucesso: {features_processadas}")
+        if calculo['puladas'] > 0:
+            print(f"⏭️  Feições inalteradas (puladas): {calculo['puladas']}")
         if features_erro > 0:
             print(f"⚠️  Feições com erro: {features_erro}")
         print(f"📁 Arquivo atualizado: {caminho_shapefile}")
@@ -310,15 +669,22 @@ def main():
         if len(sys.argv) < 2:
             print("\n❌ ERRO: Caminho do shapefile não fornecido!")
             print("\nUso:")
-            print("   python extrair_coordenadas_standalone.py <caminho_shapefile>")
+            print("   python extrair_coordenadas_standalone.py <caminho_shapefile> [--incremental]")
             print("\nExemplo:")
             print('   python extrair_coordenadas_standalone.py "C:\\shapes\\rodovias.shp"')
             return 1
         
-        caminho_shapefile = sys.argv[1]
+        parser = argparse.ArgumentParser(
+            description='Extrai as coordenadas de início e fim das feições lineares'
+        )
+        parser.add_argument('shapefile', help='Caminho do shapefile')
+        parser.add_argument('--incremental', action='store_true',
+                           help=f'Recalcula apenas as feições com geometria alterada ({CAMPO_HASH}) '
+                                'ou com c_inicial/c_final vazios')
+        args = parser.parse_args()
         
         # Executar extração
-        sucesso = extrair_coordenadas_inicio_fim(caminho_shapefile)
+        sucesso = extrair_coordenadas_inicio_fim(args.shapefile, args.incremental)
         
         if sucesso:
             print("\n✅ Operação concluída com sucesso!")
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistema de Consulta de Coordenadas - Geração de Marcos Quilométricos
+Percorre os trechos de cada rodovia dos eixos (shape{zona}) e gera
+marcos a cada N metros, com rótulo km+metros ("057+100") e coordenadas
+em graus decimais, no formato de "CONVERSOR KMZ/MODELO KMZ - GD Google
+Earth.csv" (NOME;LATITUDE;LONGITUDE) ou em KML.
+
+A posição de cada marco vem da consulta inversa (consulta_inversa.py),
+com a mesma lógica de KM e orientação da consulta direta. A saída é
+gravada em fluxo, rodovia por rodovia e bloco por bloco, sem montar a
+lista completa em memória; as rodovias são distribuídas entre processos.
+
+Uso:
+    python gerar_marcos.py --saida marcos.csv
+    python gerar_marcos.py --rodovia BA-099 --espacamento 20 --saida ba099.kml
+    python gerar_marcos.py --saida marcos.kml --processos 8
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+import sys
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Tuple, Optional, Dict, Any, List, Iterator, Iterable
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+import consulta_standalone as cs
+import consulta_shapely as csh
+import snapshot_zona as sz
+import consulta_inversa as ci
+
+
+# ============================================
+# CONFIGURAÇÕES
+# ============================================
+
+# Distância padrão entre marcos (metros)
+ESPACAMENTO_PADRAO = 100
+
+# Marcos posicionados por vez (limita a memória usada em rodovias longas)
+TAMANHO_BLOCO_MARCOS = 10000
+
+
+# ============================================
+# GERAÇÃO DOS MARCOS
+# ============================================
+
+def rotulo_km(metros: int) -> str:
+    """Rótulo km+metros do marco, como nas planilhas de campo (ex: 57100 → "057+100")."""
+    return f"{metros // 1000:03d}+{metros % 1000:03d}"
+
+
+def listar_rodovias(zonas: Iterable[int] = tuple(cs.ZONA_EPSG)) -> List[str]:
+    """Chaves normalizadas de todas as rodovias das zonas, em ordem."""
+    rodovias = set()
+    for zona in zonas:
+        rodovias.update(ci.CACHE_INDICES.obter(zona).rodovias())
+    
+    return sorted(rodovias, key=lambda r: (len(r), r))
+
+
+def nome_rodovia(rodovia: Any) -> Any:
+    """Valor original do campo RODOVIA (primeira zona em que aparecer)."""
+    for zona in cs.ZONA_EPSG:
+        nome = ci.CACHE_INDICES.obter(zona).nome(rodovia)
+        if nome is not None:
+            return nome
+    
+    return rodovia
+
+
+def gerar_marcos_rodovia(rodovia: Any, espacamento: int = ESPACAMENTO_PADRAO,
+                         tamanho_bloco: int = TAMANHO_BLOCO_MARCOS
+                         ) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Gera os marcos de uma rodovia em blocos, em ordem crescente de KM.
+    
+    Os marcos ficam nos múltiplos de `espacamento` entre o menor e o maior
+    KM da rodovia; KMs que não pertencem a nenhum trecho (lacunas da
+    quilometragem) são omitidos. Cada KM é posicionado na primeira zona
+    que o contiver, como em consulta_inversa.localizar_km_lote.
+    
+    Args:
+        rodovia: Rodovia (qualquer grafia aceita por normalizar_rodovia)
+        espacamento: Distância entre marcos em metros
+        tamanho_bloco: Marcos posicionados por vez
+    
+    Yields:
+        Blocos com 'metros' (KM em metros), 'latitude', 'longitude' e 'zona'
+    """
+    indices = [ci.CACHE_INDICES.obter(zona) for zona in cs.ZONA_EPSG]
+    extensoes = [e for e in (indice.extensao(rodovia) for indice in indices) if e is not None]
+    if not extensoes:
+        return
+    
+    # Marcos em metros inteiros: evita acumular erro de ponto flutuante no rótulo
+    primeiro = int(np.ceil(min(e[0] for e in extensoes) * 1000 / espacamento))
+    ultimo = int(np.floor(max(e[1] for e in extensoes) * 1000 / espacamento))
+    
+    for inicio in range(primeiro, ultimo + 1, tamanho_bloco):
+        metros = np.arange(inicio, min(inicio + tamanho_bloco, ultimo + 1), dtype=np.int64) * espacamento
+        kms = metros / 1000
+        
+        latitudes = np.full(len(metros), np.nan)
+        longitudes = np.full(len(metros), np.nan)
+        zonas = np.zeros(len(metros), dtype=int)
+        pendentes = np.ones(len(metros), dtype=bool)
+        
+        for zona, indice in zip(cs.ZONA_EPSG, indices):
+            selecionados = np.flatnonzero(pendentes)
+            feicoes = indice.localizar(rodovia, kms[selecionados])
+            achados = selecionados[feicoes >= 0]
+            
+            if len(achados) == 0:
+                continue
+            
+            xs, ys = ci.posicionar_km(indice.dados, feicoes[feicoes >= 0], kms[achados])
+            latitudes[achados], longitudes[achados] = csh.converter_utm_para_gd_lote(xs, ys, zona)
+            zonas[achados] = zona
+            pendentes[achados] = False
+        
+        validos = ~pendentes & ~np.isnan(latitudes)
+        yield {
+            'metros': metros[validos],
+            'latitude': latitudes[validos],
+            'longitude': longitudes[validos],
+            'zona': zonas[validos]
+        }
+
+
+# ============================================
+# EXECUÇÃO PARALELA POR RODOVIA
+# ============================================
+
+def inicializar_trabalhador(zonas: Iterable[int]) -> None:
+    """Carrega os snapshots e os índices de KM no processo trabalhador (uma única vez)."""
+    for zona in zonas:
+        ci.CACHE_INDICES.obter(zona)
+
+
+def _gerar_rodovia(rodovia: str, espacamento: int) -> Tuple[str, Any, Dict[str, np.ndarray]]:
+    """Todos os marcos de uma rodovia no processo trabalhador, concatenados."""
+    blocos = list(gerar_marcos_rodovia(rodovia, espacamento))
+    nome = nome_rodovia(rodovia)
+    
+    if not blocos:
+        return rodovia, nome, {}
+    
+    return rodovia, nome, {campo: np.concatenate([b[campo] for b in blocos]) for campo in blocos[0]}
+
+
+def gerar_marcos(rodovias: List[str], espacamento: int = ESPACAMENTO_PADRAO,
+                 processos: int = 1) -> Iterator[Tuple[Any, Dict[str, np.ndarray]]]:
+    """
+    Gera os marcos de várias rodovias, na ordem pedida.
+    
+    Com mais de um processo, as rodovias são distribuídas entre os
+    trabalhadores e no máximo 2 × processos rodovias ficam em andamento
+    (ou aguardando gravação) ao mesmo tempo.
+    
+    Args:
+        rodovias: Rodovias a percorrer
+        espacamento: Distância entre marcos em metros
+        processos: Processos trabalhadores (1 = no próprio processo)
+    
+    Yields:
+        Tuplas (nome da rodovia, bloco de marcos)
+    """
+    if processos <= 1:
+        for rodovia in rodovias:
+            nome = nome_rodovia(rodovia)
+            for bloco in gerar_marcos_rodovia(rodovia, espacamento):
+                yield nome, bloco
+        return
+    
+    with ProcessPoolExecutor(max_workers=processos, initializer=inicializar_trabalhador,
+                             initargs=(list(cs.ZONA_EPSG),)) as pool:
+        pendentes = iter(rodovias)
+        em_andamento = []
+        
+        for rodovia in pendentes:
+            em_andamento.append(pool.submit(_gerar_rodovia, rodovia, espacamento))
+            if len(em_andamento) >= 2 * processos:
+                break
+        
+        while em_andamento:
+            _, nome, marcos = em_andamento.pop(0).result()
+            
+            proxima = next(pendentes, None)
+            if proxima is not None:
+                em_andamento.append(pool.submit(_gerar_rodovia, proxima, espacamento))
+            
+            if marcos:
+                yield nome, marcos
+
+
+# ============================================
+# GRAVAÇÃO (CSV / KML)
+# ============================================
+
+class EscritorCSV:
+    """Planilha no formato de MODELO KMZ - GD Google Earth.csv, acrescida de RODOVIA e ZONA."""
+    
+    def __init__(self, arquivo):
+        self._arquivo = arquivo
+        self._arquivo.write("NOME;LATITUDE;LONGITUDE;RODOVIA;ZONA\n")
+    
+    def escrever(self, rodovia: Any, marcos: Dict[str, np.ndarray]) -> None:
+        self._arquivo.writelines(
+            f"{rotulo_km(m)};{lat:.6f};{lon:.6f};{rodovia};{zona}\n"
+            for m, lat, lon, zona in zip(marcos['metros'].tolist(), marcos['latitude'].tolist(),
+                                         marcos['longitude'].tolist(), marcos['zona'].tolist())
+        )
+    
+    def fechar(self) -> None:
+        pass
+
+
+class EscritorKML:
+    """Documento KML com uma pasta por rodovia e um marcador por marco."""
+    
+    def __init__(self, arquivo, nome_documento: str):
+        self._arquivo = arquivo
+        self._pasta_atual = None
+        self._arquivo.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+            f'<Document>\n<name>{escape(nome_documento)}</name>\n'
+        )
+    
+    def escrever(self, rodovia: Any, marcos: Dict[str, np.ndarray]) -> None:
+        if rodovia != self._pasta_atual:
+            if self._pasta_atual is not None:
+                self._arquivo.write('</Folder>\n')
+            self._arquivo.write(f'<Folder>\n<name>{escape(str(rodovia))}</name>\n')
+            self._pasta_atual = rodovia
+        
+        self._arquivo.writelines(
+            f'<Placemark><name>{rotulo_km(m)}</name>'
+            f'<Point><coordinates>{lon:.6f},{lat:.6f},0</coordinates></Point></Placemark>\n'
+            for m, lat, lon in zip(marcos['metros'].tolist(), marcos['latitude'].tolist(),
+                                   marcos['longitude'].tolist())
+        )
+    
+    def fechar(self) -> None:
+        if self._pasta_atual is not None:
+            self._arquivo.write('</Folder>\n')
+        self._arquivo.write('</Document>\n</kml>\n')
+
+
+def exportar_marcos(caminho_saida: str, rodovias: Optional[List[str]] = None,
+                    espacamento: int = ESPACAMENTO_PADRAO,
+                    processos: int = 1) -> Dict[str, Any]:
+    """
+    Gera e grava os marcos quilométricos (CSV ou KML, pela extensão da saída).
+    
+    Args:
+        caminho_saida: Arquivo .csv ou .kml
+        rodovias: Rodovias a percorrer (padrão: todas as das zonas)
+        espacamento: Distância entre marcos em metros
+        processos: Processos trabalhadores
+    
+    Returns:
+        Estatísticas: 'rodovias', 'marcos', 'segundos', 'marcos_por_segundo', 'saida'
+    """
+    saida = Path(caminho_saida)
+    formato = saida.suffix.lower()
+    if formato not in ('.csv', '.kml'):
+        raise ValueError(f"Formato de saída não suportado: {saida.name} (use .csv ou .kml)")
+    
+    if processos > 1:
+        # Compila os snapshots desatualizados antes de iniciar os trabalhadores
+        for zona in cs.ZONA_EPSG:
+            sz.abrir_snapshot(zona)
+    
+    if rodovias is None:
+        rodovias = listar_rodovias()
+    else:
+        rodovias = [ci.normalizar_rodovia(r) for r in rodovias]
+    
+    inicio = time.monotonic()
+    marcos = 0
+    concluidas = set()
+    
+    with open(saida, 'w', encoding='utf-8-sig' if formato == '.csv' else 'utf-8', newline='') as arquivo:
+        escritor = EscritorCSV(arquivo) if formato == '.csv' else EscritorKML(arquivo, saida.stem)
+        
+        for nome, bloco in gerar_marcos(rodovias, espacamento, processos):
+            escritor.escrever(nome, bloco)
+            marcos += len(bloco['metros'])
+            
+            if nome not in concluidas:
+                concluidas.add(nome)
+                decorrido = time.monotonic() - inicio
+                print(f"   {nome}: {marcos} marcos até aqui ({marcos / decorrido:.0f} marcos/s)")
+        
+        escritor.fechar()
+    
+    segundos = time.monotonic() - inicio
+    
+    return {
+        'rodovias': len(concluidas),
+        'marcos': marcos,
+        'segundos': segundos,
+        'marcos_por_segundo': marcos / segundos if segundos > 0 else 0.0,
+        'saida': str(saida)
+    }
+
+
+# ============================================
+# MAIN - INTERFACE CLI
+# ============================================
+
+def main():
+    """Função principal - execução CLI."""
+    
+    parser = argparse.ArgumentParser(
+        description='Gera marcos quilométricos ao longo das rodovias (CSV/KML em GD)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos:
+  %(prog)s --saida marcos.csv
+  %(prog)s --rodovia BA-099 BA-001 --espacamento 20 --saida marcos.kml
+  %(prog)s --saida marcos.kml --processos 8
+        """
+    )
+    
+    parser.add_argument('--saida', '-o', required=True, metavar='ARQUIVO',
+                       help='Arquivo de saída (.csv ou .kml)')
+    parser.add_argument('--rodovia', '-r', nargs='+',
+                       help='Rodovias a percorrer (padrão: todas)')
+    parser.add_argument('--espacamento', '-e', type=int, default=ESPACAMENTO_PADRAO,
+                       help=f'Distância entre marcos em metros (padrão: {ESPACAMENTO_PADRAO})')
+    parser.add_argument('--processos', '-p', type=int, default=os.cpu_count() or 1,
+                       help='Processos trabalhadores (padrão: número de CPUs)')
+    
+    args = parser.parse_args()
+    
+    if args.espacamento <= 0:
+        parser.error('--espacamento deve ser positivo')
+    
+    print("=" * 76)
+    print("  GERAÇÃO DE MARCOS QUILOMÉTRICOS")
+    print("=" * 76)
+    print(f"\nEspaçamento: {args.espacamento} m")
+    print(f"Processos:   {args.processos}")
+    
+    try:
+        print("\n🔄 Gerando marcos...")
+        estatisticas = exportar_marcos(args.saida, args.rodovia, args.espacamento, args.processos)
+        
+        print(f"\n✅ {estatisticas['marcos']} marcos em {estatisticas['rodovias']} rodovias")
+        print(f"⏱️  {estatisticas['segundos']:.1f} s - "
+              f"{estatisticas['marcos_por_segundo']:.0f} marcos/s")
+        print(f"📁 Resultado: {estatisticas['saida']}")
+        exit_code = 0
+    
+    except Exception as e:
+        print(f"\n❌ ERRO CRÍTICO: {e}")
+        import traceback
+        traceback.print_exc()
+        exit_code = 2
+    
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
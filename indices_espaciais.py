@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índices espaciais usados pela consulta de coordenadas.
+
+Estruturas construídas uma única vez por zona (ver DadosZona em
+consulta_standalone.py) para evitar varreduras lineares a cada consulta.
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+from typing import Tuple, Optional, Dict, Any, List
+
+from qgis.core import (
+    QgsSpatialIndex,
+    QgsRectangle,
+    QgsPointXY,
+    QgsGeometry
+)
+
+import instrumentacao
+
+
+# Campos da FXD que não são repassados em fxd_info
+CAMPOS_IGNORADOS_FXD = ['FID', 'SHAPE_LENG', 'SHAPE_LEN', 'OBJECTID', 'SHAPE_AREA']
+
+
+# ============================================
+# ÍNDICE DOS EIXOS RODOVIÁRIOS
+# ============================================
+
+class IndiceEixos:
+    """
+    Índice R-tree (QgsSpatialIndex) sobre os retângulos envolventes dos eixos.
+    
+    Os identificadores do índice são as posições das feições na lista
+    recebida, de modo que os candidatos podem ser usados diretamente como
+    índices em todas_features.
+    """
+    
+    def __init__(self, features: List[Tuple[QgsGeometry, Dict[str, Any]]]):
+        self._indice = QgsSpatialIndex()
+        
+        for i, (geom, _) in enumerate(features):
+            self._indice.addFeature(i, geom.boundingBox())
+    
+    def candidatos(self, ponto: QgsPointXY, raio: float) -> List[int]:
+        """
+        Retorna as feições cujo retângulo envolvente está a até `raio` do ponto.
+        
+        Args:
+            ponto: Ponto de consulta
+            raio: Raio de busca em metros
+        
+        Returns:
+            Índices das feições candidatas, em ordem crescente
+        """
+        retangulo = QgsRectangle(ponto.x() - raio, ponto.y() - raio,
+                                 ponto.x() + raio, ponto.y() + raio)
+        return sorted(self._indice.intersects(retangulo))
+    
+    def mais_proximos(self, ponto: QgsPointXY, quantidade: int = 5) -> List[int]:
+        """
+        Retorna as feições com retângulo envolvente mais próximo do ponto.
+        
+        Args:
+            ponto: Ponto de consulta
+            quantidade: Número de vizinhos desejados
+        
+        Returns:
+            Índices das feições mais próximas (pela distância ao retângulo)
+        """
+        return sorted(self._indice.nearestNeighbor(ponto, quantidade))
+
+
+# ============================================
+# PERTINÊNCIA À FAIXA DE DOMÍNIO (FXD)
+# ============================================
+
+class MotorFXD:
+    """
+    Teste ponto-em-polígono para a FXD com índice R-tree e geometrias preparadas.
+    
+    O índice seleciona apenas os polígonos cujo retângulo envolvente contém
+    o ponto; para esses, o teste exato usa um QgsGeometryEngine preparado
+    (criado na primeira vez que o polígono é candidato e reaproveitado).
+    """
+    
+    def __init__(self, features: List[Tuple[QgsGeometry, Dict[str, Any]]]):
+        self._features = features
+        self._preparadas: Dict[int, Any] = {}
+        self._indice = QgsSpatialIndex()
+        
+        for i, (geom, _) in enumerate(features):
+            self._indice.addFeature(i, geom.boundingBox())
+    
+    def _motor_preparado(self, idx: int):
+        """Retorna (criando na primeira vez) o motor GEOS preparado do polígono."""
+        motor = self._preparadas.get(idx)
+        
+        if motor is None:
+            geom = self._features[idx][0]
+            motor = QgsGeometry.createGeometryEngine(geom.constGet())
+            motor.prepareGeometry()
+            self._preparadas[idx] = motor
+        
+        return motor
+    
+    def localizar(self, ponto: QgsPointXY,
+                  metricas=instrumentacao.DESATIVADAS) -> Optional[Dict[str, Any]]:
+        """
+        Localiza o polígono da FXD que contém o ponto.
+        
+        Args:
+            ponto: Ponto de consulta
+            metricas: Métricas da consulta (ver instrumentacao.py)
+        
+        Returns:
+            Atributos do polígono (fxd_info) ou None se o ponto estiver fora da FXD
+        """
+        ponto_geom = QgsGeometry.fromPointXY(ponto)
+        retangulo = QgsRectangle(ponto.x(), ponto.y(), ponto.x(), ponto.y())
+        encontrado = None
+        testados = 0
+        
+        # Ordem crescente preserva a prioridade da varredura original
+        for idx in sorted(self._indice.intersects(retangulo)):
+            testados += 1
+            
+            # intersects cobre também pontos sobre a borda do polígono
+            if self._motor_preparado(idx).intersects(ponto_geom.constGet()):
+                encontrado = idx
+                break
+        
+        metricas.contar('feicoes_varridas', testados)
+        metricas.contar('operacoes_geometricas', testados)
+        
+        if encontrado is None:
+            return None
+        
+        atributos = self._features[encontrado][1]
+        return {
+            field: valor for field, valor in atributos.items()
+            if field.upper() not in CAMPOS_IGNORADOS_FXD
+        }
+
+
+# ============================================
+# RESOLVEDOR DE MUNICÍPIOS (GRADE HIERÁRQUICA)
+# ============================================
+
+# Lado (m) das células da grade de nível zero
+TAMANHO_CELULA_RAIZ = 64000.0
+
+# Lado mínimo (m) das células; abaixo disso a célula de borda não é mais dividida
+TAMANHO_CELULA_MINIMO = 1000.0
+
+# Classificação das células da grade
+CELULA_VAZIA = 0      # nenhum município toca a célula
+CELULA_INTERNA = 1    # célula inteiramente dentro de um único município
+CELULA_BORDA = 2      # célula cortada por limites municipais
+
+
+class _Celula:
+    """Célula da grade hierárquica (quadtree) de municípios."""
+    
+    __slots__ = ('tipo', 'municipio', 'candidatos', 'filhos')
+    
+    def __init__(self, tipo: int, municipio: Optional[int] = None,
+                 candidatos: Optional[List[int]] = None):
+        self.tipo = tipo
+        self.municipio = municipio
+        self.candidatos = candidatos or []
+        self.filhos: Optional[List[Optional['_Celula']]] = None
+
+
+class ResolvedorMunicipios:
+    """
+    Resolve o município de um ponto sem varrer todos os polígonos.
+    
+    Usa uma grade hierárquica (quadtree) sobre os municípios: células
+    inteiramente dentro de um município respondem diretamente, sem tocar
+    nos vértices dos polígonos; apenas células de borda no nível mínimo
+    recorrem ao teste exato com geometria preparada. As células são
+    classificadas na primeira vez que uma consulta passa por elas e ficam
+    memorizadas para as consultas seguintes.
+    """
+    
+    def __init__(self, features: List[Tuple[QgsGeometry, Dict[str, Any]]],
+                 tamanho_raiz: float = TAMANHO_CELULA_RAIZ,
+                 tamanho_minimo: float = TAMANHO_CELULA_MINIMO):
+        self._features = features
+        self._tamanho_raiz = tamanho_raiz
+        self._tamanho_minimo = tamanho_minimo
+        self._preparadas: Dict[int, Any] = {}
+        self._raiz: Dict[Tuple[int, int], _Celula] = {}
+        self._indice = QgsSpatialIndex()
+        
+        for i, (geom, _) in enumerate(features):
+            self._indice.addFeature(i, geom.boundingBox())
+    
+    def _motor_preparado(self, idx: int):
+        """Retorna (criando na primeira vez) o motor GEOS preparado do município."""
+        motor = self._preparadas.get(idx)
+        
+        if motor is None:
+            geom = self._features[idx][0]
+            motor = QgsGeometry.createGeometryEngine(geom.constGet())
+            motor.prepareGeometry()
+            self._preparadas[idx] = motor
+        
+        return motor
+    
+    def _classificar(self, retangulo: QgsRectangle, candidatos: List[int],
+                     metricas=instrumentacao.DESATIVADAS) -> _Celula:
+        """
+        Classifica uma célula a partir dos municípios candidatos da célula-mãe.
+        
+        Args:
+            retangulo: Extensão da célula
+            candidatos: Municípios que tocam a célula-mãe (em ordem crescente)
+            metricas: Métricas da consulta que provocou a classificação
+        
+        Returns:
+            Célula classificada
+        """
+        celula_geom = QgsGeometry.fromRect(retangulo)
+        tocam = []
+        
+        for idx in candidatos:
+            if not self._features[idx][0].boundingBox().intersects(retangulo):
+                continue
+            
+            motor = self._motor_preparado(idx)
+            metricas.contar('feicoes_varridas')
+            metricas.contar('operacoes_geometricas', 2)
+            
+            if motor.contains(celula_geom.constGet()):
+                return _Celula(CELULA_INTERNA, municipio=idx)
+            
+            if motor.intersects(celula_geom.constGet()):
+                tocam.append(idx)
+        
+        if not tocam:
+            return _Celula(CELULA_VAZIA)
+        
+        return _Celula(CELULA_BORDA, candidatos=tocam)
+    
+    def localizar(self, ponto: QgsPointXY,
+                  metricas=instrumentacao.DESATIVADAS) -> Optional[int]:
+        """
+        Localiza o município que contém o ponto.
+        
+        Args:
+            ponto: Ponto de consulta
+            metricas: Métricas da consulta (ver instrumentacao.py)
+        
+        Returns:
+            Índice do município na lista de feições ou None
+        """
+        tamanho = self._tamanho_raiz
+        chave = (int(ponto.x() // tamanho), int(ponto.y() // tamanho))
+        x0, y0 = chave[0] * tamanho, chave[1] * tamanho
+        
+        celula = self._raiz.get(chave)
+        if celula is None:
+            retangulo = QgsRectangle(x0, y0, x0 + tamanho, y0 + tamanho)
+            candidatos = sorted(self._indice.intersects(retangulo))
+            celula = self._classificar(retangulo, candidatos, metricas)
+            self._raiz[chave] = celula
+        
+        # Desce pela quadtree enquanto a célula for de borda
+        while celula.tipo == CELULA_BORDA and tamanho / 2 >= self._tamanho_minimo:
+            tamanho /= 2
+            col = 1 if ponto.x() >= x0 + tamanho else 0
+            lin = 1 if ponto.y() >= y0 + tamanho else 0
+            x0 += col * tamanho
+            y0 += lin * tamanho
+            
+            if celula.filhos is None:
+                celula.filhos = [None, None, None, None]
+            
+            filho = celula.filhos[lin * 2 + col]
+            if filho is None:
+                retangulo = QgsRectangle(x0, y0, x0 + tamanho, y0 + tamanho)
+                filho = self._classificar(retangulo, celula.candidatos, metricas)
+                celula.filhos[lin * 2 + col] = filho
+            
+            celula = filho
+        
+        if celula.tipo == CELULA_INTERNA:
+            return celula.municipio
+        
+        if celula.tipo == CELULA_VAZIA:
+            return None
+        
+        # Célula de borda no nível mínimo: teste exato com geometria preparada
+        ponto_geom = QgsGeometry.fromPointXY(ponto)
+        for testados, idx in enumerate(celula.candidatos, 1):
+            if self._motor_preparado(idx).contains(ponto_geom.constGet()):
+                metricas.contar('feicoes_varridas', testados)
+                metricas.contar('operacoes_geometricas', testados)
+                return idx
+        
+        metricas.contar('feicoes_varridas', len(celula.candidatos))
+        metricas.contar('operacoes_geometricas', len(celula.candidatos))
+        return None
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentação opcional das etapas da consulta de coordenadas.
+
+Quando ativada, cada consulta mede com relógio monotônico (perf_counter)
+o tempo de cada etapa (conversão GD → UTM, carga da zona, FXD, município,
+busca dos eixos, cálculo do KM, montagem do resultado) e conta as feições
+varridas, os candidatos dentro do raio de busca e as operações
+geométricas exatas.
+As métricas vão em resultado['metricas'] e podem ser somadas para um
+lote inteiro com agregar().
+
+Desativada (padrão), as funções instrumentadas recebem DESATIVADAS, um
+objeto cujos métodos não fazem nada: o custo é uma chamada vazia por
+etapa, sem leitura de relógio nem alocação.
+
+Ativação:
+    SIT_METRICAS=1 python consulta_standalone.py --x 510807 --y 8649627 --zona 24
+    python consulta_standalone.py --x 510807 --y 8649627 --zona 24 --metricas
+    instrumentacao.ativar()  # em código
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, Iterable, Union
+
+
+# ============================================
+# CONFIGURAÇÕES
+# ============================================
+
+# Variável de ambiente que ativa a instrumentação ao importar o módulo
+VARIAVEL_AMBIENTE = "SIT_METRICAS"
+
+ATIVA = os.environ.get(VARIAVEL_AMBIENTE, "").strip() not in ("", "0")
+
+# Etapas da consulta, na ordem de execução (usada na exibição)
+ETAPAS = ['conversao', 'carga_zona', 'fxd', 'municipio', 'busca_eixos', 'busca_aneis', 'calculo_km', 'montagem']
+
+# Contadores registrados pelas etapas
+CONTADORES = ['feicoes_varridas', 'candidatos_no_raio', 'operacoes_geometricas', 'aneis']
+
+
+def ativar(ativa: bool = True) -> None:
+    """
+    Liga ou desliga a instrumentação para as próximas consultas do processo.
+    
+    Args:
+        ativa: True para medir, False para voltar ao modo sem custo
+    """
+    global ATIVA
+    ATIVA = ativa
+
+
+# ============================================
+# MÉTRICAS DE UMA CONSULTA
+# ============================================
+
+class _Etapa:
+    """Bloco `with` que soma o tempo decorrido à etapa."""
+    
+    __slots__ = ('_metricas', '_nome', '_inicio')
+    
+    def __init__(self, metricas: 'Metricas', nome: str):
+        self._metricas = metricas
+        self._nome = nome
+    
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        tempos = self._metricas.tempos
+        tempos[self._nome] = tempos.get(self._nome, 0.0) + time.perf_counter() - self._inicio
+
+
+class Metricas:
+    """
+    Tempos (s) por etapa e contadores de uma consulta ou de um lote.
+    
+    Uso:
+        with metricas.etapa('fxd'):
+            ...
+        metricas.contar('feicoes_varridas', len(candidatos))
+    """
+    
+    __slots__ = ('tempos', 'contadores', '_inicio')
+    
+    def __init__(self):
+        self.tempos: Dict[str, float] = {}
+        self.contadores: Dict[str, int] = {}
+        self._inicio = time.perf_counter()
+    
+    def __bool__(self) -> bool:
+        return True
+    
+    def etapa(self, nome: str) -> _Etapa:
+        """Bloco `with` cujo tempo é somado à etapa `nome`."""
+        return _Etapa(self, nome)
+    
+    def contar(self, nome: str, quantidade: int = 1) -> None:
+        """Soma `quantidade` ao contador `nome`."""
+        self.contadores[nome] = self.contadores.get(nome, 0) + int(quantidade)
+    
+    def incorporar(self, outras: Optional[Dict[str, Any]], prefixo: str = "") -> None:
+        """
+        Soma métricas já exportadas (como_dict) a estas.
+        
+        Args:
+            outras: Métricas exportadas (None é ignorado)
+            prefixo: Prefixo dos nomes das etapas incorporadas (p.ex. 'carga.')
+        """
+        if not outras:
+            return
+        
+        for nome, ms in outras['tempos_ms'].items():
+            chave = prefixo + nome
+            self.tempos[chave] = self.tempos.get(chave, 0.0) + ms / 1000.0
+        
+        for nome, quantidade in outras['contadores'].items():
+            self.contar(nome, quantidade)
+    
+    def como_dict(self) -> Dict[str, Any]:
+        """
+        Exporta as métricas para o resultado.
+        
+        Returns:
+            Dicionário com 'total_ms' (desde a criação), 'tempos_ms' por etapa
+            e 'contadores'
+        """
+        return {
+            'total_ms': (time.perf_counter() - self._inicio) * 1000.0,
+            'tempos_ms': {nome: segundos * 1000.0 for nome, segundos in self.tempos.items()},
+            'contadores': dict(self.contadores)
+        }
+
+
+class _EtapaNula:
+    """Bloco `with` vazio."""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return None
+
+
+class _MetricasDesativadas:
+    """Mesma interface de Metricas, sem efeito algum (instrumentação desligada)."""
+    
+    __slots__ = ()
+    
+    def __bool__(self) -> bool:
+        return False
+    
+    def etapa(self, nome: str) -> _EtapaNula:
+        return _ETAPA_NULA
+    
+    def contar(self, nome: str, quantidade: int = 1) -> None:
+        pass
+    
+    def incorporar(self, outras: Optional[Dict[str, Any]], prefixo: str = "") -> None:
+        pass
+    
+    def como_dict(self) -> None:
+        return None
+
+
+_ETAPA_NULA = _EtapaNula()
+
+# Valor padrão do parâmetro `metricas` das funções instrumentadas
+DESATIVADAS = _MetricasDesativadas()
+
+
+def iniciar() -> Union[Metricas, _MetricasDesativadas]:
+    """
+    Métricas para uma nova consulta (ou lote).
+    
+    Returns:
+        Metricas se a instrumentação estiver ativa, senão DESATIVADAS
+    """
+    return Metricas() if ATIVA else DESATIVADAS
+
+
+# ============================================
+# PUBLICAÇÃO DAS MÉTRICAS
+# ============================================
+
+# Últimas métricas publicadas em cada thread
+_ULTIMAS = threading.local()
+
+
+def publicar(metricas: Union[Metricas, _MetricasDesativadas],
+             resultado: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Exporta as métricas da consulta e as anexa ao resultado.
+    
+    As métricas ficam também disponíveis em ultimas(), o que cobre as
+    consultas sem resultado (None) e os lotes, cujo resultado é colunar.
+    
+    Args:
+        metricas: Métricas da consulta
+        resultado: Dicionário de resultado (recebe a chave 'metricas')
+    
+    Returns:
+        O próprio resultado
+    """
+    if not metricas:
+        return resultado
+    
+    exportadas = metricas.como_dict()
+    _ULTIMAS.metricas = exportadas
+    
+    if resultado is not None:
+        resultado['metricas'] = exportadas
+    
+    return resultado
+
+
+def ultimas(descartar: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Métricas da última consulta (ou lote) instrumentada desta thread.
+    
+    Args:
+        descartar: Esquece as métricas após devolvê-las, de modo que a próxima
+            chamada só devolve métricas publicadas depois desta
+    
+    Returns:
+        Métricas exportadas ou None
+    """
+    metricas = getattr(_ULTIMAS, 'metricas', None)
+    if descartar:
+        _ULTIMAS.metricas = None
+    return metricas
+
+
+# ============================================
+# AGREGAÇÃO
+# ============================================
+
+def agregar(itens: Iterable[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Soma as métricas de várias consultas.
+    
+    Args:
+        itens: Resultados de consulta (com a chave 'metricas') ou métricas
+            exportadas; None e resultados sem métricas são ignorados
+    
+    Returns:
+        Dicionário com 'consultas' (itens com métricas), 'total_ms',
+        'tempos_ms' por etapa com 'total', 'medio' e 'maximo', e a soma
+        dos 'contadores'
+    """
+    consultas = 0
+    total_ms = 0.0
+    tempos: Dict[str, Dict[str, float]] = {}
+    contadores: Dict[str, int] = {}
+    
+    for item in itens:
+        if not item:
+            continue
+        
+        metricas = item.get('metricas', item)
+        if not metricas or 'tempos_ms' not in metricas:
+            continue
+        
+        consultas += 1
+        total_ms += metricas['total_ms']
+        
+        for nome, ms in metricas['tempos_ms'].items():
+            etapa = tempos.setdefault(nome, {'total': 0.0, 'maximo': 0.0})
+            etapa['total'] += ms
+            etapa['maximo'] = max(etapa['maximo'], ms)
+        
+        for nome, quantidade in metricas['contadores'].items():
+            contadores[nome] = contadores.get(nome, 0) + quantidade
+    
+    for etapa in tempos.values():
+        etapa['medio'] = etapa['total'] / consultas
+    
+    return {
+        'consultas': consultas,
+        'total_ms': total_ms,
+        'tempos_ms': tempos,
+        'contadores': contadores
+    }
+
+
+def _ordem_etapa(nome: str) -> tuple:
+    """Chave de ordenação (estável): etapas na ordem de execução, detalhes da carga após carga_zona."""
+    base = 'carga_zona' if nome.startswith('carga.') else nome
+    return (ETAPAS.index(base) if base in ETAPAS else len(ETAPAS), base != nome)
+
+
+def exibir_metricas(metricas: Optional[Dict[str, Any]]) -> None:
+    """
+    Exibe as métricas de uma consulta (como_dict) ou de um lote (agregar).
+    
+    Args:
+        metricas: Métricas exportadas ou agregadas
+    """
+    if not metricas:
+        return
+    
+    print("\n⏱️  MÉTRICAS")
+    print("-" * 76)
+    
+    if 'consultas' in metricas:
+        print(f"   Consultas: {metricas['consultas']}  |  total {metricas['total_ms']:.2f} ms")
+    else:
+        print(f"   Total: {metricas['total_ms']:.3f} ms")
+    
+    for nome in sorted(metricas['tempos_ms'], key=_ordem_etapa):
+        valor = metricas['tempos_ms'][nome]
+        if isinstance(valor, dict):
+            print(f"   {nome:<24} total {valor['total']:9.2f} ms | "
+                  f"médio {valor['medio']:7.3f} ms | máx {valor['maximo']:7.3f} ms")
+        else:
+            print(f"   {nome:<24} {valor:9.3f} ms")
+    
+    for nome, quantidade in sorted(metricas['contadores'].items()):
+        print(f"   {nome:<24} {quantidade}")
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Referência linear vetorizada sobre os eixos rodoviários.
+
+Projeta pontos nos eixos usando apenas arrays NumPy: vértices de todas
+as feições em um único array, offsets das partes e das feições e o
+comprimento acumulado (estaqueamento) em cada vértice. Os segmentos de
+todas as partes das feições candidatas são avaliados juntos, para um
+ponto ou para um lote inteiro de pares (ponto, feição), em blocos de
+tamanho limitado.
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+from typing import Optional, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+# Segmentos avaliados de uma vez na projeção (limita a memória dos temporários)
+SEGMENTOS_POR_BLOCO = 1000000
+
+# Segmentos consecutivos por grupo no filtro por retângulo envolvente
+SEGMENTOS_POR_GRUPO = 32
+
+# Abaixo deste total de segmentos a projeção não usa o filtro (custa mais do que poupa)
+SEGMENTOS_FILTRO_MINIMO = 2048
+
+
+# ============================================
+# BLOCOS E GRUPOS DE SEGMENTOS
+# ============================================
+
+def limites_blocos(quantidade: np.ndarray, maximo: int) -> List[int]:
+    """
+    Agrupa itens consecutivos em blocos de até `maximo` segmentos.
+    
+    Um item nunca é dividido: um item com mais segmentos que o máximo forma
+    um bloco sozinho.
+    
+    Args:
+        quantidade: Número de segmentos de cada item
+        maximo: Segmentos por bloco
+    
+    Returns:
+        Limites dos blocos em índices de itens: o bloco k vai de
+        limites[k] a limites[k + 1]
+    """
+    n = len(quantidade)
+    limites = [0]
+    
+    if quantidade.sum() <= maximo:
+        limites.append(n)
+        return limites
+    
+    acumulado = np.cumsum(quantidade)
+    while limites[-1] < n:
+        antes = int(acumulado[limites[-1] - 1]) if limites[-1] else 0
+        fim = int(np.searchsorted(acumulado, antes + maximo, side='right'))
+        limites.append(max(fim, limites[-1] + 1))
+    
+    return limites
+
+
+def expandir_intervalos(primeiro: np.ndarray, quantidade: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Expande intervalos [primeiro, primeiro + quantidade) em seus elementos.
+    
+    Args:
+        primeiro: Primeiro elemento de cada intervalo
+        quantidade: Número de elementos de cada intervalo
+    
+    Returns:
+        Tupla (intervalo, elemento): para cada elemento, o índice do
+        intervalo de origem e o próprio elemento, na ordem dos intervalos
+    """
+    intervalo = np.repeat(np.arange(len(quantidade)), quantidade)
+    elemento = np.arange(len(intervalo)) + np.repeat(primeiro - (np.cumsum(quantidade) - quantidade), quantidade)
+    return intervalo, elemento
+
+
+def caixas_grupos(coords: np.ndarray, tamanho: int = SEGMENTOS_POR_GRUPO) -> np.ndarray:
+    """
+    Retângulo envolvente de cada grupo de `tamanho` segmentos consecutivos.
+    
+    O grupo g cobre os segmentos g * tamanho até (g + 1) * tamanho - 1 do
+    array de vértices inteiro, sem respeitar limites de partes ou feições:
+    o retângulo pode ser maior que o necessário, nunca menor.
+    
+    Args:
+        coords: Vértices, V x 2
+        tamanho: Segmentos por grupo
+    
+    Returns:
+        Array G x 4 (xmin, ymin, xmax, ymax)
+    """
+    if len(coords) < 2:
+        return np.empty((0, 4))
+    
+    inicios = np.arange(0, len(coords) - 1, tamanho)
+    fins = np.minimum(inicios + tamanho, len(coords) - 1)
+    
+    caixas = np.empty((len(inicios), 4))
+    for eixo in (0, 1):
+        valores = coords[:, eixo]
+        caixas[:, eixo] = np.minimum(np.minimum.reduceat(valores, inicios), valores[fins])
+        caixas[:, eixo + 2] = np.maximum(np.maximum.reduceat(valores, inicios), valores[fins])
+    
+    return caixas
+
+
+def trechos_na_janela(caixas: np.ndarray, primeiro: np.ndarray, quantidade: np.ndarray,
+                      janelas: np.ndarray,
+                      tamanho: int = SEGMENTOS_POR_GRUPO) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Trechos de segmentos de cada par cujo grupo toca a janela do par.
+    
+    Descarta os grupos (ver caixas_grupos) cujo retângulo não toca a
+    janela: nenhum segmento desses grupos tem ponto dentro dela.
+    
+    Args:
+        caixas: Retângulos dos grupos (caixas_grupos)
+        primeiro: Primeiro segmento de cada par
+        quantidade: Número de segmentos de cada par
+        janelas: Janela de cada par, N x 4 (xmin, ymin, xmax, ymax)
+        tamanho: Segmentos por grupo usado em `caixas`
+    
+    Returns:
+        Tupla (par, primeiro, quantidade) dos trechos restantes, ordenados
+        por par e, dentro do par, pela ordem dos segmentos
+    """
+    g0 = primeiro // tamanho
+    n_grupos = np.where(quantidade > 0, (primeiro + quantidade - 1) // tamanho - g0 + 1, 0)
+    
+    pares: List[np.ndarray] = []
+    grupos: List[np.ndarray] = []
+    
+    limites = limites_blocos(n_grupos, SEGMENTOS_POR_BLOCO)
+    for inicio, fim in zip(limites[:-1], limites[1:]):
+        par, grupo = expandir_intervalos(g0[inicio:fim], n_grupos[inicio:fim])
+        par += inicio
+        
+        c = caixas[grupo]
+        j = janelas[par]
+        toca = np.flatnonzero((c[:, 0] <= j[:, 2]) & (c[:, 2] >= j[:, 0]) &
+                              (c[:, 1] <= j[:, 3]) & (c[:, 3] >= j[:, 1]))
+        pares.append(par[toca])
+        grupos.append(grupo[toca])
+    
+    par = np.concatenate(pares) if pares else np.empty(0, dtype=np.int64)
+    grupo = np.concatenate(grupos) if grupos else np.empty(0, dtype=np.int64)
+    
+    inicio_trecho = np.maximum(grupo * tamanho, primeiro[par])
+    fim_trecho = np.minimum((grupo + 1) * tamanho, primeiro[par] + quantidade[par])
+    return par, inicio_trecho, fim_trecho - inicio_trecho
+
+
+# ============================================
+# ESTAQUEAMENTO
+# ============================================
+
+def calcular_acumulado(coords: np.ndarray, partes: np.ndarray, feicoes: np.ndarray) -> np.ndarray:
+    """
+    Calcula o comprimento acumulado em cada vértice, reiniciando a cada feição.
+    
+    As partes de uma feição multiparte se somam em sequência: o primeiro
+    vértice de uma parte tem o acumulado do último vértice da parte anterior.
+    
+    Args:
+        coords: Vértices, V x 2
+        partes: Offsets das partes em `coords` (P + 1)
+        feicoes: Offsets das feições em `partes` (F + 1)
+    
+    Returns:
+        Array com V distâncias ao longo da feição
+    """
+    segmentos = np.hypot(np.diff(coords[:, 0]), np.diff(coords[:, 1]))
+    
+    # O "segmento" que liga o fim de uma parte ao início da seguinte não conta
+    segmentos[partes[1:-1] - 1] = 0.0
+    
+    acumulado = np.concatenate([[0.0], np.cumsum(segmentos)])[:len(coords)]
+    primeiro_vertice = partes[feicoes]
+    acumulado -= np.repeat(acumulado[primeiro_vertice[:-1]], np.diff(primeiro_vertice))
+    
+    return acumulado
+
+
+# ============================================
+# REDE LINEAR
+# ============================================
+
+class RedeLinear:
+    """
+    Conjunto de linhas (simples ou multiparte) em arrays planos.
+    
+    Os arrays podem ser visões somente leitura (p.ex. do snapshot mapeado
+    em memória): nada é copiado na construção.
+    """
+    
+    def __init__(self, coords: np.ndarray, partes: np.ndarray, feicoes: np.ndarray,
+                 acumulado: Optional[np.ndarray] = None):
+        self.coords = coords
+        self.partes = partes
+        self.feicoes = feicoes
+        self.acumulado = calcular_acumulado(coords, partes, feicoes) if acumulado is None else acumulado
+        self._caixas_grupos: Optional[np.ndarray] = None
+    
+    @classmethod
+    def de_partes(cls, feicoes_partes: Sequence[Sequence[Sequence[Sequence[float]]]]) -> 'RedeLinear':
+        """
+        Monta a rede a partir de listas de vértices.
+        
+        Args:
+            feicoes_partes: Por feição, a lista de partes; cada parte é uma
+                sequência de vértices (x, y), p.ex. asMultiPolyline() do QGIS
+                convertido para tuplas
+        
+        Returns:
+            Rede linear com o estaqueamento calculado
+        """
+        vertices: List[np.ndarray] = []
+        partes = [0]
+        feicoes = [0]
+        
+        for feicao in feicoes_partes:
+            for parte in feicao:
+                xy = np.asarray(parte, dtype=np.float64).reshape(-1, 2)
+                vertices.append(xy)
+                partes.append(partes[-1] + len(xy))
+            feicoes.append(len(partes) - 1)
+        
+        coords = np.concatenate(vertices) if vertices else np.empty((0, 2))
+        return cls(coords, np.array(partes, dtype=np.int64), np.array(feicoes, dtype=np.int64))
+    
+    def __len__(self) -> int:
+        return len(self.feicoes) - 1
+    
+    def comprimentos(self, feicoes: np.ndarray) -> np.ndarray:
+        """Comprimento total de cada feição pedida."""
+        feicoes = np.asarray(feicoes, dtype=np.int64)
+        ultimo_vertice = self.partes[self.feicoes[feicoes + 1]] - 1
+        
+        comprimentos = np.zeros(len(feicoes))
+        tem_vertices = ultimo_vertice >= self.partes[self.feicoes[feicoes]]
+        comprimentos[tem_vertices] = self.acumulado[ultimo_vertice[tem_vertices]]
+        return comprimentos
+    
+    @property
+    def caixas_grupos(self) -> np.ndarray:
+        """Retângulos dos grupos de segmentos (ver caixas_grupos), calculados no primeiro uso."""
+        if self._caixas_grupos is None:
+            self._caixas_grupos = caixas_grupos(self.coords)
+        return self._caixas_grupos
+    
+    def projetar(self, feicoes, xs, ys,
+                 distancia_maxima: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """
+        Projeta cada ponto na feição correspondente (pares ponto i -> feição i).
+        
+        Os segmentos dos pares são avaliados em blocos de até
+        SEGMENTOS_POR_BLOCO; a menor distância de cada par sai de uma
+        redução sobre os seus segmentos (contíguos e em ordem). Em caso de
+        empate vale o primeiro segmento da feição, como na projeção do GEOS
+        (lineLocatePoint).
+        
+        Com `distancia_maxima`, os segmentos cujo retângulo envolvente fica
+        a mais que isso do ponto são descartados antes da projeção, primeiro
+        por grupos de segmentos e depois um a um: a distância continua exata
+        para os pares até o limite, mas acima dele é só um limite superior
+        (inf se nenhum segmento ficar perto). Com poucos segmentos (menos de
+        SEGMENTOS_FILTRO_MINIMO) todos são projetados.
+        
+        Args:
+            feicoes: Índice da feição de cada par
+            xs: Coordenada X do ponto de cada par
+            ys: Coordenada Y do ponto de cada par
+            distancia_maxima: Distância a partir da qual a projeção não
+                precisa ser exata (padrão: sem limite)
+        
+        Returns:
+            Dicionário de arrays (um valor por par):
+                'distancia': distância do ponto à feição (inf se a feição não tiver segmentos)
+                'ao_longo': estaqueamento do ponto projetado (distância ao longo da feição)
+                'comprimento': comprimento total da feição
+                'x', 'y': ponto projetado
+        """
+        feicoes = np.asarray(feicoes, dtype=np.int64)
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        n = len(feicoes)
+        
+        resultado = {
+            'distancia': np.full(n, np.inf),
+            'ao_longo': np.zeros(n),
+            'comprimento': self.comprimentos(feicoes),
+            'x': np.full(n, np.nan),
+            'y': np.full(n, np.nan)
+        }
+        
+        # Segmentos de cada par: do primeiro vértice da feição até o penúltimo
+        v0 = self.partes[self.feicoes[feicoes]]
+        quantidade = np.maximum(self.partes[self.feicoes[feicoes + 1]] - v0 - 1, 0)
+        
+        if distancia_maxima is None or quantidade.sum() < SEGMENTOS_FILTRO_MINIMO:
+            par, primeiro = np.arange(n), v0
+            distancia_maxima = None
+        else:
+            janelas = np.column_stack([xs - distancia_maxima, ys - distancia_maxima,
+                                       xs + distancia_maxima, ys + distancia_maxima])
+            par, primeiro, quantidade = trechos_na_janela(self.caixas_grupos, v0, quantidade, janelas)
+        
+        limites = limites_blocos(quantidade, SEGMENTOS_POR_BLOCO)
+        for inicio, fim in zip(limites[:-1], limites[1:]):
+            self._projetar_bloco(par[inicio:fim], primeiro[inicio:fim], quantidade[inicio:fim],
+                                 xs, ys, distancia_maxima, resultado)
+        
+        # Feições só com segmentos inválidos (partes de um vértice) ficam sem projeção
+        sem_projecao = np.isinf(resultado['distancia'])
+        resultado['ao_longo'][sem_projecao] = 0.0
+        resultado['x'][sem_projecao] = np.nan
+        resultado['y'][sem_projecao] = np.nan
+        
+        return resultado
+    
+    def _projetar_bloco(self, par: np.ndarray, primeiro: np.ndarray, quantidade: np.ndarray,
+                        xs: np.ndarray, ys: np.ndarray, distancia_maxima: Optional[float],
+                        resultado: Dict[str, np.ndarray]) -> None:
+        """
+        Projeta um bloco de trechos (par, primeiro segmento, quantidade), ver projetar.
+        
+        Um par pode ter trechos em mais de um bloco: o resultado só é
+        substituído por uma distância estritamente menor, o que mantém o
+        desempate pelo primeiro segmento (os blocos seguem a ordem dos
+        segmentos).
+        """
+        trecho, segmento = expandir_intervalos(primeiro, quantidade)
+        par = par[trecho]
+        
+        if distancia_maxima is not None:
+            # Só os segmentos cujo retângulo (ampliado pelo limite) contém o ponto
+            x0 = self.coords[segmento, 0]
+            x1 = self.coords[segmento + 1, 0]
+            px = xs[par]
+            perto = (px >= np.minimum(x0, x1) - distancia_maxima) & (px <= np.maximum(x0, x1) + distancia_maxima)
+            par, segmento = par[perto], segmento[perto]
+            
+            y0 = self.coords[segmento, 1]
+            y1 = self.coords[segmento + 1, 1]
+            py = ys[par]
+            perto = (py >= np.minimum(y0, y1) - distancia_maxima) & (py <= np.maximum(y0, y1) + distancia_maxima)
+            par, segmento = par[perto], segmento[perto]
+        
+        if len(par) == 0:
+            return
+        
+        a = self.coords[segmento]
+        d = self.coords[segmento + 1] - a
+        px = xs[par]
+        py = ys[par]
+        
+        l2 = d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = ((px - a[:, 0]) * d[:, 0] + (py - a[:, 1]) * d[:, 1]) / l2
+        t = np.clip(np.nan_to_num(t), 0.0, 1.0)
+        
+        qx = a[:, 0] + t * d[:, 0]
+        qy = a[:, 1] + t * d[:, 1]
+        distancia = np.hypot(px - qx, py - qy)
+        
+        # O segmento k liga os vértices k e k+1: não existe quando k+1 inicia outra parte
+        inicia_parte = self.partes[np.searchsorted(self.partes, segmento + 1)] == segmento + 1
+        distancia[inicia_parte] = np.inf
+        
+        # Menor distância de cada par: os segmentos de um par são contíguos e em ordem
+        inicio_grupo = np.flatnonzero(np.r_[True, par[1:] != par[:-1]])
+        menor = np.minimum.reduceat(distancia, inicio_grupo)
+        
+        # Desempate pelo primeiro segmento com a menor distância
+        empata = np.flatnonzero(distancia == np.repeat(menor, np.diff(np.r_[inicio_grupo, len(par)])))
+        primeiros = empata[np.r_[True, par[empata][1:] != par[empata][:-1]]]
+        primeiros = primeiros[distancia[primeiros] < resultado['distancia'][par[primeiros]]]
+        pares = par[primeiros]
+        
+        resultado['distancia'][pares] = distancia[primeiros]
+        resultado['ao_longo'][pares] = self.acumulado[segmento[primeiros]] + t[primeiros] * np.sqrt(l2[primeiros])
+        resultado['x'][pares] = qx[primeiros]
+        resultado['y'][pares] = qy[primeiros]
+    
+    def interpolar(self, feicoes, distancias) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Ponto a uma distância ao longo de cada feição (inverso de projetar).
+        
+        O vértice inicial do segmento de cada par é achado por busca
+        binária vetorizada no estaqueamento da feição.
+        
+        Args:
+            feicoes: Índice da feição de cada par
+            distancias: Distância ao longo da feição (limitada a 0..comprimento)
+        
+        Returns:
+            Tupla (xs, ys); NaN para feições sem segmentos
+        """
+        feicoes = np.asarray(feicoes, dtype=np.int64)
+        distancias = np.clip(np.asarray(distancias, dtype=np.float64), 0.0, self.comprimentos(feicoes))
+        
+        v0 = self.partes[self.feicoes[feicoes]]
+        v1 = self.partes[self.feicoes[feicoes + 1]]
+        
+        # Maior vértice k em [v0, v1 - 2] com acumulado[k] <= distância. O "segmento"
+        # entre duas partes nunca é escolhido: o vértice seguinte tem o mesmo acumulado
+        baixo = v0.copy()
+        alto = np.maximum(v1 - 2, v0)
+        while np.any(baixo < alto):
+            meio = (baixo + alto + 1) // 2
+            avanca = self.acumulado[meio] <= distancias
+            baixo = np.where(avanca, meio, baixo)
+            alto = np.where(avanca, alto, meio - 1)
+        
+        xs = np.full(len(feicoes), np.nan)
+        ys = np.full(len(feicoes), np.nan)
+        validos = v1 - v0 >= 2
+        k = baixo[validos]
+        
+        a = self.coords[k]
+        d = self.coords[k + 1] - a
+        extensao = self.acumulado[k + 1] - self.acumulado[k]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (distancias[validos] - self.acumulado[k]) / extensao
+        t = np.clip(np.nan_to_num(t), 0.0, 1.0)
+        
+        xs[validos] = a[:, 0] + t * d[:, 0]
+        ys[validos] = a[:, 1] + t * d[:, 1]
+        return xs, ys
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistema de Consulta de Coordenadas - Servidor HTTP/JSON
+Mantém o QGIS inicializado e as zonas carregadas em memória, respondendo
+consultas por HTTP para o formulário web e plugins GIS.
+
+Endpoints:
+    GET  /consulta?x=510807&y=8649627&zona=24   consulta de um ponto
+    POST /consulta                              lote: {"pontos": [{"x":..,"y":..,"zona":..}, ...]}
+    GET  /saude                                 estado do servidor
+    POST /invalidar                             recarrega os shapefiles do disco
+
+Uso: python servidor_consulta.py [--host 127.0.0.1] [--porta 8080]
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Dict, Any, List
+
+# Configuração PyQGIS
+os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+
+from qgis.core import QgsApplication
+
+import consulta_standalone as cs
+
+
+# ============================================
+# CONFIGURAÇÕES
+# ============================================
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8080
+
+# Tamanho máximo aceito para o corpo de um POST (bytes)
+TAMANHO_MAXIMO_CORPO = 50 * 1024 * 1024
+
+# As consultas compartilham caches e índices: uma por vez
+_LOCK_CONSULTA = threading.Lock()
+
+
+# ============================================
+# CONSULTA → JSON
+# ============================================
+
+def linha_para_json(lote: Dict[str, Any], i: int) -> Dict[str, Any]:
+    """
+    Converte uma linha do resultado de consultar_lote nos campos de exibir_resultado.
+    
+    Args:
+        lote: Resultado colunar de consultar_lote
+        i: Linha desejada
+    
+    Returns:
+        Dicionário serializável em JSON
+    """
+    resposta = {
+        'x': float(lote['x'][i]),
+        'y': float(lote['y'][i]),
+        'zona': int(lote['zona'][i]),
+        'encontrado': bool(lote['encontrado'][i]),
+        'dentro_fxd': bool(lote['dentro_fxd'][i]),
+        'municipio': lote['municipio'][i].upper() if lote['municipio'][i] else None
+    }
+    
+    if resposta['encontrado']:
+        resposta.update(cs.formatar_resultado({
+            'attributes': lote['attributes'][i],
+            'fxd_info': lote['fxd_info'][i],
+            'municipio': lote['municipio'][i],
+            'km_calculado': float(lote['km_calculado'][i]),
+            'distancia_eixo': float(lote['distancia_eixo'][i]),
+            'dentro_fxd': bool(lote['dentro_fxd'][i])
+        }))
+    
+    return resposta
+
+
+def consultar_pontos(pontos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Consulta uma lista de pontos {"x", "y", "zona"}.
+    
+    Args:
+        pontos: Pontos a consultar
+    
+    Returns:
+        Lista de respostas JSON, na ordem dos pontos
+    
+    Raises:
+        ValueError: Se algum ponto estiver incompleto ou com zona inválida
+    """
+    xs, ys, zonas = [], [], []
+    
+    for ponto in pontos:
+        try:
+            xs.append(float(ponto['x']))
+            ys.append(float(ponto['y']))
+            zonas.append(int(ponto['zona']))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Ponto inválido: {ponto!r} (esperado x, y e zona)")
+        
+        if zonas[-1] not in cs.ZONA_EPSG:
+            raise ValueError(f"Zona {zonas[-1]} inválida. Use 23 ou 24.")
+    
+    with _LOCK_CONSULTA:
+        lote = cs.consultar_lote(xs, ys, zonas)
+    
+    return [linha_para_json(lote, i) for i in range(len(pontos))]
+
+
+# ============================================
+# SERVIDOR HTTP
+# ============================================
+
+class ManipuladorConsulta(BaseHTTPRequestHandler):
+    """Atende os endpoints de consulta em JSON."""
+    
+    def _responder(self, status: int, corpo: Dict[str, Any]) -> None:
+        """Envia uma resposta JSON."""
+        dados = json.dumps(corpo, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+    
+    def _ler_json(self) -> Any:
+        """Lê e decodifica o corpo JSON da requisição."""
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        
+        if tamanho > TAMANHO_MAXIMO_CORPO:
+            raise ValueError(f"Corpo maior que {TAMANHO_MAXIMO_CORPO} bytes")
+        
+        return json.loads(self.rfile.read(tamanho) or b'null')
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        
+        if url.path == '/saude':
+            self._responder(200, {'status': 'ok', 'zonas': sorted(cs.ZONA_EPSG)})
+            return
+        
+        if url.path != '/consulta':
+            self._responder(404, {'erro': f"Endpoint {url.path} não encontrado"})
+            return
+        
+        parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+        inicio = time.perf_counter()
+        
+        try:
+            resposta = consultar_pontos([parametros])[0]
+        except ValueError as e:
+            self._responder(400, {'erro': str(e)})
+            return
+        
+        resposta['tempo_ms'] = (time.perf_counter() - inicio) * 1000
+        self._responder(200, resposta)
+    
+    def do_POST(self):
+        url = urlparse(self.path)
+        
+        if url.path == '/invalidar':
+            with _LOCK_CONSULTA:
+                cs.CACHE_ZONAS.invalidate()
+                cs.CACHE_ZONAS.carregar_todas()
+            self._responder(200, {'status': 'recarregado'})
+            return
+        
+        if url.path != '/consulta':
+            self._responder(404, {'erro': f"Endpoint {url.path} não encontrado"})
+            return
+        
+        inicio = time.perf_counter()
+        
+        try:
+            corpo = self._ler_json()
+            pontos = corpo.get('pontos') if isinstance(corpo, dict) else corpo
+            
+            if not isinstance(pontos, list):
+                raise ValueError('Esperado {"pontos": [...]} ou uma lista de pontos')
+            
+            resultados = consultar_pontos(pontos)
+        except ValueError as e:
+            self._responder(400, {'erro': str(e)})
+            return
+        
+        self._responder(200, {
+            'resultados': resultados,
+            'tempo_ms': (time.perf_counter() - inicio) * 1000
+        })
+    
+    def log_message(self, formato, *args):
+        """Registro de acesso resumido no console."""
+        print(f"   {self.address_string()} - {formato % args}")
+
+
+def iniciar_servidor(host: str = HOST_PADRAO, porta: int = PORTA_PADRAO) -> None:
+    """
+    Carrega as zonas e atende requisições até ser interrompido.
+    
+    Args:
+        host: Endereço de escuta
+        porta: Porta TCP
+    """
+    print("📂 Carregando zonas e índices...")
+    inicio = time.perf_counter()
+    cs.CACHE_ZONAS.carregar_todas()
+    print(f"✅ Zonas carregadas em {time.perf_counter() - inicio:.1f} s")
+    
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorConsulta)
+    print(f"\n🌐 Servidor ouvindo em http://{host}:{porta}/consulta")
+    print("   (Ctrl+C para encerrar)")
+    
+    try:
+        servidor.serve_forever()
+    finally:
+        servidor.server_close()
+
+
+# ============================================
+# MAIN - INTERFACE CLI
+# ============================================
+
+def main():
+    """Função principal - execução CLI."""
+    
+    parser = argparse.ArgumentParser(
+        description='Servidor HTTP/JSON de consulta de coordenadas',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos:
+  %(prog)s
+  %(prog)s --host 0.0.0.0 --porta 8080
+  curl "http://127.0.0.1:8080/consulta?x=510807&y=8649627&zona=24"
+        """
+    )
+    
+    parser.add_argument('--host', default=HOST_PADRAO,
+                       help=f'Endereço de escuta (padrão: {HOST_PADRAO})')
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO,
+                       help=f'Porta TCP (padrão: {PORTA_PADRAO})')
+    
+    args = parser.parse_args()
+    
+    print("=" * 76)
+    print("  SERVIDOR DE CONSULTA - PyQGIS")
+    print("=" * 76)
+    print("\n🔧 Inicializando PyQGIS...")
+    
+    QgsApplication.setPrefixPath(cs.QGIS_PATH, True)
+    qgs = QgsApplication([], False)
+    qgs.initQgis()
+    
+    try:
+        iniciar_servidor(args.host, args.porta)
+        exit_code = 0
+    
+    except KeyboardInterrupt:
+        print("\n\n👋 Servidor encerrado.")
+        exit_code = 0
+    
+    except Exception as e:
+        print(f"\n❌ ERRO CRÍTICO: {e}")
+        import traceback
+        traceback.print_exc()
+        exit_code = 2
+    
+    finally:
+        qgs.exitQgis()
+    
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
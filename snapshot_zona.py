@@ -0,0 +1,1400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistema de Consulta de Coordenadas - Snapshot Binário das Zonas
+Compila shape{zona}, FXD{zona} e municipios{zona} em um único arquivo
+(vértices, offsets das partes, comprimentos acumulados, retângulos
+envolventes, índice espacial compactado e atributos em colunas), que a
+consulta carrega em milissegundos, sem reabrir os shapefiles nem montar
+um dicionário de atributos por feição.
+
+O snapshot é aberto por mmap, somente leitura: os arrays são visões
+diretas sobre o arquivo, sem cópia. Vários processos de consulta na
+mesma máquina compartilham assim uma única cópia física dos dados (o
+cache de páginas do sistema), e cada novo processo começa a consultar
+sem desserializar nada.
+
+Formato do arquivo snapshot{zona}.snap:
+    8 bytes   assinatura b'SITSNAP1'
+    8 bytes   tamanho do cabeçalho JSON (uint64 little-endian)
+    N bytes   cabeçalho JSON: zona, hash das fontes, campos e arrays
+    ...       arrays NumPy brutos, cada um alinhado em 64 bytes
+
+Uso:
+    python snapshot_zona.py                  compila todas as zonas
+    python snapshot_zona.py --zona 24        compila apenas a zona 24
+    python consulta_standalone.py --x 510807 --y 8649627 --zona 24 --backend snapshot
+
+Autor: Sistema de Gestão Rodoviária
+Data: 2025
+"""
+
+import sys
+import json
+import mmap
+import time
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Tuple, Optional, Dict, Any, List, Iterator
+
+import numpy as np
+
+import consulta_standalone as cs
+import instrumentacao
+from continuidade import TabelaContinuidade, calcular_km_por_proporcao, obter_codigo_sre
+from referencia_linear import (RedeLinear, calcular_acumulado, limites_blocos, expandir_intervalos,
+                               trechos_na_janela, SEGMENTOS_FILTRO_MINIMO)
+
+
+# ============================================
+# CONFIGURAÇÕES
+# ============================================
+
+ASSINATURA_SNAPSHOT = b'SITSNAP1'
+VERSAO_FORMATO = 2
+
+# Alinhamento (bytes) de cada array dentro do arquivo
+ALINHAMENTO = 64
+
+# Filhos por nó do índice espacial compactado
+TAMANHO_NO_INDICE = 16
+
+# Caixas testadas de uma vez no primeiro nível da descida de uma consulta individual:
+# a descida começa no nível mais fino com até este número de caixas
+CAIXAS_NIVEL_INICIAL = 1024
+
+# Segmentos avaliados de uma vez no teste ponto-em-polígono do lote (limita a memória)
+SEGMENTOS_POR_BLOCO = 2000000
+
+# Camadas do snapshot: chave interna -> prefixo do shapefile
+CAMADAS_SNAPSHOT = {
+    'shape': 'shape',        # eixos rodoviários (linhas)
+    'fxd': 'FXD',            # faixa de domínio (polígonos)
+    'municipios': 'municipios'
+}
+
+# Campos da FXD que não são exibidos
+CAMPOS_IGNORADOS_FXD = ['FID', 'SHAPE_LENG', 'SHAPE_LEN', 'OBJECTID', 'SHAPE_AREA']
+
+# Campos usados pela tabela de continuidade
+CAMPOS_CONTINUIDADE = [
+    'RODOVIA', 'CÓDIGO SRE', 'COD_SRE', 'CODIGO_SRE',
+    'KM_INICIAL', 'KM_FINAL', 'LOCAL_IN_', 'LOCAL_FIM'
+]
+
+
+# ============================================
+# FONTES E VERSÃO DO SNAPSHOT
+# ============================================
+
+def caminho_snapshot(zona: int) -> Path:
+    """Caminho do snapshot compilado da zona."""
+    return cs.SHAPES_DIR / f"snapshot{zona}.snap"
+
+
+# Versão das fontes: mesmas funções do cache de resultados (consulta_standalone)
+arquivos_fonte = cs.arquivos_fonte
+assinatura_fontes = cs.assinatura_fontes
+hash_fontes = cs.hash_fontes
+
+
+def snapshot_atualizado(zona: int, cabecalho: Dict[str, Any]) -> bool:
+    """
+    Verifica se o snapshot corresponde aos shapefiles atuais.
+    
+    Compara primeiro a assinatura (tamanho/data); só recalcula o hash do
+    conteúdo quando ela diverge, p.ex. após copiar os arquivos. Se o hash
+    confere, a assinatura nova é gravada no cabeçalho, para que as próximas
+    aberturas não voltem a ler os shapefiles.
+    
+    Args:
+        zona: Zona UTM
+        cabecalho: Cabeçalho do snapshot
+    
+    Returns:
+        True se o snapshot pode ser usado
+    """
+    assinatura = assinatura_fontes(zona)
+    
+    if cabecalho.get('assinatura_fontes') == assinatura:
+        return True
+    
+    if cabecalho.get('hash_fontes') != hash_fontes(zona):
+        return False
+    
+    cabecalho['assinatura_fontes'] = assinatura
+    try:
+        atualizar_cabecalho(caminho_snapshot(zona), cabecalho)
+    except (OSError, ValueError) as e:
+        # Sem permissão de escrita ou arquivo em uso: o snapshot continua válido
+        print(f"⚠️  Não foi possível atualizar a assinatura do snapshot: {e}")
+    
+    return True
+
+
+# ============================================
+# LEITURA E ESCRITA DO ARQUIVO
+# ============================================
+
+def _alinhar(posicao: int) -> int:
+    """Arredonda a posição para o próximo múltiplo de ALINHAMENTO."""
+    return (posicao + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+
+
+def escrever_snapshot(caminho: Path, cabecalho: Dict[str, Any],
+                      arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Grava cabeçalho e arrays no formato do snapshot.
+    
+    O arquivo é escrito ao lado e renomeado no final, de modo que um
+    leitor nunca veja um snapshot pela metade.
+    
+    Args:
+        caminho: Arquivo de destino
+        cabecalho: Metadados (serializáveis em JSON)
+        arrays: Arrays NumPy (sem dtype object)
+    """
+    arrays = {nome: np.ascontiguousarray(arr) for nome, arr in arrays.items()}
+    descritores = {}
+    deslocamento = 0
+    
+    for nome, arr in arrays.items():
+        deslocamento = _alinhar(deslocamento)
+        descritores[nome] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': deslocamento}
+        deslocamento += arr.nbytes
+    
+    texto = json.dumps(dict(cabecalho, arrays=descritores), ensure_ascii=False).encode('utf-8')
+    inicio = _alinhar(16 + len(texto))
+    
+    temporario = caminho.with_name(caminho.name + '.tmp')
+    with open(temporario, 'wb') as arq:
+        arq.write(ASSINATURA_SNAPSHOT)
+        arq.write(np.uint64(len(texto)).astype('<u8').tobytes())
+        arq.write(texto)
+        
+        for nome, arr in arrays.items():
+            arq.write(b'\0' * (inicio + descritores[nome]['offset'] - arq.tell()))
+            arq.write(arr.tobytes())
+    
+    temporario.replace(caminho)
+
+
+def ler_cabecalho(caminho: Path) -> Tuple[Dict[str, Any], int]:
+    """
+    Lê apenas o cabeçalho do snapshot.
+    
+    Args:
+        caminho: Arquivo do snapshot
+    
+    Returns:
+        Tupla (cabeçalho, posição do início dos arrays)
+    
+    Raises:
+        ValueError: Se o arquivo não for um snapshot desta versão
+    """
+    with open(caminho, 'rb') as arq:
+        inicio = arq.read(16)
+        
+        if len(inicio) < 16 or inicio[:8] != ASSINATURA_SNAPSHOT:
+            raise ValueError(f"{caminho.name} não é um snapshot válido")
+        
+        tamanho = int(np.frombuffer(inicio, dtype='<u8', count=1, offset=8)[0])
+        cabecalho = json.loads(arq.read(tamanho).decode('utf-8'))
+    
+    if cabecalho.get('versao') != VERSAO_FORMATO:
+        raise ValueError(f"{caminho.name}: versão {cabecalho.get('versao')} (esperada {VERSAO_FORMATO})")
+    
+    return cabecalho, _alinhar(16 + tamanho)
+
+
+def atualizar_cabecalho(caminho: Path, cabecalho: Dict[str, Any]) -> None:
+    """
+    Regrava o cabeçalho do snapshot sem recompilar as camadas.
+    
+    Quando o texto novo cabe no espaço do antigo, é escrito no lugar e
+    completado com espaços (ignorados pelo JSON), de modo que os arrays não
+    mudam de posição. Caso contrário o arquivo é regravado por inteiro.
+    
+    Args:
+        caminho: Arquivo do snapshot
+        cabecalho: Cabeçalho completo, como devolvido por ler_cabecalho
+    """
+    texto = json.dumps(cabecalho, ensure_ascii=False).encode('utf-8')
+    
+    with open(caminho, 'r+b') as arq:
+        inicio = arq.read(16)
+        
+        if len(inicio) < 16 or inicio[:8] != ASSINATURA_SNAPSHOT:
+            raise ValueError(f"{caminho.name} não é um snapshot válido")
+        
+        tamanho = int(np.frombuffer(inicio, dtype='<u8', count=1, offset=8)[0])
+        
+        if len(texto) <= tamanho:
+            arq.write(texto + b' ' * (tamanho - len(texto)))
+            return
+    
+    _, arrays = ler_snapshot(caminho)
+    escrever_snapshot(caminho, {k: v for k, v in cabecalho.items() if k != 'arrays'}, arrays)
+
+
+def ler_snapshot(caminho: Path) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Abre um snapshot por mmap, somente leitura.
+    
+    Os arrays são visões sobre as páginas mapeadas: nada é copiado nem
+    convertido, e as páginas só são lidas do disco quando usadas. O
+    mapeamento é liberado quando o último array deixa de ser referenciado.
+    
+    Args:
+        caminho: Arquivo do snapshot
+    
+    Returns:
+        Tupla (cabeçalho, arrays somente leitura)
+    
+    Raises:
+        ValueError: Se o arquivo não for um snapshot desta versão
+    """
+    cabecalho, inicio = ler_cabecalho(caminho)
+    
+    with open(caminho, 'rb') as arq:
+        buffer = mmap.mmap(arq.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    arrays = {}
+    
+    for nome, d in cabecalho['arrays'].items():
+        quantidade = int(np.prod(d['shape']))
+        arrays[nome] = np.frombuffer(buffer, dtype=d['dtype'], count=quantidade,
+                                     offset=inicio + d['offset']).reshape(d['shape'])
+    
+    return cabecalho, arrays
+
+
+# ============================================
+# ÍNDICE ESPACIAL COMPACTADO (STR)
+# ============================================
+
+def construir_indice(bbox: np.ndarray,
+                     tamanho_no: int = TAMANHO_NO_INDICE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Monta uma R-tree compactada (Sort-Tile-Recursive) sobre os retângulos.
+    
+    Todos os níveis ficam em um único array de caixas: o nível 0 são os
+    retângulos das feições (na ordem STR) e cada nó do nível seguinte
+    envolve `tamanho_no` caixas consecutivas do nível anterior.
+    
+    Args:
+        bbox: Retângulos (xmin, ymin, xmax, ymax) das feições, n x 4
+        tamanho_no: Filhos por nó
+    
+    Returns:
+        Tupla (caixas, niveis, ordem): caixas de todos os níveis, início de
+        cada nível em `caixas` (mais o final) e feição de cada caixa do nível 0
+    """
+    n = len(bbox)
+    
+    if n == 0:
+        return np.empty((0, 4)), np.array([0, 0], dtype=np.int64), np.empty(0, dtype=np.int64)
+    
+    centro_x = (bbox[:, 0] + bbox[:, 2]) / 2
+    centro_y = (bbox[:, 1] + bbox[:, 3]) / 2
+    
+    # Fatias verticais de ~sqrt(folhas) nós, ordenadas por Y dentro de cada fatia
+    folhas = -(-n // tamanho_no)
+    por_fatia = int(np.ceil(np.sqrt(folhas))) * tamanho_no
+    fatia = np.empty(n, dtype=np.int64)
+    fatia[np.argsort(centro_x, kind='stable')] = np.arange(n) // por_fatia
+    ordem = np.lexsort((centro_y, fatia))
+    
+    nivel = bbox[ordem]
+    caixas = [nivel]
+    niveis = [0, n]
+    
+    while len(nivel) > 1:
+        inicios = np.arange(0, len(nivel), tamanho_no)
+        nivel = np.column_stack([
+            np.minimum.reduceat(nivel[:, 0], inicios),
+            np.minimum.reduceat(nivel[:, 1], inicios),
+            np.maximum.reduceat(nivel[:, 2], inicios),
+            np.maximum.reduceat(nivel[:, 3], inicios)
+        ])
+        caixas.append(nivel)
+        niveis.append(niveis[-1] + len(nivel))
+    
+    return np.concatenate(caixas), np.array(niveis, dtype=np.int64), ordem.astype(np.int64)
+
+
+def consultar_indice_lote(caixas: np.ndarray, niveis: np.ndarray, ordem: np.ndarray,
+                          janelas: np.ndarray,
+                          tamanho_no: int = TAMANHO_NO_INDICE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Busca, para um lote de janelas, as feições cujo retângulo intersecta cada uma.
+    
+    Todas as janelas descem a árvore juntas: cada nível avalia de uma vez
+    os pares (janela, nó) que sobreviveram ao nível anterior.
+    
+    Args:
+        caixas, niveis, ordem: Índice gerado por construir_indice
+        janelas: Janelas de consulta (xmin, ymin, xmax, ymax), k x 4
+        tamanho_no: Filhos por nó (o mesmo usado na construção)
+    
+    Returns:
+        Tupla (janela, feicao): pares ordenados por janela e, dentro de
+        cada janela, por feição crescente
+    """
+    janelas = np.asarray(janelas, dtype=np.float64).reshape(-1, 4)
+    raiz = int(niveis[-1] - niveis[-2])
+    
+    # Desce da raiz até as folhas mantendo só os pares cujo nó toca a janela
+    janela = np.repeat(np.arange(len(janelas)), raiz)
+    posicoes = np.tile(np.arange(raiz), len(janelas))
+    
+    for nivel in range(len(niveis) - 2, -1, -1):
+        c = caixas[niveis[nivel] + posicoes]
+        j = janelas[janela]
+        toca = ((c[:, 0] <= j[:, 2]) & (c[:, 2] >= j[:, 0]) &
+                (c[:, 1] <= j[:, 3]) & (c[:, 3] >= j[:, 1]))
+        janela, posicoes = janela[toca], posicoes[toca]
+        
+        if nivel > 0:
+            filhos = (posicoes[:, None] * tamanho_no + np.arange(tamanho_no)).ravel()
+            janela = np.repeat(janela, tamanho_no)
+            existe = filhos < niveis[nivel] - niveis[nivel - 1]
+            janela, posicoes = janela[existe], filhos[existe]
+    
+    feicao = ordem[posicoes]
+    pares = np.lexsort((feicao, janela))
+    return janela[pares], feicao[pares]
+
+
+def consultar_indice(caixas: np.ndarray, niveis: np.ndarray, ordem: np.ndarray,
+                     xmin: float, ymin: float, xmax: float, ymax: float,
+                     tamanho_no: int = TAMANHO_NO_INDICE) -> np.ndarray:
+    """
+    Busca as feições cujo retângulo intersecta a janela de consulta.
+    
+    Args:
+        caixas, niveis, ordem: Índice gerado por construir_indice
+        xmin, ymin, xmax, ymax: Janela de consulta
+        tamanho_no: Filhos por nó (o mesmo usado na construção)
+    
+    Returns:
+        Índices das feições em ordem crescente
+    """
+    # Mesma descida de consultar_indice_lote, sem o custo dos pares para uma janela só.
+    # Os níveis pequenos do topo são pulados: testar até CAIXAS_NIVEL_INICIAL caixas
+    # de uma vez custa menos que descer nível a nível
+    inicial = len(niveis) - 2
+    for nivel in range(len(niveis) - 1):
+        if niveis[nivel + 1] - niveis[nivel] <= CAIXAS_NIVEL_INICIAL:
+            inicial = nivel
+            break
+    
+    posicoes = np.arange(niveis[inicial + 1] - niveis[inicial])
+    
+    for nivel in range(inicial, -1, -1):
+        c = caixas[niveis[nivel] + posicoes]
+        posicoes = posicoes[(c[:, 0] <= xmax) & (c[:, 2] >= xmin) &
+                            (c[:, 1] <= ymax) & (c[:, 3] >= ymin)]
+        
+        if nivel > 0:
+            filhos = (posicoes[:, None] * tamanho_no + np.arange(tamanho_no)).ravel()
+            posicoes = filhos[filhos < niveis[nivel] - niveis[nivel - 1]]
+    
+    return np.sort(ordem[posicoes])
+
+
+# ============================================
+# COMPILAÇÃO
+# ============================================
+
+def _compilar_atributos(chave: str, nomes: List[str], colunas: List[np.ndarray],
+                        validas: np.ndarray, arrays: Dict[str, np.ndarray]) -> List[Dict[str, str]]:
+    """
+    Converte as colunas lidas pelo pyogrio em arrays do snapshot.
+    
+    Inteiros e reais viram arrays numéricos com máscara de nulos; os
+    demais tipos viram texto UTF-8 (offsets + bytes concatenados).
+    
+    Args:
+        chave: Chave da camada (prefixo dos arrays)
+        nomes: Nomes dos campos
+        colunas: Colunas lidas
+        validas: Máscara das feições mantidas
+        arrays: Dicionário de arrays do snapshot (preenchido aqui)
+    
+    Returns:
+        Descrição dos campos: [{'nome', 'tipo'}]
+    """
+    campos = []
+    
+    for j, (nome, coluna) in enumerate(zip(nomes, colunas)):
+        coluna = coluna[validas]
+        prefixo = f"{chave}/campo{j}"
+        
+        if coluna.dtype.kind in 'iub':
+            tipo = 'int'
+            arrays[f"{prefixo}/valores"] = coluna.astype(np.int64)
+            arrays[f"{prefixo}/nulos"] = np.zeros(len(coluna), dtype=bool)
+        elif coluna.dtype.kind == 'f':
+            tipo = 'float'
+            arrays[f"{prefixo}/valores"] = coluna.astype(np.float64)
+            arrays[f"{prefixo}/nulos"] = np.isnan(coluna)
+        else:
+            tipo = 'str'
+            textos = [None if v is None else str(v) for v in coluna.tolist()]
+            codificados = [b'' if t is None else t.encode('utf-8') for t in textos]
+            offsets = np.zeros(len(codificados) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(c) for c in codificados])
+            arrays[f"{prefixo}/offsets"] = offsets
+            arrays[f"{prefixo}/dados"] = np.frombuffer(b''.join(codificados), dtype=np.uint8)
+            arrays[f"{prefixo}/nulos"] = np.array([t is None for t in textos], dtype=bool)
+        
+        campos.append({'nome': nome, 'tipo': tipo})
+    
+    return campos
+
+
+def _compilar_camada(chave: str, caminho: Path, arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """
+    Compila um shapefile em arrays planos.
+    
+    Args:
+        chave: Chave da camada (prefixo dos arrays)
+        caminho: Caminho do shapefile
+        arrays: Dicionário de arrays do snapshot (preenchido aqui)
+    
+    Returns:
+        Metadados da camada: 'existe', 'feicoes' e 'campos'
+    """
+    # Shapely e o leitor OGR (pyogrio) só são necessários para compilar
+    import shapely
+    import consulta_shapely as csh
+    
+    if not caminho.exists():
+        return {'existe': False, 'feicoes': 0, 'campos': []}
+    
+    meta, _, wkb, colunas = csh.ler_ogr(str(caminho))
+    geometrias = shapely.from_wkb(wkb)
+    
+    # Geometrias vazias são ignoradas, como em ler_features
+    validas = ~(shapely.is_missing(geometrias) | shapely.is_empty(geometrias))
+    geometrias = geometrias[validas]
+    n = len(geometrias)
+    
+    if n:
+        _, coords, offsets = shapely.to_ragged_array(geometrias, include_z=False)
+        partes = offsets[0].astype(np.int64)
+        
+        # Feição -> intervalo de partes (linhas ou anéis), compondo os níveis de offsets
+        feicoes = np.arange(n + 1)
+        for nivel in reversed(offsets[1:]):
+            feicoes = nivel[feicoes]
+    else:
+        coords = np.empty((0, 2))
+        partes = np.zeros(1, dtype=np.int64)
+        feicoes = np.zeros(1, dtype=np.int64)
+    
+    # Comprimento acumulado ao longo de cada feição (as partes se somam em sequência)
+    acumulado = calcular_acumulado(coords, partes, feicoes)
+    
+    bbox = shapely.bounds(geometrias).reshape(n, 4)
+    caixas, niveis, ordem = construir_indice(bbox)
+    
+    arrays[f"{chave}/coords"] = np.asarray(coords, dtype=np.float64)
+    arrays[f"{chave}/partes"] = partes
+    arrays[f"{chave}/feicoes"] = np.asarray(feicoes, dtype=np.int64)
+    arrays[f"{chave}/acumulado"] = acumulado
+    arrays[f"{chave}/bbox"] = bbox
+    arrays[f"{chave}/indice/caixas"] = caixas
+    arrays[f"{chave}/indice/niveis"] = niveis
+    arrays[f"{chave}/indice/ordem"] = ordem
+    
+    campos = _compilar_atributos(chave, list(meta['fields']), colunas, validas, arrays)
+    
+    return {'existe': True, 'feicoes': n, 'campos': campos}
+
+
+def chave_continuidade(rodovia: Any, codigo_sre: str) -> int:
+    """Hash de 64 bits de (rodovia, código SRE), usado na busca da tabela de continuidade."""
+    texto = f"{rodovia}\x1f{codigo_sre}".encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(texto, digest_size=8).digest(), 'little')
+
+
+def _compilar_continuidade(shape: 'CamadaSnapshot', arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Pré-calcula a tabela de continuidade dos eixos em arrays do snapshot.
+    
+    Cada entrada guarda as feições do trecho e dos vizinhos, a posição na
+    rodovia, as diferenças de KM e o indicador de continuidade; as entradas
+    ficam ordenadas pelo hash de (rodovia, código SRE) para busca binária.
+    
+    Args:
+        shape: Camada dos eixos já compilada
+        arrays: Dicionário de arrays do snapshot (preenchido aqui)
+    """
+    tabela = TabelaContinuidade((None, linha) for linha in shape.linhas(CAMPOS_CONTINUIDADE))
+    itens = list(tabela.itens())
+    
+    def feicao(trecho):
+        return trecho['feicao'] if trecho else -1
+    
+    def gap(valor):
+        return np.nan if valor is None else valor
+    
+    chaves = np.array([chave_continuidade(*chave) for chave, _ in itens], dtype=np.uint64)
+    ordem = np.argsort(chaves, kind='stable')
+    
+    colunas = {
+        'chaves': chaves,
+        'trecho': np.array([feicao(e['trecho']) for _, e in itens], dtype=np.int64),
+        'anterior': np.array([feicao(e['anterior']) for _, e in itens], dtype=np.int64),
+        'posterior': np.array([feicao(e['posterior']) for _, e in itens], dtype=np.int64),
+        'indice': np.array([e['indice'] for _, e in itens], dtype=np.int64),
+        'total': np.array([e['total'] for _, e in itens], dtype=np.int64),
+        'gap_anterior': np.array([gap(e['gap_anterior']) for _, e in itens], dtype=np.float64),
+        'gap_posterior': np.array([gap(e['gap_posterior']) for _, e in itens], dtype=np.float64),
+        'continuidade': np.array([e['continuidade'] for _, e in itens], dtype=bool)
+    }
+    
+    for nome, valores in colunas.items():
+        arrays[f"continuidade/{nome}"] = valores[ordem]
+
+
+def compilar_zona(zona: int, destino: Optional[Path] = None) -> Path:
+    """
+    Compila os shapefiles da zona em um snapshot.
+    
+    Args:
+        zona: Zona UTM
+        destino: Arquivo de saída (padrão: caminho_snapshot(zona))
+    
+    Returns:
+        Caminho do snapshot gravado
+    """
+    destino = destino or caminho_snapshot(zona)
+    
+    # Assinatura e hash antes da leitura: alterações durante a compilação tornam o snapshot obsoleto
+    cabecalho = {
+        'versao': VERSAO_FORMATO,
+        'zona': zona,
+        'assinatura_fontes': assinatura_fontes(zona),
+        'hash_fontes': hash_fontes(zona),
+        'camadas': {}
+    }
+    arrays: Dict[str, np.ndarray] = {}
+    
+    for chave, prefixo in CAMADAS_SNAPSHOT.items():
+        cabecalho['camadas'][chave] = _compilar_camada(
+            chave, cs.SHAPES_DIR / f"{prefixo}{zona}.shp", arrays
+        )
+    
+    _compilar_continuidade(CamadaSnapshot('shape', cabecalho['camadas']['shape'], arrays), arrays)
+    
+    escrever_snapshot(destino, cabecalho, arrays)
+    return destino
+
+
+def abrir_snapshot(zona: int) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Abre o snapshot da zona, (re)compilando-o se estiver ausente ou desatualizado.
+    
+    A validade é conferida pelo cabeçalho, antes de mapear o arquivo.
+    No Windows a recompilação só consegue substituir o snapshot quando
+    nenhum outro processo o mantém aberto.
+    
+    Args:
+        zona: Zona UTM
+    
+    Returns:
+        Tupla (cabeçalho, arrays)
+    """
+    caminho = caminho_snapshot(zona)
+    
+    if caminho.exists():
+        try:
+            cabecalho, _ = ler_cabecalho(caminho)
+            if snapshot_atualizado(zona, cabecalho):
+                return ler_snapshot(caminho)
+            print(f"⚠️  Snapshot da zona {zona} desatualizado: recompilando...")
+        except ValueError as e:
+            print(f"⚠️  {e}: recompilando...")
+    
+    compilar_zona(zona, caminho)
+    return ler_snapshot(caminho)
+
+
+# ============================================
+# CAMADA DO SNAPSHOT
+# ============================================
+
+class CamadaSnapshot:
+    """
+    Uma camada do snapshot: geometrias em arrays planos e atributos em colunas.
+    
+    Os atributos de uma feição só são montados quando pedidos (e guardados
+    para as consultas seguintes); os testes geométricos trabalham
+    diretamente sobre os vértices das feições.
+    """
+    
+    def __init__(self, chave: str, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.existe = meta['existe']
+        self.campos = meta['campos']
+        self.nomes_campos = [c['nome'] for c in self.campos]
+        self._n = meta['feicoes']
+        
+        if not self.existe:
+            arrays = {
+                f"{chave}/coords": np.empty((0, 2)),
+                f"{chave}/partes": np.zeros(1, dtype=np.int64),
+                f"{chave}/feicoes": np.zeros(1, dtype=np.int64),
+                f"{chave}/acumulado": np.empty(0),
+                f"{chave}/indice/caixas": np.empty((0, 4)),
+                f"{chave}/indice/niveis": np.array([0, 0], dtype=np.int64),
+                f"{chave}/indice/ordem": np.empty(0, dtype=np.int64)
+            }
+        
+        self.coords = arrays[f"{chave}/coords"]
+        self.partes = arrays[f"{chave}/partes"]
+        self.feicoes = arrays[f"{chave}/feicoes"]
+        self.acumulado = arrays[f"{chave}/acumulado"]
+        self.rede = RedeLinear(self.coords, self.partes, self.feicoes, self.acumulado)
+        self._indice = (arrays[f"{chave}/indice/caixas"],
+                        arrays[f"{chave}/indice/niveis"],
+                        arrays[f"{chave}/indice/ordem"])
+        self._colunas = [
+            {nome[len(f"{chave}/campo{j}/"):]: arr for nome, arr in arrays.items()
+             if nome.startswith(f"{chave}/campo{j}/")}
+            for j in range(len(self.campos))
+        ]
+        self._atributos: Dict[int, Dict[str, Any]] = {}
+    
+    def __len__(self) -> int:
+        return self._n
+    
+    # ----- atributos -----
+    
+    def _valor(self, j: int, i: int) -> Any:
+        """Valor do campo j na feição i (None para NULL)."""
+        coluna = self._colunas[j]
+        
+        if coluna['nulos'][i]:
+            return None
+        
+        tipo = self.campos[j]['tipo']
+        if tipo == 'int':
+            return int(coluna['valores'][i])
+        if tipo == 'float':
+            return float(coluna['valores'][i])
+        
+        inicio, fim = coluna['offsets'][i], coluna['offsets'][i + 1]
+        return coluna['dados'][inicio:fim].tobytes().decode('utf-8')
+    
+    def atributos(self, i: int, nomes: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Atributos da feição i, no mesmo formato de ler_features (ou só os campos `nomes`).
+        
+        O dicionário completo é compartilhado entre as consultas, como em
+        DadosZona.todas_features: não deve ser alterado.
+        """
+        if nomes is None:
+            try:
+                return self._atributos[i]
+            except KeyError:
+                atributos = self._atributos[i] = {
+                    nome: self._valor(j, i) for j, nome in enumerate(self.nomes_campos)
+                }
+                return atributos
+        
+        return {
+            nome: self._valor(j, i) for j, nome in enumerate(self.nomes_campos) if nome in nomes
+        }
+    
+    def linhas(self, nomes: List[str]) -> Iterator[Dict[str, Any]]:
+        """Percorre todas as feições devolvendo apenas os campos pedidos que existirem."""
+        selecionados = [(j, nome) for j, nome in enumerate(self.nomes_campos) if nome in nomes]
+        
+        for i in range(self._n):
+            yield {nome: self._valor(j, i) for j, nome in selecionados}
+    
+    # ----- geometria -----
+    
+    def candidatos(self, xmin: float, ymin: float, xmax: float, ymax: float) -> np.ndarray:
+        """Feições cujo retângulo intersecta a janela, em ordem crescente."""
+        return consultar_indice(*self._indice, xmin, ymin, xmax, ymax)
+    
+    def candidatos_lote(self, janelas: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Pares (janela, feição) cujo retângulo intersecta cada janela (ver consultar_indice_lote)."""
+        if len(janelas) == 1:
+            # Consulta individual: a descida simples evita a contabilidade dos pares
+            feicoes = consultar_indice(*self._indice, *janelas[0].tolist())
+            return np.zeros(len(feicoes), dtype=np.int64), feicoes
+        
+        return consultar_indice_lote(*self._indice, janelas)
+    
+    def contem_pontos(self, feicoes, xs, ys) -> np.ndarray:
+        """
+        Teste ponto-em-polígono (par-ímpar sobre todos os anéis) de cada par (feição i, ponto i).
+        
+        Os grupos de segmentos que não alcançam a semirreta à direita do
+        ponto são descartados pelo retângulo envolvente (como em
+        RedeLinear.projetar); os segmentos restantes são avaliados juntos,
+        em blocos de até SEGMENTOS_POR_BLOCO segmentos. Pontos exatamente
+        sobre a borda podem cair de qualquer lado.
+        
+        Args:
+            feicoes: Índice da feição de cada par
+            xs: Coordenada X do ponto de cada par
+            ys: Coordenada Y do ponto de cada par
+        
+        Returns:
+            Array booleano: True quando a feição contém o ponto
+        """
+        feicoes = np.asarray(feicoes, dtype=np.int64)
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        n = len(feicoes)
+        
+        # Segmentos de cada par: do primeiro vértice da feição até o penúltimo
+        v0 = self.partes[self.feicoes[feicoes]]
+        quantidade = np.maximum(self.partes[self.feicoes[feicoes + 1]] - v0 - 1, 0)
+        
+        # Só os grupos de segmentos que alcançam a semirreta à direita do ponto
+        par, primeiro = np.arange(n), v0
+        if quantidade.sum() >= SEGMENTOS_FILTRO_MINIMO:
+            janelas = np.column_stack([xs, ys, np.full(n, np.inf), ys])
+            par, primeiro, quantidade = trechos_na_janela(self.rede.caixas_grupos, v0, quantidade, janelas)
+        
+        y = self.coords[:, 1]
+        cruzamentos = np.zeros(n, dtype=np.int64)
+        
+        limites = limites_blocos(quantidade, SEGMENTOS_POR_BLOCO)
+        for inicio, fim in zip(limites[:-1], limites[1:]):
+            trecho, segmento = expandir_intervalos(primeiro[inicio:fim], quantidade[inicio:fim])
+            par_bloco = par[inicio:fim][trecho]
+            
+            # Só os segmentos que atravessam a horizontal do ponto podem cruzar o raio
+            py = ys[par_bloco]
+            atravessa = np.flatnonzero((y[segmento] > py) != (y[segmento + 1] > py))
+            par_bloco, segmento, py = par_bloco[atravessa], segmento[atravessa], py[atravessa]
+            
+            # Interseção com a horizontal (yb != ya em todo segmento que a atravessa)
+            a = self.coords[segmento]
+            b = self.coords[segmento + 1]
+            cruza = xs[par_bloco] < (b[:, 0] - a[:, 0]) * (py - a[:, 1]) / (b[:, 1] - a[:, 1]) + a[:, 0]
+            
+            # O segmento k liga os vértices k e k+1: não existe quando k+1 inicia outra parte
+            cruza &= self.partes[np.searchsorted(self.partes, segmento + 1)] != segmento + 1
+            
+            cruzamentos += np.bincount(par_bloco[cruza], minlength=n)
+        
+        return cruzamentos % 2 == 1
+
+
+class _FeicoesSnapshot:
+    """Sequência (geometria, atributos) no formato de DadosZona.todas_features."""
+    
+    def __init__(self, camada: CamadaSnapshot):
+        self._camada = camada
+    
+    def __len__(self) -> int:
+        return len(self._camada)
+    
+    def __getitem__(self, i: int) -> Tuple[None, Dict[str, Any]]:
+        return None, self._camada.atributos(i)
+
+
+class TabelaContinuidadeSnapshot:
+    """
+    Tabela de continuidade pré-calculada no snapshot (ver _compilar_continuidade).
+    
+    Mesma interface de continuidade.TabelaContinuidade, sem montar um
+    dicionário por trecho: a entrada é localizada por busca binária no
+    hash da chave e montada apenas quando consultada (e guardada para as
+    consultas seguintes ao mesmo trecho).
+    """
+    
+    def __init__(self, shape: CamadaSnapshot, arrays: Dict[str, np.ndarray]):
+        self._shape = shape
+        self._entradas: Dict[Tuple[Any, str], Optional[Dict[str, Any]]] = {}
+        self._colunas = {
+            nome[len('continuidade/'):]: arr for nome, arr in arrays.items()
+            if nome.startswith('continuidade/')
+        }
+    
+    def _trecho(self, feicao: int) -> Optional[Dict[str, Any]]:
+        """Trecho no formato de TabelaContinuidade a partir da feição do eixo."""
+        if feicao < 0:
+            return None
+        
+        atributos = self._shape.atributos(feicao, CAMPOS_CONTINUIDADE)
+        km_ini = atributos.get('KM_INICIAL')
+        km_fim = atributos.get('KM_FINAL')
+        
+        return {
+            'feicao': feicao,
+            'cod_sre': obter_codigo_sre(atributos),
+            'km_ini': float(km_ini),
+            'km_fim': float(km_fim) if km_fim is not None else float(km_ini),
+            'local_ini': atributos.get('LOCAL_IN_', ''),
+            'local_fim': atributos.get('LOCAL_FIM', '')
+        }
+    
+    def obter(self, rodovia: Any, codigo_sre: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna a entrada de continuidade de um trecho.
+        
+        Args:
+            rodovia: Valor do campo RODOVIA
+            codigo_sre: Código SRE do trecho
+        
+        Returns:
+            Dicionário no formato de TabelaContinuidade.obter, ou None
+        """
+        try:
+            return self._entradas[(rodovia, codigo_sre)]
+        except KeyError:
+            entrada = self._entradas[(rodovia, codigo_sre)] = self._montar_entrada(rodovia, codigo_sre)
+            return entrada
+    
+    def _montar_entrada(self, rodovia: Any, codigo_sre: str) -> Optional[Dict[str, Any]]:
+        """Localiza e monta a entrada do trecho a partir das colunas do snapshot."""
+        c = self._colunas
+        chave = np.uint64(chave_continuidade(rodovia, codigo_sre))
+        inicio = int(np.searchsorted(c['chaves'], chave, side='left'))
+        fim = int(np.searchsorted(c['chaves'], chave, side='right'))
+        
+        # Confere a chave real (colisões de hash são possíveis, embora raras)
+        for k in range(inicio, fim):
+            trecho = self._trecho(int(c['trecho'][k]))
+            atributos = self._shape.atributos(trecho['feicao'], CAMPOS_CONTINUIDADE)
+            
+            if atributos.get('RODOVIA', '') != rodovia or trecho['cod_sre'] != codigo_sre:
+                continue
+            
+            gap_anterior = float(c['gap_anterior'][k])
+            gap_posterior = float(c['gap_posterior'][k])
+            
+            return {
+                'trecho': trecho,
+                'indice': int(c['indice'][k]),
+                'total': int(c['total'][k]),
+                'anterior': self._trecho(int(c['anterior'][k])),
+                'posterior': self._trecho(int(c['posterior'][k])),
+                'gap_anterior': None if np.isnan(gap_anterior) else gap_anterior,
+                'gap_posterior': None if np.isnan(gap_posterior) else gap_posterior,
+                'continuidade': bool(c['continuidade'][k])
+            }
+        
+        return None
+
+
+class DadosZonaSnapshot:
+    """
+    Dados de uma zona UTM carregados do snapshot compilado.
+    
+    Oferece os atributos de DadosZona usados na montagem do resultado
+    (zona, todas_features, continuidade) sobre as camadas do snapshot.
+    Nenhuma estrutura por feição é criada na carga: tudo é lido das
+    páginas mapeadas quando a consulta precisa.
+    """
+    
+    def __init__(self, zona: int):
+        self.zona = zona
+        carga = instrumentacao.iniciar()
+        
+        with carga.etapa('snapshot'):
+            cabecalho, arrays = abrir_snapshot(zona)
+        self.hash_fontes = cabecalho['hash_fontes']
+        
+        with carga.etapa('camadas'):
+            self.shape = CamadaSnapshot('shape', cabecalho['camadas']['shape'], arrays)
+            self.fxd = CamadaSnapshot('fxd', cabecalho['camadas']['fxd'], arrays)
+            self.municipios = CamadaSnapshot('municipios', cabecalho['camadas']['municipios'], arrays)
+            
+            self.todas_features = _FeicoesSnapshot(self.shape)
+            self.continuidade = TabelaContinuidadeSnapshot(self.shape, arrays)
+        
+        # Campo com o nome do município (primeiro que casar com as palavras-chave)
+        self.campo_municipio = None
+        for field in self.municipios.nomes_campos:
+            if any(x in field.upper() for x in ['NM_MUN', 'MUNICIPIO', 'MUNIC', 'NOME']):
+                self.campo_municipio = field
+                break
+        
+        # Tempos da carga, incorporados às métricas da consulta que a provocou
+        self.metricas_carga = carga.como_dict()
+
+
+# Cache único do processo para o backend snapshot
+CACHE_ZONAS = cs.CacheZonas(DadosZonaSnapshot)
+
+
+# ============================================
+# ETAPAS DA CONSULTA
+# ============================================
+
+def localizar_poligonos(camada: CamadaSnapshot, xs: np.ndarray, ys: np.ndarray,
+                        metricas=instrumentacao.DESATIVADAS) -> np.ndarray:
+    """
+    Localiza o polígono da camada que contém cada ponto do lote.
+    
+    Os pares (ponto, polígono) candidatos saem de uma única descida do
+    índice e passam juntos por um único teste ponto-em-polígono.
+    
+    Args:
+        camada: Camada de polígonos
+        xs, ys: Coordenadas dos pontos
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Índice do primeiro polígono (menor índice) que contém cada ponto (-1 se nenhum)
+    """
+    ponto, poligono = camada.candidatos_lote(np.column_stack([xs, ys, xs, ys]))
+    dentro = camada.contem_pontos(poligono, xs[ponto], ys[ponto])
+    
+    metricas.contar('feicoes_varridas', len(poligono))
+    metricas.contar('operacoes_geometricas', len(poligono))
+    
+    # Os pares vêm ordenados por ponto e polígono: o primeiro de cada ponto é o de menor índice
+    encontrado = np.full(len(xs), -1, dtype=np.int64)
+    pontos, primeiros = np.unique(ponto[dentro], return_index=True)
+    encontrado[pontos] = poligono[dentro][primeiros]
+    return encontrado
+
+
+def localizar_poligono(camada: CamadaSnapshot, x: float, y: float,
+                       metricas=instrumentacao.DESATIVADAS) -> int:
+    """Índice do primeiro polígono da camada que contém o ponto (-1 se nenhum)."""
+    poligonos = camada.candidatos(x, y, x, y)
+    n = len(poligonos)
+    
+    metricas.contar('feicoes_varridas', n)
+    metricas.contar('operacoes_geometricas', n)
+    
+    if not n:
+        return -1
+    
+    dentro = np.flatnonzero(camada.contem_pontos(poligonos, np.full(n, x), np.full(n, y)))
+    return int(poligonos[dentro[0]]) if len(dentro) else -1
+
+
+def _info_fxd(dados: DadosZonaSnapshot, idx: int) -> Optional[Dict[str, Any]]:
+    """Atributos da FXD de índice idx (fxd_info), ou None para -1."""
+    if idx < 0:
+        return None
+    
+    return {
+        field: valor for field, valor in dados.fxd.atributos(idx).items()
+        if field.upper() not in CAMPOS_IGNORADOS_FXD
+    }
+
+
+def _nome_municipio(dados: DadosZonaSnapshot, idx: int) -> Optional[str]:
+    """Nome do município de índice idx, ou None para -1."""
+    if idx < 0:
+        return None
+    
+    return dados.municipios.atributos(idx)[dados.campo_municipio]
+
+
+def localizar_fxd_lote(dados: DadosZonaSnapshot, xs: np.ndarray, ys: np.ndarray,
+                       metricas=instrumentacao.DESATIVADAS) -> List[Optional[Dict[str, Any]]]:
+    """Atributos da FXD que contém cada ponto (fxd_info), ou None fora da FXD."""
+    indices = localizar_poligonos(dados.fxd, xs, ys, metricas)
+    return [_info_fxd(dados, idx) for idx in indices.tolist()]
+
+
+def localizar_municipio_lote(dados: DadosZonaSnapshot, xs: np.ndarray, ys: np.ndarray,
+                             metricas=instrumentacao.DESATIVADAS) -> List[Optional[str]]:
+    """Nome do município que contém cada ponto, ou None."""
+    if not dados.campo_municipio:
+        return [None] * len(xs)
+    
+    indices = localizar_poligonos(dados.municipios, xs, ys, metricas)
+    return [_nome_municipio(dados, idx) for idx in indices.tolist()]
+
+
+def localizar_fxd(dados: DadosZonaSnapshot, x: float, y: float,
+                  metricas=instrumentacao.DESATIVADAS) -> Optional[Dict[str, Any]]:
+    """Atributos da FXD que contém o ponto (fxd_info), ou None fora da FXD."""
+    return _info_fxd(dados, localizar_poligono(dados.fxd, x, y, metricas))
+
+
+def localizar_municipio(dados: DadosZonaSnapshot, x: float, y: float,
+                        metricas=instrumentacao.DESATIVADAS) -> Optional[str]:
+    """Nome do município que contém o ponto, ou None."""
+    if not dados.campo_municipio:
+        return None
+    
+    return _nome_municipio(dados, localizar_poligono(dados.municipios, x, y, metricas))
+
+
+def buscar_candidatos_eixo_lote(dados: DadosZonaSnapshot, xs: np.ndarray, ys: np.ndarray,
+                                distancia_maxima: float = cs.DISTANCIA_MAXIMA_EIXO,
+                                metricas=instrumentacao.DESATIVADAS
+                                ) -> Tuple[List[List[Tuple[float, int, float, float]]], np.ndarray]:
+    """
+    Busca os eixos dentro da distância máxima de cada ponto do lote.
+    
+    Uma única descida do índice seleciona os pares (ponto, eixo) de todo o
+    lote, e todos os pares são projetados juntos (RedeLinear.projetar). A
+    projeção só precisa ser exata até o raio do primeiro anel da busca
+    seguinte: acima dele, a menor distância fora do limite não altera esse
+    raio.
+    
+    Args:
+        dados: Dados da zona
+        xs, ys: Coordenadas dos pontos
+        distancia_maxima: Raio de busca em metros
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Tupla (candidatos, menor_distancia_fora): por ponto, os candidatos
+        como (distância, índice, distância ao longo, comprimento) ordenados
+        por distância (empate: ordem das feições), e a menor distância entre
+        os eixos fora do limite
+    """
+    n = len(xs)
+    ponto, eixo = dados.shape.candidatos_lote(np.column_stack([
+        xs - distancia_maxima, ys - distancia_maxima, xs + distancia_maxima, ys + distancia_maxima
+    ]))
+    projecao = dados.shape.rede.projetar(eixo, xs[ponto], ys[ponto],
+                                         cs.raio_inicial_aneis(distancia_maxima, np.inf))
+    distancia = projecao['distancia']
+    
+    # Menor distância entre os eixos fora do limite, por ponto
+    fora = distancia > distancia_maxima
+    menor_distancia = np.full(n, np.inf)
+    np.minimum.at(menor_distancia, ponto[fora], distancia[fora])
+    
+    ordem = np.lexsort((eixo, distancia, ponto))
+    ordem = ordem[~fora[ordem]]
+    
+    metricas.contar('feicoes_varridas', len(eixo))
+    metricas.contar('operacoes_geometricas', len(eixo))
+    metricas.contar('candidatos_no_raio', len(ordem))
+    
+    candidatos: List[List[Tuple[float, int, float, float]]] = [[] for _ in range(n)]
+    for k, d, idx, ao_longo, comprimento in zip(
+            ponto[ordem].tolist(), distancia[ordem].tolist(), eixo[ordem].tolist(),
+            projecao['ao_longo'][ordem].tolist(), projecao['comprimento'][ordem].tolist()):
+        candidatos[k].append((d, idx, ao_longo, comprimento))
+    
+    return candidatos, menor_distancia
+
+
+def buscar_candidatos_eixo(dados: DadosZonaSnapshot, x: float, y: float,
+                           distancia_maxima: float = cs.DISTANCIA_MAXIMA_EIXO,
+                           metricas=instrumentacao.DESATIVADAS
+                           ) -> Tuple[List[Tuple[float, int, float, float]], float]:
+    """
+    Busca os eixos dentro da distância máxima do ponto.
+    
+    Args:
+        dados: Dados da zona
+        x, y: Coordenadas do ponto
+        distancia_maxima: Raio de busca em metros
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Tupla (candidatos, menor_distancia_fora), como em buscar_candidatos_eixo_lote
+    """
+    candidatos, menor_distancia = buscar_candidatos_eixo_lote(
+        dados, np.array([x], dtype=float), np.array([y], dtype=float), distancia_maxima, metricas
+    )
+    return candidatos[0], float(menor_distancia[0])
+
+
+def buscar_eixo_mais_proximo(dados: DadosZonaSnapshot, x: float, y: float, raio_inicial: float,
+                             metricas=instrumentacao.DESATIVADAS) -> List[Tuple[float, int, float, float]]:
+    """
+    Eixos mais próximos do ponto além de DISTANCIA_MAXIMA_EIXO (ver cs.buscar_em_aneis).
+    
+    Args:
+        dados: Dados da zona
+        x, y: Coordenadas do ponto
+        raio_inicial: Raio do primeiro anel (m)
+        metricas: Métricas da consulta (ver instrumentacao.py)
+    
+    Returns:
+        Candidatos no formato de buscar_candidatos_eixo
+    """
+    rede = dados.shape.rede
+    
+    def projetar(indices):
+        n = len(indices)
+        return rede.projetar(np.asarray(indices, dtype=np.int64), np.full(n, x), np.full(n, y))
+    
+    proximos = cs.buscar_em_aneis(
+        lambda raio: dados.shape.candidatos(x - raio, y - raio, x + raio, y + raio).tolist(),
+        lambda indices: projetar(indices)['distancia'].tolist(),
+        raio_inicial, cs.DISTANCIA_MAXIMA_BUSCA, metricas
+    )
+    
+    eixos = [idx for _, idx in proximos]
+    projecao = projetar(eixos)
+    return list(zip(projecao['distancia'].tolist(), eixos,
+                    projecao['ao_longo'].tolist(), projecao['comprimento'].tolist()))
+
+
+def escolher_eixo(dados: DadosZonaSnapshot, candidatos: List[Tuple[float, int, float, float]],
+                  verbose: bool = True) -> Optional[Tuple[float, int, Any, Any, float]]:
+    """
+    Escolhe o eixo mais próximo cujo KM pode ser calculado.
+    
+    Returns:
+        Tupla (distância, índice, km_inicial, km_final, km_calculado) ou None
+        (mesmo formato de consulta_standalone.escolher_eixo)
+    """
+    for distancia, idx, ao_longo, comprimento in candidatos:
+        if comprimento == 0:
+            continue
+        
+        atributos_dict = dados.shape.atributos(idx)
+        
+        # Buscar campos de KM
+        km_inicial, km_final = cs.extrair_campos_km(atributos_dict)
+        
+        if km_inicial is None or km_final is None:
+            continue
+        
+        try:
+            km_calculado = calcular_km_por_proporcao(ao_longo / comprimento,
+                                                     km_inicial, km_final,
+                                                     atributos=atributos_dict,
+                                                     continuidade=dados.continuidade,
+                                                     verbose=verbose)
+        except Exception as e:
+            print(f"❌ Erro ao calcular KM: {e}")
+            continue
+        
+        return distancia, idx, km_inicial, km_final, km_calculado
+    
+    return None
+
+
+# ============================================
+# FUNÇÃO PRINCIPAL - CONSULTA
+# ============================================
+
+def consultar_coordenadas(x: float, y: float, zona: int) -> Optional[Dict[str, Any]]:
+    """
+    Executa a consulta completa sobre o snapshot da zona.
+    Mesmo resultado de consulta_standalone.consultar_coordenadas.
+    
+    Args:
+        x: Coordenada X (Este) em metros
+        y: Coordenada Y (Norte) em metros
+        zona: Zona UTM (23 ou 24)
+    
+    Returns:
+        Dicionário com resultados ou None se não encontrado ('fora_do_limite'
+        e 'metricas' como em consulta_standalone.consultar_coordenadas)
+    """
+    if not cs.validar_coordenadas(x, y, zona):
+        return None
+    
+    metricas = instrumentacao.iniciar()
+    
+    with metricas.etapa('carga_zona'):
+        carregada = zona in CACHE_ZONAS
+        dados = CACHE_ZONAS.obter(zona)
+    
+    if not carregada:
+        metricas.incorporar(dados.metricas_carga, prefixo='carga.')
+    
+    # 1. FXD
+    with metricas.etapa('fxd'):
+        fxd_info = localizar_fxd(dados, x, y, metricas)
+    dentro_fxd = fxd_info is not None
+    
+    if dentro_fxd:
+        print(f"\n✅ Ponto DENTRO da Faixa de Domínio")
+    
+    # 2. Município
+    with metricas.etapa('municipio'):
+        municipio = localizar_municipio(dados, x, y, metricas)
+    
+    # 3. Eixo rodoviário mais próximo
+    if not dados.shape.existe:
+        print(f"\n❌ Shapefile shape{zona}.shp não encontrado")
+        return None
+    
+    distancia_maxima = cs.DISTANCIA_MAXIMA_EIXO
+    with metricas.etapa('busca_eixos'):
+        candidatos, menor_distancia = buscar_candidatos_eixo(dados, x, y, distancia_maxima, metricas)
+    
+    # 4. KM no eixo mais próximo
+    with metricas.etapa('calculo_km'):
+        eixo = escolher_eixo(dados, candidatos)
+    
+    if eixo:
+        with metricas.etapa('montagem'):
+            resultado = cs.montar_resultado(dados, eixo, dentro_fxd, fxd_info, municipio)
+        return instrumentacao.publicar(metricas, resultado)
+    
+    print(f"\n❌ Nenhuma feição encontrada dentro do limite de {distancia_maxima}m.")
+    
+    # 5. Eixo mais próximo fora do limite (busca em anéis)
+    with metricas.etapa('busca_aneis'):
+        proximos = buscar_eixo_mais_proximo(dados, x, y, cs.raio_inicial_aneis(distancia_maxima, menor_distancia),
+                                            metricas)
+    
+    with metricas.etapa('calculo_km'):
+        eixo = escolher_eixo(dados, proximos, verbose=False)
+    
+    if eixo:
+        print(f"ℹ️  Rodovia mais próxima está a {eixo[0]:.2f}m de distância (resultado fora do limite).")
+        with metricas.etapa('montagem'):
+            resultado = cs.montar_resultado(dados, eixo, dentro_fxd, fxd_info, municipio, fora_do_limite=True)
+        return instrumentacao.publicar(metricas, resultado)
+    
+    instrumentacao.publicar(metricas)
+    if cs.DISTANCIA_MAXIMA_BUSCA > distancia_maxima:
+        print(f"ℹ️  Nenhuma rodovia a menos de {cs.DISTANCIA_MAXIMA_BUSCA:g}m.")
+    return None
+
+
+def consultar_lote(xs, ys, zonas, como_dataframe: bool = False):
+    """
+    Consulta um lote de coordenadas sobre os snapshots das zonas.
+    
+    Mesma entrada e saída de consulta_standalone.consultar_lote.
+    
+    Args:
+        xs: Coordenadas X (array NumPy, lista ou coluna)
+        ys: Coordenadas Y
+        zonas: Zonas UTM (array ou um único valor para todo o lote)
+        como_dataframe: Retorna um pandas.DataFrame em vez de dicionário
+    
+    Returns:
+        Resultado colunar (ver consulta_standalone.COLUNAS_LOTE) ou DataFrame;
+        com a instrumentação ativa, as métricas do lote ficam em
+        instrumentacao.ultimas()
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    zonas = np.broadcast_to(np.asarray(zonas, dtype=int), xs.shape)
+    
+    colunas = cs.iniciar_colunas_lote(xs, ys, zonas)
+    metricas = instrumentacao.iniciar()
+    metricas.contar('pontos', len(xs))
+    
+    validas = cs.validar_coordenadas_lote(xs, ys, zonas)
+    
+    for zona in np.unique(zonas[validas]):
+        with metricas.etapa('carga_zona'):
+            carregada = int(zona) in CACHE_ZONAS
+            dados = CACHE_ZONAS.obter(int(zona))
+        
+        if not carregada:
+            metricas.incorporar(dados.metricas_carga, prefixo='carga.')
+        
+        indices = np.flatnonzero(validas & (zonas == zona))
+        xs_zona, ys_zona = xs[indices], ys[indices]
+        
+        # Etapas 1 e 2: FXD e município de todos os pontos da zona de uma vez
+        with metricas.etapa('fxd'):
+            fxd = localizar_fxd_lote(dados, xs_zona, ys_zona, metricas)
+        with metricas.etapa('municipio'):
+            municipios = localizar_municipio_lote(dados, xs_zona, ys_zona, metricas)
+        
+        colunas['dentro_fxd'][indices] = [f is not None for f in fxd]
+        colunas['municipio'][indices] = municipios
+        
+        if not dados.shape.existe:
+            continue
+        
+        # Etapa 3: eixos candidatos de todos os pontos da zona, projetados de uma vez
+        with metricas.etapa('busca_eixos'):
+            candidatos_lote, _ = buscar_candidatos_eixo_lote(dados, xs_zona, ys_zona, metricas=metricas)
+        
+        # Etapa 4: KM no eixo mais próximo
+        for i, candidatos, fxd_info, municipio in zip(indices.tolist(), candidatos_lote, fxd, municipios):
+            with metricas.etapa('calculo_km'):
+                eixo = escolher_eixo(dados, candidatos, verbose=False)
+            
+            if eixo is not None:
+                with metricas.etapa('montagem'):
+                    resultado = cs.montar_resultado(dados, eixo, fxd_info is not None, fxd_info, municipio)
+                    cs.gravar_resultado_lote(colunas, i, resultado)
+    
+    instrumentacao.publicar(metricas)
+    
+    if como_dataframe:
+        import pandas as pd
+        return pd.DataFrame(colunas, columns=cs.COLUNAS_LOTE)
+    
+    return colunas
+
+
+# Conversão GD → UTM dos modos --lat/--lon e --csv (pyproj, sem QGIS), importada
+# só quando usada
+def converter_gd_para_utm(latitude: float, longitude: float,
+                          zona: Optional[int] = None) -> Tuple[float, float, int]:
+    """Converte latitude/longitude para UTM (ver consulta_shapely.converter_gd_para_utm)."""
+    import consulta_shapely as csh
+    return csh.converter_gd_para_utm(latitude, longitude, zona)
+
+
+def converter_gd_para_utm_lote(latitudes, longitudes,
+                               zonas=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Converte arrays de latitude/longitude para UTM (ver consulta_shapely.converter_gd_para_utm_lote)."""
+    import consulta_shapely as csh
+    return csh.converter_gd_para_utm_lote(latitudes, longitudes, zonas)
+
+
+# ============================================
+# MAIN - INTERFACE CLI
+# ============================================
+
+def main():
+    """Função principal - compilação dos snapshots."""
+    
+    parser = argparse.ArgumentParser(
+        description='Compila os shapefiles de cada zona em um snapshot binário',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos:
+  %(prog)s
+  %(prog)s --zona 24
+        """
+    )
+    
+    parser.add_argument('--zona', '-z', type=int, nargs='+', choices=[23, 24],
+                       default=sorted(cs.ZONA_EPSG),
+                       help='Zonas a compilar (padrão: todas)')
+    
+    args = parser.parse_args()
+    
+    print("=" * 76)
+    print("  COMPILAÇÃO DE SNAPSHOTS")
+    print("=" * 76)
+    
+    try:
+        for zona in args.zona:
+            print(f"\n🔄 Compilando zona {zona}...")
+            inicio = time.perf_counter()
+            caminho = compilar_zona(zona)
+            segundos = time.perf_counter() - inicio
+            
+            inicio = time.perf_counter()
+            DadosZonaSnapshot(zona)
+            carga_ms = (time.perf_counter() - inicio) * 1000
+            
+            print(f"✅ {caminho.name}: {caminho.stat().st_size / 1e6:.1f} MB "
+                  f"em {segundos:.1f} s (carga: {carga_ms:.0f} ms)")
+        exit_code = 0
+    
+    except Exception as e:
+        print(f"\n❌ ERRO CRÍTICO: {e}")
+        import traceback
+        traceback.print_exc()
+        exit_code = 2
+    
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,16 +2,39 @@
 # -*- coding: utf-8 -*-
 """
 Script para verificar as coordenadas armazenadas no shapefile.
+
+Sem opções, exibe as 5 primeiras feições (PyQGIS). Com --completo, todas
+as feições são verificadas de forma vetorizada (pyogrio, Shapely, pyproj;
+sem QGIS): as extremidades recalculadas em UTM são comparadas com
+c_inicial/c_final, as divergências vão para uma planilha CSV e o código
+de saída é 1 se houver alguma (útil para validar um novo conjunto de dados).
+
+Uso:
+    python verificar_coordenadas.py <caminho_shapefile>
+    python verificar_coordenadas.py <caminho_shapefile> --completo [--saida <csv>] [--tolerancia M]
 """
 
 import sys
 import os
+import csv
+import time
+import argparse
+from pathlib import Path
+from typing import Tuple, Optional, Dict, Any
+
+import numpy as np
+
 os.environ['QT_QPA_PLATFORM'] = 'offscreen'
 
-from qgis.core import (
-    QgsApplication,
-    QgsVectorLayer
-)
+try:
+    from qgis.core import (
+        QgsApplication,
+        QgsVectorLayer
+    )
+    QGIS_DISPONIVEL = True
+except ImportError:
+    # Sem PyQGIS apenas a verificação completa (--completo) pode ser usada
+    QGIS_DISPONIVEL = False
 
 def verificar_coordenadas(caminho_shapefile):
     """Verifica as primeiras 5 feições do shapefile."""
@@ -76,19 +99,329 @@ def verificar_coordenadas(caminho_shapefile):
     return True
 
 
+# ============================================
+# VERIFICAÇÃO COMPLETA (VETORIZADA, SEM QGIS)
+# ============================================
+
+# Distância máxima (m) aceita entre a coordenada gravada e a recalculada; os
+# campos guardam metros inteiros, então só o arredondamento chega a ~0,71 m
+TOLERANCIA_PADRAO = 1.0
+
+# Feições lidas do shapefile por vez
+TAMANHO_BLOCO_LEITURA = 50000
+
+# Problemas registrados, em ordem de prioridade (um por extremidade)
+PROBLEMAS = ['SEM_GEOMETRIA', 'VAZIO', 'INVALIDO', 'ZONA_ERRADA', 'DIVERGENTE']
+
+# Colunas da planilha de ocorrências
+COLUNAS_OCORRENCIAS = [
+    'FID', 'CAMPO', 'PROBLEMA', 'VALOR_GRAVADO', 'X_CALCULADO', 'Y_CALCULADO',
+    'ZONA_CALCULADA', 'DIFERENCA_M'
+]
+
+# Situação do texto lido de c_inicial/c_final
+LIDO, VAZIO, INVALIDO = 0, 1, 2
+
+
+def interpretar_coordenadas(valores) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Lê os textos 'X Y Zona' gravados em c_inicial/c_final.
+    
+    Args:
+        valores: Valores do campo (texto ou None)
+    
+    Returns:
+        Tupla (xs, ys, zonas, situacao), com situacao LIDO, VAZIO ou INVALIDO
+        (NaN e zona 0 onde o texto não pôde ser lido)
+    """
+    n = len(valores)
+    xs = np.full(n, np.nan)
+    ys = np.full(n, np.nan)
+    zonas = np.zeros(n, dtype=int)
+    situacao = np.full(n, LIDO, dtype=np.int8)
+    
+    for i, valor in enumerate(valores):
+        texto = str(valor).strip() if valor is not None else ''
+        
+        if not texto:
+            situacao[i] = VAZIO
+            continue
+        
+        partes = texto.split()
+        try:
+            if len(partes) != 3:
+                raise ValueError(texto)
+            xs[i], ys[i], zonas[i] = float(partes[0]), float(partes[1]), int(partes[2])
+        except ValueError:
+            situacao[i] = INVALIDO
+    
+    situacao[(situacao == LIDO) & ~(np.isfinite(xs) & np.isfinite(ys))] = INVALIDO
+    return xs, ys, zonas, situacao
+
+
+def extremidades_geometrias(wkbs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Primeiro e último vértice de cada geometria, sem laço por feição.
+    
+    Nas multilinhas, o início é o primeiro vértice da primeira parte e o
+    fim, o último vértice da última parte (como no extrator).
+    
+    Args:
+        wkbs: Geometrias em WKB (None para feições sem geometria)
+    
+    Returns:
+        Tupla (validas, extremidades): máscara das feições com vértices e
+        array (n, 4) com x/y inicial e x/y final (NaN nas demais)
+    """
+    import shapely
+    
+    n = len(wkbs)
+    coordenadas, indices = shapely.get_coordinates(shapely.from_wkb(wkbs), return_index=True)
+    
+    extremidades = np.full((n, 4), np.nan)
+    validas = np.zeros(n, dtype=bool)
+    
+    if len(indices):
+        primeiros = np.flatnonzero(np.r_[True, indices[1:] != indices[:-1]])
+        ultimos = np.r_[primeiros[1:] - 1, len(indices) - 1]
+        feicoes = indices[primeiros]
+        
+        validas[feicoes] = True
+        extremidades[feicoes, 0:2] = coordenadas[primeiros]
+        extremidades[feicoes, 2:4] = coordenadas[ultimos]
+    
+    return validas, extremidades
+
+
+def classificar_extremidades(gravadas: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+                             calculadas: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                             validas: np.ndarray, tolerancia: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compara as coordenadas gravadas com as recalculadas.
+    
+    Args:
+        gravadas: Resultado de interpretar_coordenadas
+        calculadas: Tupla (xs, ys, zonas) recalculada da geometria
+        validas: Feições com geometria
+        tolerancia: Distância máxima aceita (m)
+    
+    Returns:
+        Tupla (problemas, diferencas): índice em PROBLEMAS (-1 sem problema) e
+        distância (m) entre gravada e recalculada (NaN onde não comparável)
+    """
+    xs, ys, zonas, situacao = gravadas
+    xs_calc, ys_calc, zonas_calc = calculadas
+    
+    comparaveis = validas & (situacao == LIDO) & (zonas == zonas_calc)
+    diferencas = np.where(comparaveis, np.hypot(xs - xs_calc, ys - ys_calc), np.nan)
+    
+    # Condições em ordem inversa de prioridade: a última que vale prevalece
+    problemas = np.full(len(xs), -1, dtype=np.int8)
+    problemas[comparaveis & (diferencas > tolerancia)] = PROBLEMAS.index('DIVERGENTE')
+    problemas[validas & (situacao == LIDO) & (zonas != zonas_calc)] = PROBLEMAS.index('ZONA_ERRADA')
+    problemas[situacao == INVALIDO] = PROBLEMAS.index('INVALIDO')
+    problemas[situacao == VAZIO] = PROBLEMAS.index('VAZIO')
+    problemas[~validas] = PROBLEMAS.index('SEM_GEOMETRIA')
+    
+    return problemas, diferencas
+
+
+def verificar_completo(caminho_shapefile, caminho_saida: Optional[str] = None,
+                       tolerancia: float = TOLERANCIA_PADRAO,
+                       tamanho_bloco: int = TAMANHO_BLOCO_LEITURA) -> Dict[str, Any]:
+    """
+    Verifica c_inicial/c_final de todas as feições do shapefile.
+    
+    O arquivo é lido em blocos (pyogrio); em cada bloco as extremidades são
+    extraídas (Shapely), reprojetadas para SIRGAS 2000 UTM na zona da
+    longitude (pyproj) e comparadas com os textos gravados, tudo vetorizado.
+    As extremidades com problema vão para uma planilha CSV (;).
+    
+    Args:
+        caminho_shapefile: Shapefile com os campos c_inicial/c_final
+        caminho_saida: Planilha de ocorrências (padrão: <shapefile>_verificacao.csv)
+        tolerancia: Distância máxima aceita entre gravada e recalculada (m)
+        tamanho_bloco: Feições lidas por vez
+    
+    Returns:
+        Estatísticas: 'feicoes', 'extremidades', 'corretas', contagem de cada
+        problema em 'problemas', 'diferenca_media_m', 'diferenca_maxima_m',
+        'diferenca_p95_m', 'segundos', 'feicoes_por_segundo' e 'saida'
+    
+    Raises:
+        ValueError: Se faltarem os campos ou o sistema de coordenadas
+    """
+    import pyogrio
+    from pyogrio.raw import read as ler_ogr
+    from pyproj import Transformer
+    
+    import consulta_standalone as cs
+    import consulta_shapely as csh
+    
+    entrada = Path(caminho_shapefile)
+    saida = Path(caminho_saida) if caminho_saida else entrada.with_name(f"{entrada.stem}_verificacao.csv")
+    
+    info = pyogrio.read_info(str(entrada))
+    
+    # Nomes dos campos como estão no arquivo (o DBF pode tê-los em maiúsculas)
+    nomes = {str(nome).lower(): str(nome) for nome in info['fields']}
+    if 'c_inicial' not in nomes or 'c_final' not in nomes:
+        raise ValueError(f"Campos 'c_inicial' e 'c_final' não encontrados em {entrada.name}")
+    
+    if not info['crs']:
+        raise ValueError(f"Sistema de coordenadas não definido em {entrada.name} (.prj)")
+    
+    para_gd = Transformer.from_crs(info['crs'], f"EPSG:{cs.EPSG_GD}", always_xy=True)
+    campos = [nomes['c_inicial'], nomes['c_final']]
+    
+    total = info['features']
+    inicio = time.monotonic()
+    contagem = {problema: 0 for problema in PROBLEMAS}
+    diferencas_todas = []
+    extremidades_total = 0
+    
+    with open(saida, 'w', encoding='utf-8-sig', newline='') as arq_saida:
+        escritor = csv.writer(arq_saida, delimiter=';')
+        escritor.writerow(COLUNAS_OCORRENCIAS)
+        
+        for inicio_bloco in range(0, total, tamanho_bloco):
+            _, fids, wkbs, valores = ler_ogr(
+                str(entrada), columns=campos, skip_features=inicio_bloco,
+                max_features=tamanho_bloco, return_fids=True
+            )
+            
+            validas, extremidades = extremidades_geometrias(wkbs)
+            n = len(fids)
+            
+            # Início e fim juntos: uma conversão para GD e uma para UTM por zona
+            xs_calc = np.full(2 * n, np.nan)
+            ys_calc = np.full(2 * n, np.nan)
+            zonas_calc = np.zeros(2 * n, dtype=int)
+            
+            ambas = np.r_[validas, validas]
+            longitudes, latitudes = para_gd.transform(
+                np.r_[extremidades[:, 0], extremidades[:, 2]][ambas],
+                np.r_[extremidades[:, 1], extremidades[:, 3]][ambas]
+            )
+            xs_calc[ambas], ys_calc[ambas], zonas_calc[ambas] = csh.converter_gd_para_utm_lote(
+                latitudes, longitudes
+            )
+            
+            for j, campo in enumerate(('c_inicial', 'c_final')):
+                gravadas = interpretar_coordenadas(valores[j])
+                parte = slice(j * n, (j + 1) * n)
+                calculadas = (xs_calc[parte], ys_calc[parte], zonas_calc[parte])
+                
+                problemas, diferencas = classificar_extremidades(gravadas, calculadas, validas, tolerancia)
+                
+                extremidades_total += n
+                diferencas_todas.append(diferencas[np.isfinite(diferencas)])
+                
+                for k, problema in enumerate(PROBLEMAS):
+                    contagem[problema] += int(np.count_nonzero(problemas == k))
+                
+                for i in np.flatnonzero(problemas >= 0).tolist():
+                    escritor.writerow([
+                        int(fids[i]),
+                        campo,
+                        PROBLEMAS[problemas[i]],
+                        valores[j][i] if valores[j][i] is not None else '',
+                        cs.formatar_numero(calculadas[0][i], 2) if validas[i] else '',
+                        cs.formatar_numero(calculadas[1][i], 2) if validas[i] else '',
+                        int(calculadas[2][i]) if validas[i] else '',
+                        cs.formatar_numero(diferencas[i], 2) if np.isfinite(diferencas[i]) else ''
+                    ])
+            
+            lidas = min(inicio_bloco + tamanho_bloco, total)
+            decorrido = time.monotonic() - inicio
+            print(f"   Verificadas: {lidas}/{total} feições ({lidas / decorrido:.0f} feições/s)")
+    
+    segundos = time.monotonic() - inicio
+    diferencas = np.concatenate(diferencas_todas) if diferencas_todas else np.empty(0)
+    
+    return {
+        'feicoes': total,
+        'extremidades': extremidades_total,
+        'corretas': extremidades_total - sum(contagem.values()),
+        'problemas': contagem,
+        'diferenca_media_m': float(diferencas.mean()) if len(diferencas) else 0.0,
+        'diferenca_maxima_m': float(diferencas.max()) if len(diferencas) else 0.0,
+        'diferenca_p95_m': float(np.percentile(diferencas, 95)) if len(diferencas) else 0.0,
+        'segundos': segundos,
+        'feicoes_por_segundo': total / segundos if segundos > 0 else 0.0,
+        'saida': str(saida)
+    }
+
+
+def exibir_estatisticas(estatisticas: Dict[str, Any], tolerancia: float) -> None:
+    """
+    Exibe o resumo da verificação completa.
+    
+    Args:
+        estatisticas: Resultado de verificar_completo
+        tolerancia: Tolerância usada (m)
+    """
+    print("\n" + "="*70)
+    print("📊 RESUMO DA VERIFICAÇÃO")
+    print("="*70)
+    print(f"📍 Feições:               {estatisticas['feicoes']}")
+    print(f"📍 Extremidades:          {estatisticas['extremidades']}")
+    print(f"✅ Corretas (≤ {tolerancia:g} m):    {estatisticas['corretas']}")
+    
+    for problema, quantidade in estatisticas['problemas'].items():
+        marcador = "❌" if quantidade else "  "
+        print(f"{marcador} {problema:<22} {quantidade}")
+    
+    print(f"\n📏 Diferença média:       {estatisticas['diferenca_media_m']:.2f} m")
+    print(f"📏 Diferença p95:         {estatisticas['diferenca_p95_m']:.2f} m")
+    print(f"📏 Diferença máxima:      {estatisticas['diferenca_maxima_m']:.2f} m")
+    print(f"⏱️  {estatisticas['segundos']:.1f} s - {estatisticas['feicoes_por_segundo']:.0f} feições/s")
+    print(f"📁 Ocorrências: {estatisticas['saida']}")
+    print("="*70)
+
+
 def main():
     """Função principal."""
     
+    if len(sys.argv) < 2:
+        print("Uso: python verificar_coordenadas.py <caminho_shapefile> [--completo]")
+        return 1
+    
+    parser = argparse.ArgumentParser(description='Verifica os campos c_inicial/c_final do shapefile')
+    parser.add_argument('shapefile', help='Caminho do shapefile')
+    parser.add_argument('--completo', action='store_true',
+                       help='Verifica todas as feições (vetorizado, sem QGIS) e grava as divergências em CSV')
+    parser.add_argument('--saida', '-o', metavar='ARQUIVO',
+                       help='Planilha de ocorrências (padrão: <shapefile>_verificacao.csv)')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO, metavar='METROS',
+                       help=f'Diferença máxima aceita (padrão: {TOLERANCIA_PADRAO:g} m)')
+    args = parser.parse_args()
+    
+    if args.completo:
+        print("="*70)
+        print("🔍 VERIFICADOR DE COORDENADAS - VERIFICAÇÃO COMPLETA")
+        print("="*70)
+        print(f"\n📁 Shapefile: {args.shapefile}\n")
+        
+        try:
+            estatisticas = verificar_completo(args.shapefile, args.saida, args.tolerancia)
+        except Exception as e:
+            print(f"❌ ERRO: {e}")
+            return 2
+        
+        exibir_estatisticas(estatisticas, args.tolerancia)
+        return 0 if estatisticas['corretas'] == estatisticas['extremidades'] else 1
+    
+    if not QGIS_DISPONIVEL:
+        print("❌ ERRO: PyQGIS não encontrado; use --completo")
+        return 2
+    
     QgsApplication.setPrefixPath("C:/Program Files/QGIS*", True)
     qgs = QgsApplication([], False)
     qgs.initQgis()
     
     try:
-        if len(sys.argv) < 2:
-            print("Uso: python verificar_coordenadas.py <caminho_shapefile>")
-            return 1
-        
-        sucesso = verificar_coordenadas(sys.argv[1])
+        sucesso = verificar_coordenadas(args.shapefile)
         return 0 if sucesso else 1
     
     finally: